@@ -1,10 +1,23 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import os
 from dotenv import load_dotenv
 
-from app.routers import auth, users, schedules, roles, logout, profile, notifications
+from app.routers import auth, users, schedules, roles, logout, profile, notifications, jobs, health
 from app.utils.database import connect_to_mongo, close_mongo_connection
+from app.services.revocation import start_revocation_sync, stop_revocation_sync
+from app.services.permissions import start_permission_resolver, stop_permission_resolver
+from app.services.availability_index import start_availability_index, stop_availability_index
+from app.services.notification_hub import start_notification_hub, stop_notification_hub
+from app.services.user_directory import start_user_directory, stop_user_directory
+from app.services.jobs import start_job_worker, stop_job_worker
+from app.services.auth import shutdown_password_pool
+from app.services.readiness import mark_ready, mark_not_ready
+from app.utils.indexes import ensure_indexes_on_startup
+from app.utils.metrics import METRICS_ENABLED, MetricsMiddleware, metrics
+from app.utils.roundtrips import ROUNDTRIP_BUDGETS, RoundTripBudgetMiddleware
+from app.utils.read_routing import read_routing
 
 # Load environment variables
 load_dotenv()
@@ -28,23 +41,58 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if ROUNDTRIP_BUDGETS != "off":
+        app.add_middleware(RoundTripBudgetMiddleware, mode=ROUNDTRIP_BUDGETS)
+    # Outermost, so the latency covers every other middleware
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
 
     # Event handlers for database connection
     app.add_event_handler("startup", connect_to_mongo)
+    app.add_event_handler("startup", ensure_indexes_on_startup)
+    app.add_event_handler("startup", start_revocation_sync)
+    app.add_event_handler("startup", start_permission_resolver)
+    app.add_event_handler("startup", start_availability_index)
+    app.add_event_handler("startup", start_notification_hub)
+    app.add_event_handler("startup", start_user_directory)
+    app.add_event_handler("startup", start_job_worker)
+    app.add_event_handler("startup", mark_ready)
+    app.add_event_handler("shutdown", mark_not_ready)
+    app.add_event_handler("shutdown", stop_job_worker)
+    app.add_event_handler("shutdown", stop_user_directory)
+    app.add_event_handler("shutdown", stop_notification_hub)
+    app.add_event_handler("shutdown", stop_availability_index)
+    app.add_event_handler("shutdown", stop_permission_resolver)
+    app.add_event_handler("shutdown", stop_revocation_sync)
+    app.add_event_handler("shutdown", shutdown_password_pool)
     app.add_event_handler("shutdown", close_mongo_connection)
 
     # Include routers
     api_prefix = os.getenv("API_PREFIX", "/api/v1")
     app.include_router(auth.router, prefix=f"{api_prefix}/auth", tags=["Authentication"])
     app.include_router(logout.router, prefix=f"{api_prefix}/auth", tags=["Authentication"])
-    app.include_router(users.router, prefix=f"{api_prefix}/users", tags=["Users"])
-    app.include_router(schedules.router, prefix=f"{api_prefix}/schedules", tags=["Schedules"])
-    app.include_router(roles.router, prefix=f"{api_prefix}/roles", tags=["Roles"])
-    app.include_router(profile.router, prefix=f"{api_prefix}/profile", tags=["Profile"])
-    app.include_router(notifications.router, prefix=f"{api_prefix}/notifications", tags=["Notifications"])
+    app.include_router(users.router, prefix=f"{api_prefix}/users", tags=["Users"],
+                       dependencies=[Depends(read_routing("users"))])
+    app.include_router(schedules.router, prefix=f"{api_prefix}/schedules", tags=["Schedules"],
+                       dependencies=[Depends(read_routing("schedules"))])
+    app.include_router(roles.router, prefix=f"{api_prefix}/roles", tags=["Roles"],
+                       dependencies=[Depends(read_routing("roles"))])
+    app.include_router(profile.router, prefix=f"{api_prefix}/profile", tags=["Profile"],
+                       dependencies=[Depends(read_routing("profile"))])
+    app.include_router(notifications.router, prefix=f"{api_prefix}/notifications", tags=["Notifications"],
+                       dependencies=[Depends(read_routing("notifications"))])
+    app.include_router(jobs.router, prefix=f"{api_prefix}/jobs", tags=["Jobs"],
+                       dependencies=[Depends(read_routing("jobs"))])
+    # Probes stay at the root so load balancers need no API prefix
+    app.include_router(health.router, tags=["Health"])
 
     @app.get("/")
     async def root():
         return {"message": "Welcome to NextEra Workforce API"}
 
+    if METRICS_ENABLED:
+        @app.get("/metrics", include_in_schema=False)
+        async def get_metrics():
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
     return app
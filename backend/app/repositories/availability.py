@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import List, Optional
+from bson import Binary
+from pymongo import ReturnDocument, UpdateOne
+
+from app.utils.database import get_database, get_read_database, read_session
+from app.utils.indexes import register_index, register_query_shape
+from app.utils.slots import availability_mask, mask_to_bytes
+
+register_index("availability", [("employee_id", 1), ("day_of_week", 1)], unique=True)
+register_query_shape("availability", {"employee_id": "employee"})
+register_query_shape("availability", {"employee_id": "employee", "day_of_week": 1})
+# Incremental refresh of the in-memory availability index
+register_index("availability", "updated_at")
+register_query_shape("availability", {"updated_at": {"$gte": datetime(2024, 1, 1)}})
+
+
+def slot_mask(day_of_week: int, fields: dict) -> Binary:
+    """
+    Packed mask of the week slots one availability day fully covers; empty
+    when the day is unavailable
+    """
+    mask = 0
+    if fields.get("is_available", True):
+        mask = availability_mask(day_of_week, fields["start_time"], fields["end_time"])
+    return Binary(mask_to_bytes(mask))
+
+
+async def list_for_employee(employee_id: str) -> List[dict]:
+    db = get_read_database()
+    # Maximum 7 days in a week
+    return await db.availability.find({"employee_id": employee_id}, session=read_session()).to_list(length=7)
+
+
+async def insert(availability_dict: dict) -> dict:
+    """
+    Insert an availability record. Raises DuplicateKeyError if the day already exists.
+    """
+    db = get_database()
+    availability_dict["slot_mask"] = slot_mask(availability_dict["day_of_week"], availability_dict)
+    result = await db.availability.insert_one(availability_dict)
+    availability_dict["_id"] = result.inserted_id
+    return availability_dict
+
+
+def _upsert_update(day_of_week: int, fields: dict) -> dict:
+    now = datetime.utcnow()
+    fields = {k: v for k, v in fields.items() if k not in ("employee_id", "day_of_week")}
+    fields["slot_mask"] = slot_mask(day_of_week, fields)
+    return {"$set": {**fields, "updated_at": now}, "$setOnInsert": {"created_at": now}}
+
+
+async def upsert_day(employee_id: str, day_of_week: int, fields: dict) -> dict:
+    """
+    Create or update the availability for one day and return the post-image
+    """
+    db = get_database()
+    return await db.availability.find_one_and_update(
+        {"employee_id": employee_id, "day_of_week": day_of_week},
+        _upsert_update(day_of_week, fields),
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def upsert_days(employee_id: str, days: List[dict]) -> List[dict]:
+    """
+    Create or update several days in one bulk write and return the stored documents
+    """
+    db = get_database()
+    if not days:
+        return []
+    ops = [
+        UpdateOne(
+            {"employee_id": employee_id, "day_of_week": day["day_of_week"]},
+            _upsert_update(day["day_of_week"], day),
+            upsert=True
+        )
+        for day in days
+    ]
+    await db.availability.bulk_write(ops, ordered=False)
+    wanted = list(dict.fromkeys(day["day_of_week"] for day in days))
+    docs = await db.availability.find({"employee_id": employee_id, "day_of_week": {"$in": wanted}})\
+                                .to_list(length=len(wanted))
+    order = {day: i for i, day in enumerate(wanted)}
+    return sorted(docs, key=lambda d: order[d["day_of_week"]])
+
+
+async def list_available_for_employees(employee_ids: List[str]) -> List[dict]:
+    """
+    Return the available days of many employees in one query
+    """
+    db = get_database()
+    cursor = db.availability.find(
+        {"employee_id": {"$in": employee_ids}, "is_available": True},
+        {"employee_id": 1, "day_of_week": 1, "start_time": 1, "end_time": 1, "slot_mask": 1}
+    )
+    return await cursor.to_list(length=None)
+
+
+def stream_masks(since: Optional[datetime] = None):
+    """
+    Cursor over the slot masks of every availability day, optionally only
+    those updated at or after since
+    """
+    db = get_database()
+    query = {} if since is None else {"updated_at": {"$gte": since}}
+    return db.availability.find(
+        query,
+        {"employee_id": 1, "day_of_week": 1, "start_time": 1, "end_time": 1,
+         "is_available": 1, "slot_mask": 1, "updated_at": 1}
+    )
+
+
+async def set_slot_masks(masks: List[tuple]):
+    """
+    Store computed slot masks given (availability _id, mask bytes) pairs
+    """
+    if not masks:
+        return
+    db = get_database()
+    await db.availability.bulk_write(
+        [UpdateOne({"_id": _id}, {"$set": {"slot_mask": Binary(mask)}}) for _id, mask in masks],
+        ordered=False
+    )
@@ -0,0 +1,32 @@
+from typing import List, Optional
+from bson import ObjectId
+
+
+def to_response(doc: Optional[dict]) -> Optional[dict]:
+    """
+    Map a Mongo document to a response dict with a string id
+    """
+    if doc is None:
+        return None
+    doc["id"] = str(doc["_id"])
+    return doc
+
+
+def to_responses(docs: List[dict]) -> List[dict]:
+    """
+    Map a list of Mongo documents to response dicts
+    """
+    for doc in docs:
+        doc["id"] = str(doc["_id"])
+    return docs
+
+
+def object_id(value) -> Optional[ObjectId]:
+    """
+    Return value as an ObjectId, or None if it is not a valid one
+    """
+    if isinstance(value, ObjectId):
+        return value
+    if not ObjectId.is_valid(value):
+        return None
+    return ObjectId(value)
@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Optional
+
+from app.utils.database import get_database
+from app.utils.indexes import register_index
+from app.repositories.base import object_id
+
+register_index("notification_fanouts", [("created_at", -1)])
+
+
+async def insert(fanout: dict) -> dict:
+    db = get_database()
+    result = await db.notification_fanouts.insert_one(fanout)
+    fanout["_id"] = result.inserted_id
+    return fanout
+
+
+async def find_by_id(fanout_id) -> Optional[dict]:
+    db = get_database()
+    return await db.notification_fanouts.find_one({"_id": object_id(fanout_id)})
+
+
+async def set_fields(fanout_id, fields: dict):
+    db = get_database()
+    await db.notification_fanouts.update_one(
+        {"_id": object_id(fanout_id)},
+        {"$set": {**fields, "updated_at": datetime.utcnow()}}
+    )
+
+
+async def record_chunk(fanout_id, last_recipient_id: str, delivered: int, failed: int, retries: int,
+                       error: Optional[str] = None):
+    """
+    Add one chunk's outcome to the fan-out's progress counters and move its
+    checkpoint to the chunk's last recipient
+    """
+    db = get_database()
+    update = {
+        "$inc": {"delivered": delivered, "failed": failed, "retries": retries, "chunks_done": 1},
+        "$set": {"last_recipient_id": last_recipient_id, "updated_at": datetime.utcnow()},
+    }
+    if error:
+        update["$push"] = {"errors": {"$each": [error], "$slice": -20}}
+    await db.notification_fanouts.update_one({"_id": object_id(fanout_id)}, update)
@@ -0,0 +1,175 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.utils.database import get_database, get_read_database, read_session
+from app.utils.indexes import register_index, register_query_shape
+from app.utils.pagination import fetch_page
+from app.repositories.base import object_id
+
+DUPLICATE_KEY = 11000
+
+register_index("notifications", [("employee_id", 1), ("created_at", -1), ("_id", -1)])
+register_query_shape("notifications", {"employee_id": "employee"}, sort=[("created_at", -1), ("_id", -1)])
+# Mark-all-read and counter reconciliation select a user's unread notifications
+register_index("notifications", [("employee_id", 1), ("is_read", 1)])
+register_query_shape("notifications", {"employee_id": "employee", "is_read": False})
+# One notification per fan-out and recipient, however often a chunk is retried
+register_index("notifications", [("fanout_id", 1), ("employee_id", 1)], unique=True,
+               partialFilterExpression={"fanout_id": {"$exists": True}})
+register_query_shape("notifications", {"employee_id": {"$in": ["employee"]}, "fanout_id": "fanout"})
+
+
+async def list_page(employee_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Return one page of an employee's notifications, newest first, and the next cursor
+    """
+    db = get_read_database()
+    return await fetch_page(db.notifications, {"employee_id": employee_id}, "created_at", -1, limit, cursor,
+                            read_session(), datetime)
+
+
+async def set_read(notification_id, employee_id: str, is_read: bool) -> Tuple[Optional[dict], bool]:
+    """
+    Set the read state of a notification owned by employee_id.
+    Returns the post-image (None if no such notification exists) and whether
+    the read state actually changed.
+    """
+    db = get_database()
+    updated = await db.notifications.find_one_and_update(
+        {"_id": object_id(notification_id), "employee_id": employee_id, "is_read": {"$ne": is_read}},
+        {"$set": {"is_read": is_read}},
+        return_document=ReturnDocument.AFTER
+    )
+    if updated is not None:
+        return updated, True
+    # Already in the requested state, or not this user's notification
+    existing = await db.notifications.find_one({"_id": object_id(notification_id), "employee_id": employee_id})
+    return existing, False
+
+
+async def mark_all_read(employee_id: str) -> int:
+    """
+    Mark every unread notification of an employee as read and return how many changed
+    """
+    db = get_database()
+    result = await db.notifications.update_many(
+        {"employee_id": employee_id, "is_read": False},
+        {"$set": {"is_read": True}}
+    )
+    return result.modified_count
+
+
+async def count_unread_by_employee(employee_ids: List[str]) -> Dict[str, int]:
+    """
+    Count unread notifications for many employees with one aggregation
+    """
+    db = get_database()
+    pipeline = [
+        {"$match": {"employee_id": {"$in": employee_ids}, "is_read": False}},
+        {"$group": {"_id": "$employee_id", "unread": {"$sum": 1}}},
+    ]
+    return {doc["_id"]: doc["unread"] async for doc in db.notifications.aggregate(pipeline)}
+
+
+async def get_unread_count(employee_id: str) -> int:
+    """
+    Read the cached unread counter of an employee
+    """
+    db = get_read_database()
+    counter = await db.notification_counters.find_one({"_id": employee_id}, session=read_session())
+    # A mark-all-read can land between an insert and its increment; never show that dip
+    return max(0, counter["unread"]) if counter else 0
+
+
+async def increment_unread(deltas: Dict[str, int]):
+    """
+    Apply unread counter deltas per employee in one unordered bulk write
+    """
+    deltas = {employee_id: delta for employee_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    db = get_database()
+    await db.notification_counters.bulk_write(
+        [UpdateOne({"_id": employee_id}, {"$inc": {"unread": delta}}, upsert=True)
+         for employee_id, delta in deltas.items()],
+        ordered=False
+    )
+
+
+async def get_unread_counters(employee_ids: List[str]) -> Dict[str, int]:
+    db = get_database()
+    cursor = db.notification_counters.find({"_id": {"$in": employee_ids}})
+    return {doc["_id"]: doc["unread"] async for doc in cursor}
+
+
+async def repair_unread_counters(repairs: List[Tuple[str, Optional[int], int]]) -> int:
+    """
+    Set counters given (employee_id, value read before counting, correct value).
+    Each write only applies if the counter still holds the value read, so an
+    increment that raced the count is never overwritten. Returns counters fixed.
+    """
+    if not repairs:
+        return 0
+    db = get_database()
+    ops = []
+    for employee_id, observed, unread in repairs:
+        if observed is None:
+            ops.append(UpdateOne({"_id": employee_id}, {"$setOnInsert": {"unread": unread}}, upsert=True))
+        else:
+            ops.append(UpdateOne({"_id": employee_id, "unread": observed}, {"$set": {"unread": unread}}))
+    result = await db.notification_counters.bulk_write(ops, ordered=False)
+    return result.modified_count + result.upserted_count
+
+
+async def insert_many(docs: List[dict]) -> Tuple[List[dict], List[dict], List[dict]]:
+    """
+    Insert notifications with one unordered insert_many. Returns the
+    documents inserted now (with _id set), the ones already stored and the
+    ones that failed.
+
+    _id is assigned before sending, and a fan-out stores one notification
+    per recipient, so retrying is idempotent: documents an earlier attempt
+    already stored are rejected as duplicates.
+    """
+    if not docs:
+        return [], [], []
+    db = get_database()
+    try:
+        await db.notifications.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        codes = {error["index"]: error.get("code") for error in e.details.get("writeErrors", [])}
+        inserted = [doc for i, doc in enumerate(docs) if i not in codes]
+        duplicates = [docs[i] for i, code in sorted(codes.items()) if code == DUPLICATE_KEY]
+        return inserted, duplicates, [docs[i] for i, code in sorted(codes.items()) if code != DUPLICATE_KEY]
+    return docs, [], []
+
+
+async def find_fanout_recipients(fanout_id: str, employee_ids: List[str]) -> List[str]:
+    """
+    Return which of the given employees already got a notification from a fan-out
+    """
+    db = get_database()
+    cursor = db.notifications.find({"employee_id": {"$in": employee_ids}, "fanout_id": fanout_id},
+                                   {"employee_id": 1})
+    return [doc["employee_id"] async for doc in cursor]
+
+
+async def list_after(employee_id: str, after_id, limit: int) -> List[dict]:
+    """
+    Return up to limit of an employee's notifications newer than after_id, oldest first
+    """
+    db = get_database()
+    anchor = await db.notifications.find_one(
+        {"_id": object_id(after_id), "employee_id": employee_id}, {"created_at": 1}
+    )
+    if anchor is None:
+        return []
+    cursor = db.notifications.find(
+        {"employee_id": employee_id, "created_at": {"$gte": anchor["created_at"]}}
+    ).sort([("created_at", 1), ("_id", 1)]).limit(limit + 1)
+    return [
+        doc async for doc in cursor
+        if doc["created_at"] > anchor["created_at"] or doc["_id"] > anchor["_id"]
+    ]
@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import List, Optional
+from pymongo import ReturnDocument
+
+from app.utils.database import get_database, get_read_database, read_session
+from app.utils.indexes import register_index, register_query_shape
+from app.repositories.base import object_id
+
+# Roles that ship with the application and cannot be deleted
+BUILT_IN_ROLES = ["employee", "manager", "admin"]
+
+register_index("roles", "name", unique=True)
+register_query_shape("roles", {"name": "employee"})
+
+# Counter in the counters collection bumped by every role write, so workers
+# can tell whether their cached permissions are stale with one _id lookup
+VERSION_ID = "roles"
+
+
+async def get_version() -> int:
+    db = get_database()
+    doc = await db.counters.find_one({"_id": VERSION_ID})
+    return doc["version"] if doc else 0
+
+
+async def _bump_version():
+    db = get_database()
+    await db.counters.update_one({"_id": VERSION_ID}, {"$inc": {"version": 1}}, upsert=True)
+
+
+async def list_roles(limit: Optional[int] = 100) -> List[dict]:
+    db = get_read_database()
+    return await db.roles.find(session=read_session()).to_list(length=limit)
+
+
+async def find_by_id(role_id) -> Optional[dict]:
+    db = get_read_database()
+    return await db.roles.find_one({"_id": object_id(role_id)}, session=read_session())
+
+
+async def insert(role_dict: dict) -> dict:
+    """
+    Insert a role and return the stored document. Raises DuplicateKeyError on a taken name.
+    """
+    db = get_database()
+    result = await db.roles.insert_one(role_dict)
+    role_dict["_id"] = result.inserted_id
+    await _bump_version()
+    return role_dict
+
+
+async def update(role_id, fields: dict) -> Optional[dict]:
+    """
+    Apply fields to a role and return the post-image, or None if the role does not exist
+    """
+    db = get_database()
+    if not fields:
+        return await find_by_id(role_id)
+    fields = {**fields, "updated_at": datetime.utcnow()}
+    updated = await db.roles.find_one_and_update(
+        {"_id": object_id(role_id)},
+        {"$set": fields},
+        return_document=ReturnDocument.AFTER
+    )
+    if updated is not None:
+        await _bump_version()
+    return updated
+
+
+async def delete_custom(role_id) -> Optional[dict]:
+    """
+    Delete a role unless it is built in. Returns the deleted document, or None
+    if nothing matched (missing or built-in role).
+    """
+    db = get_database()
+    deleted = await db.roles.find_one_and_delete({
+        "_id": object_id(role_id),
+        "name": {"$nin": BUILT_IN_ROLES}
+    })
+    if deleted is not None:
+        await _bump_version()
+    return deleted
@@ -0,0 +1,146 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from app.utils.database import get_database, get_read_database, read_session
+from app.utils.dates import MAX_SHIFT
+from app.utils.indexes import register_index, register_query_shape
+from app.utils.pagination import fetch_page, sort_spec
+from app.repositories.base import object_id
+
+# _id is part of the index so keyset pages are served in index order without a sort stage
+register_index("schedules", [("employee_id", 1), ("start_time", 1), ("_id", 1)])
+# Team-wide exports scan by start time across all employees
+register_index("schedules", [("start_time", 1), ("_id", 1)])
+
+# Sample window for the query shapes registered from the filters below
+SAMPLE_START, SAMPLE_END = datetime(2024, 1, 1), datetime(2024, 1, 8)
+
+
+def list_filter(employee_id: Optional[str] = None, start: Optional[datetime] = None,
+                end: Optional[datetime] = None, schedule_status: Optional[str] = None,
+                location: Optional[str] = None) -> dict:
+    """
+    Schedules of the list and export endpoints: shifts starting within [start, end]
+    """
+    query = {}
+    if employee_id:
+        query["employee_id"] = employee_id
+    if start or end:
+        query["start_time"] = {}
+        if start:
+            query["start_time"]["$gte"] = start
+        if end:
+            query["start_time"]["$lte"] = end
+    if schedule_status:
+        query["status"] = schedule_status
+    if location:
+        query["location"] = location
+    return query
+
+
+def overlap_filter(start: datetime, end: datetime, employee_ids: Optional[List[str]] = None) -> dict:
+    """
+    Active shifts intersecting [start, end). No shift is longer than MAX_SHIFT,
+    so start_time is a range bounded on both sides.
+    """
+    query = {
+        "start_time": {"$gt": start - MAX_SHIFT, "$lt": end},
+        "end_time": {"$gt": start},
+        "status": {"$ne": "cancelled"},
+    }
+    if employee_ids is not None:
+        query["employee_id"] = {"$in": employee_ids}
+    return query
+
+
+register_query_shape("schedules", list_filter("employee"), sort=sort_spec("start_time", 1))
+register_query_shape("schedules", list_filter("employee", SAMPLE_START, SAMPLE_END), sort=sort_spec("start_time", 1))
+register_query_shape("schedules", list_filter(None, SAMPLE_START, SAMPLE_END), sort=sort_spec("start_time", 1))
+register_query_shape("schedules", overlap_filter(SAMPLE_START, SAMPLE_END))
+register_query_shape("schedules", overlap_filter(SAMPLE_START, SAMPLE_END, ["employee"]))
+
+
+async def find_page(query: dict, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Return one page of schedules ordered by (start_time, _id) and the next cursor
+    """
+    db = get_read_database()
+    return await fetch_page(db.schedules, query, "start_time", 1, limit, cursor, read_session(), datetime)
+
+
+async def find_owned(schedule_id, employee_id: str) -> Optional[dict]:
+    db = get_database()
+    return await db.schedules.find_one({"_id": object_id(schedule_id), "employee_id": employee_id})
+
+
+def stream(query: dict):
+    """
+    Return a cursor over matching schedules in (start_time, _id) order for streaming exports
+    """
+    db = get_database()
+    return db.schedules.find(query).sort([("start_time", 1), ("_id", 1)])
+
+
+async def list_overlapping(start: datetime, end: datetime) -> List[dict]:
+    """
+    Return active shifts of any employee that intersect [start, end)
+    """
+    db = get_database()
+    cursor = db.schedules.find(
+        overlap_filter(start, end),
+        {"employee_id": 1, "start_time": 1, "end_time": 1, "location": 1, "role": 1, "generation_id": 1}
+    )
+    return await cursor.to_list(length=None)
+
+
+async def list_for_employees_between(employee_ids: List[str], start: datetime, end: datetime) -> List[dict]:
+    """
+    Return active shifts of the given employees that intersect [start, end) in one indexed query
+    """
+    db = get_database()
+    cursor = db.schedules.find(overlap_filter(start, end, employee_ids),
+                               {"employee_id": 1, "start_time": 1, "end_time": 1})
+    return await cursor.to_list(length=None)
+
+
+async def insert_many(docs: List[dict], chunk_size: int) -> Tuple[int, Dict[int, str]]:
+    """
+    Insert shifts with unordered insert_many calls of at most chunk_size documents.
+
+    Returns the number inserted and an error message per failed position in docs.
+    Inserted documents get their _id set in place.
+    """
+    db = get_database()
+    inserted = 0
+    errors: Dict[int, str] = {}
+    for i in range(0, len(docs), chunk_size):
+        chunk = docs[i:i + chunk_size]
+        try:
+            result = await db.schedules.insert_many(chunk, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                errors[i + write_error["index"]] = write_error.get("errmsg", "Insert failed")
+    return inserted, errors
+
+
+async def update(schedule_id, fields: dict) -> Optional[dict]:
+    """
+    Apply fields to a shift and return its pre-image, or None if it does not exist.
+    The pre-image is what incremental rollups need to compute their deltas.
+    """
+    db = get_database()
+    fields = {**fields, "updated_at": datetime.utcnow()}
+    return await db.schedules.find_one_and_update(
+        {"_id": object_id(schedule_id)},
+        {"$set": fields},
+        return_document=ReturnDocument.BEFORE
+    )
+
+
+async def find_by_id(schedule_id) -> Optional[dict]:
+    db = get_database()
+    return await db.schedules.find_one({"_id": object_id(schedule_id)})
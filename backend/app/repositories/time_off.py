@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from pymongo import ReturnDocument
+
+from app.utils.database import get_database, get_read_database, read_session
+from app.utils.indexes import register_index, register_query_shape
+from app.utils.pagination import fetch_page
+from app.repositories.base import object_id
+
+register_index("time_off_requests", [("employee_id", 1), ("created_at", 1), ("_id", 1)])
+register_query_shape("time_off_requests", {"employee_id": "employee"}, sort=[("created_at", 1), ("_id", 1)])
+# Team-wide exports scan every request in creation order
+register_index("time_off_requests", [("created_at", 1), ("_id", 1)])
+# Date-range overlap: start_date < window end and end_date > window start
+register_index("time_off_requests", [("employee_id", 1), ("start_date", 1), ("end_date", 1)])
+register_index("time_off_requests", [("status", 1), ("start_date", 1), ("end_date", 1)])
+
+
+def overlap_filter(start: datetime, end: datetime, request_status: str = "approved",
+                   employee_ids: Optional[List[str]] = None) -> dict:
+    """
+    Requests in the given status intersecting [start, end). end_date is
+    checked on the index keys, so only matching requests are fetched.
+    """
+    query = {"status": request_status, "start_date": {"$lt": end}, "end_date": {"$gt": start}}
+    if employee_ids is not None:
+        query["employee_id"] = {"$in": employee_ids}
+    return query
+
+
+register_query_shape("time_off_requests", overlap_filter(datetime(2024, 1, 1), datetime(2024, 1, 2),
+                                                         employee_ids=["employee"]))
+register_query_shape("time_off_requests", overlap_filter(datetime(2024, 1, 1), datetime(2024, 1, 2)),
+                     sort=[("start_date", 1), ("_id", 1)])
+
+
+async def list_page(employee_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Return one page of an employee's requests ordered by (created_at, _id) and the next cursor
+    """
+    db = get_read_database()
+    return await fetch_page(db.time_off_requests, {"employee_id": employee_id}, "created_at", 1, limit, cursor,
+                            read_session(), datetime)
+
+
+async def find_owned(request_id, employee_id: str) -> Optional[dict]:
+    db = get_database()
+    return await db.time_off_requests.find_one({"_id": object_id(request_id), "employee_id": employee_id})
+
+
+async def insert(request_dict: dict) -> dict:
+    db = get_database()
+    result = await db.time_off_requests.insert_one(request_dict)
+    request_dict["_id"] = result.inserted_id
+    return request_dict
+
+
+async def update_pending(request_id, employee_id: str, fields: dict) -> Optional[dict]:
+    """
+    Update a pending request owned by employee_id and return the post-image.
+    Returns None when the request is missing, not owned or no longer pending.
+    """
+    db = get_database()
+    fields = {**fields, "updated_at": datetime.utcnow()}
+    return await db.time_off_requests.find_one_and_update(
+        {"_id": object_id(request_id), "employee_id": employee_id, "status": "pending"},
+        {"$set": fields},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def cancel_pending(request_id, employee_id: str) -> Optional[dict]:
+    """
+    Cancel a pending request owned by employee_id and return the post-image
+    """
+    return await update_pending(request_id, employee_id, {"status": "cancelled"})
+
+
+def stream(query: dict):
+    """
+    Return a cursor over matching requests in (created_at, _id) order for streaming exports
+    """
+    db = get_database()
+    return db.time_off_requests.find(query).sort([("created_at", 1), ("_id", 1)])
+
+
+async def list_approved_for_employees(employee_ids: List[str], start: datetime, end: datetime) -> List[dict]:
+    """
+    Return approved requests of many employees that intersect [start, end) in one query
+    """
+    db = get_database()
+    cursor = db.time_off_requests.find(
+        overlap_filter(start, end, employee_ids=employee_ids),
+        {"employee_id": 1, "start_date": 1, "end_date": 1}
+    )
+    return await cursor.to_list(length=None)
+
+
+async def list_overlapping(start: datetime, end: datetime, request_status: str = "approved",
+                           employee_id: Optional[str] = None) -> List[dict]:
+    """
+    Return requests in the given status that intersect [start, end), ordered by start date
+    """
+    db = get_database()
+    employee_ids = [employee_id] if employee_id is not None else None
+    cursor = db.time_off_requests.find(overlap_filter(start, end, request_status, employee_ids))\
+                                 .sort([("start_date", 1), ("_id", 1)])
+    return await cursor.to_list(length=None)
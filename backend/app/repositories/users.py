@@ -0,0 +1,234 @@
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+from pymongo import ReturnDocument
+
+from app.utils.database import get_database, get_read_database, read_session
+from app.utils.indexes import register_index, register_query_shape
+from app.utils.pagination import fetch_page, sort_spec
+from app.repositories.base import object_id
+
+register_index("users", "email", unique=True)
+register_query_shape("users", {"email": "user@example.com"})
+register_index("users", [("role", 1), ("is_active", 1)])
+register_query_shape("users", {"role": {"$in": ["employee"]}, "is_active": True})
+# Team membership and work locations used to target notification fan-outs
+register_index("users", "team", sparse=True)
+register_index("users", "locations")
+# Directory listing: pages are ordered by the lowercased "last first" sort_name
+register_index("users", [("role", 1), ("is_active", 1), ("sort_name", 1), ("_id", 1)])
+register_index("users", [("sort_name", 1), ("_id", 1)])
+# Directory search: lowercased name and email terms in a multikey index, so an
+# anchored prefix regex is a range scan. Only the matching users are sorted
+# into page order.
+register_index("users", [("search_terms", 1), ("sort_name", 1), ("_id", 1)])
+# The in-memory directory picks up users written by other workers
+register_index("users", "updated_at")
+
+SEARCH_FIELDS = ("first_name", "last_name", "email")
+
+
+def normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+def search_fields(user: dict) -> dict:
+    """
+    Derived directory search fields of a user document
+    """
+    first, last, email = (normalize(user.get(field)) for field in SEARCH_FIELDS)
+    terms = {first, last, email, f"{first} {last}".strip()}
+    # Multi-word names are also searchable by each of their words
+    terms.update(first.split())
+    terms.update(last.split())
+    terms.discard("")
+    return {"search_terms": sorted(terms), "sort_name": f"{last} {first}".strip()}
+
+
+async def find_by_id(user_id) -> Optional[dict]:
+    db = get_database()
+    return await db.users.find_one({"_id": object_id(user_id)})
+
+
+async def find_by_email(email: str) -> Optional[dict]:
+    db = get_database()
+    return await db.users.find_one({"email": email})
+
+
+async def list_users(skip: int, limit: int) -> List[dict]:
+    db = get_read_database()
+    return await db.users.find(session=read_session()).skip(skip).limit(limit).to_list(length=limit)
+
+
+async def list_page(limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Return one page of users in _id order and the next cursor
+    """
+    db = get_read_database()
+    return await fetch_page(db.users, {}, None, 1, limit, cursor, read_session())
+
+
+def directory_filter(q: Optional[str] = None, role: Optional[str] = None,
+                     is_active: Optional[bool] = None) -> dict:
+    """
+    Users with a first name, last name, full name or email starting with q,
+    optionally narrowed by role and is_active
+    """
+    query = {}
+    prefix = normalize(q)
+    if prefix:
+        # One predicate, so a single term has to match and the multikey bounds stay tight
+        query["search_terms"] = {"$regex": f"^{re.escape(prefix)}"}
+    if role is not None:
+        query["role"] = role
+    if is_active is not None:
+        query["is_active"] = is_active
+    return query
+
+
+register_query_shape("users", directory_filter(), sort=sort_spec("sort_name", 1))
+register_query_shape("users", directory_filter(None, "employee", True), sort=sort_spec("sort_name", 1))
+register_query_shape("users", directory_filter("jan"), sort=sort_spec("sort_name", 1))
+register_query_shape("users", directory_filter("jan", "employee", True), sort=sort_spec("sort_name", 1))
+
+
+async def search_page(query: dict, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Return one page of matching users ordered by last then first name, and the next cursor
+    """
+    db = get_read_database()
+    return await fetch_page(db.users, query, "sort_name", 1, limit, cursor, read_session(), str)
+
+
+async def stream_directory(since: Optional[datetime] = None):
+    """
+    Yield the fields the in-memory directory keeps, for users updated since a time
+    """
+    db = get_database()
+    query = {} if since is None else {"updated_at": {"$gte": since}}
+    projection = {field: 1 for field in (*SEARCH_FIELDS, "role", "is_active", "updated_at")}
+    async for doc in db.users.find(query, projection):
+        yield doc
+
+
+async def list_active_by_roles(roles: List[str], projection: Optional[dict] = None) -> List[dict]:
+    """
+    Return every active user holding one of the given roles
+    """
+    db = get_database()
+    cursor = db.users.find({"role": {"$in": roles}, "is_active": True}, projection)
+    return await cursor.to_list(length=None)
+
+
+async def find_active_ids(user_ids: List[str]) -> List[str]:
+    """
+    Return which of the given ids belong to active users
+    """
+    db = get_database()
+    oids = [oid for oid in (object_id(u) for u in user_ids) if oid is not None]
+    cursor = db.users.find({"_id": {"$in": oids}, "is_active": True}, {"_id": 1})
+    return [str(doc["_id"]) async for doc in cursor]
+
+
+async def filter_eligible(user_ids: List[str], location: Optional[str] = None) -> List[str]:
+    """
+    Return which of the given ids belong to active users working at location.
+    Users without locations are only returned when no location is given.
+    """
+    db = get_database()
+    oids = [oid for oid in (object_id(u) for u in user_ids) if oid is not None]
+    query = {"_id": {"$in": oids}, "is_active": True}
+    if location is not None:
+        query["locations"] = location
+    return [str(doc["_id"]) async for doc in db.users.find(query, {"_id": 1})]
+
+
+async def iter_id_batches(batch_size: int):
+    """
+    Yield every user id as strings, batch_size at a time, in _id order
+    """
+    async for batch in iter_matching_id_batches({}, batch_size):
+        yield batch
+
+
+def recipient_filter(roles: Optional[List[str]] = None, locations: Optional[List[str]] = None,
+                     teams: Optional[List[str]] = None) -> dict:
+    """
+    Active users matching every given selector (any value within a selector).
+    Users without locations or a team match no location or team selector.
+    """
+    query = {"is_active": True}
+    if roles:
+        query["role"] = {"$in": roles}
+    if locations:
+        query["locations"] = {"$in": locations}
+    if teams:
+        query["team"] = {"$in": teams}
+    return query
+
+
+# Fan-out recipients are read in _id batches
+register_query_shape("users", recipient_filter(locations=["store"]), sort=sort_spec(None, 1))
+register_query_shape("users", recipient_filter(teams=["team"]), sort=sort_spec(None, 1))
+
+
+async def iter_matching_id_batches(query: dict, batch_size: int, after: Optional[str] = None):
+    """
+    Yield the ids of users matching query as strings, batch_size at a time,
+    in _id order, starting after the given id
+    """
+    db = get_database()
+    last_id = object_id(after) if after else None
+    while True:
+        page = query if last_id is None else {"$and": [query, {"_id": {"$gt": last_id}}]}
+        docs = await db.users.find(page, {"_id": 1}).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            return
+        last_id = docs[-1]["_id"]
+        yield [str(doc["_id"]) for doc in docs]
+
+
+async def count_matching(query: dict) -> int:
+    db = get_database()
+    return await db.users.count_documents(query)
+
+
+async def insert(user_dict: dict) -> dict:
+    """
+    Insert a user and return the stored document. Raises DuplicateKeyError on a taken email.
+    """
+    db = get_database()
+    user_dict.update(search_fields(user_dict))
+    result = await db.users.insert_one(user_dict)
+    user_dict["_id"] = result.inserted_id
+    return user_dict
+
+
+async def update(user_id, fields: dict) -> Optional[dict]:
+    """
+    Apply fields to a user and return the post-image, or None if the user does not exist.
+    Raises DuplicateKeyError when the new email is taken.
+    """
+    db = get_database()
+    fields = {**fields, "updated_at": datetime.utcnow()}
+    updated = await db.users.find_one_and_update(
+        {"_id": object_id(user_id)},
+        {"$set": fields},
+        return_document=ReturnDocument.AFTER
+    )
+    if updated is not None and any(field in fields for field in SEARCH_FIELDS):
+        derived = search_fields(updated)
+        # Only if the names are still the ones derived from; a racing rename sets its own
+        await db.users.update_one(
+            {"_id": updated["_id"], **{field: updated.get(field) for field in SEARCH_FIELDS}},
+            {"$set": derived}
+        )
+        updated.update(derived)
+    return updated
+
+
+async def deactivate(user_id) -> Optional[dict]:
+    """
+    Soft-delete a user and return the post-image, or None if the user does not exist
+    """
+    return await update(user_id, {"is_active": False})
@@ -2,13 +2,16 @@ from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from jose import jwt, JWTError
+from pymongo.errors import DuplicateKeyError
 
-from app.utils.database import get_database
+from app.repositories import users as users_repo
+from app.repositories.base import to_response
 from app.schemas.auth import Token, LoginRequest, RefreshTokenRequest
 from app.schemas.user import UserCreate, UserResponse
+from app.services.user_directory import user_directory
 from app.services.auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     create_refresh_token,
     create_session,
@@ -27,10 +30,9 @@ async def register(user_data: UserCreate):
     Register a new user
     """
     print(f"Registering user with data: {user_data}")
-    db = get_database()
 
-    # Check if email already exists
-    existing_user = await db.users.find_one({"email": user_data.email})
+    # Check if email already exists before paying for the password hash
+    existing_user = await users_repo.find_by_email(user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -38,7 +40,7 @@ async def register(user_data: UserCreate):
         )
 
     # Hash the password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
 
     # Create user document
     user_dict = {}
@@ -61,6 +63,9 @@ async def register(user_data: UserCreate):
     # Preserve the original role value sent by the user
     user_dict["role"] = selected_role
     print(f"Setting user role to: {selected_role}")
+    user_dict["locations"] = user_data.locations
+    user_dict["job_roles"] = user_data.job_roles
+    user_dict["team"] = user_data.team
     user_dict["hashed_password"] = hashed_password
     user_dict["created_at"] = datetime.utcnow()
     user_dict["updated_at"] = datetime.utcnow()
@@ -68,30 +73,30 @@ async def register(user_data: UserCreate):
 
     print(f"Final user_dict before insertion: {user_dict}")
 
-    # Insert user into database
-    result = await db.users.insert_one(user_dict)
-
-    # Get the created user
-    created_user = await db.users.find_one({"_id": result.inserted_id})
-    print(f"Created user from database: {created_user}")
+    # Insert user into database; the unique email index catches concurrent registrations
+    try:
+        created_user = await users_repo.insert(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    print(f"Created user: {created_user}")
+    user_directory.update(created_user)
 
     # Convert ObjectId to string for response
-    created_user["id"] = str(created_user["_id"])
-
-    return created_user
+    return to_response(created_user)
 
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Authenticate a user and return JWT tokens
     """
-    db = get_database()
-
     # Find user by email
-    user = await db.users.find_one({"email": form_data.username})
+    user = await users_repo.find_by_email(form_data.username)
 
     # Check if user exists and password is correct
-    if not user or not verify_password(form_data.password, user.get("hashed_password", "")):
+    if not user or not await verify_password_async(form_data.password, user.get("hashed_password", "")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -149,9 +154,7 @@ async def refresh_token(refresh_data: RefreshTokenRequest):
         raise credentials_exception
 
     # Check if user exists and is active
-    db = get_database()
-    from bson import ObjectId
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await users_repo.find_by_id(user_id)
 
     if user is None or not user.get("is_active", False):
         raise credentials_exception
@@ -184,6 +187,4 @@ async def get_me(current_user = Depends(get_current_active_user)):
     Get current user information
     """
     # Convert ObjectId to string for response
-    current_user["id"] = str(current_user["_id"])
-
-    return current_user
+    return to_response(current_user)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, status
+
+from app.services.readiness import is_ready
+from app.utils.database import get_database
+
+router = APIRouter()
+
+@router.get("/health")
+async def health():
+    """
+    Liveness: the process is up and serving
+    """
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready():
+    """
+    Readiness: startup warm-up finished and MongoDB answers
+    """
+    if not is_ready():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Warming up"
+        )
+    try:
+        await get_database().command("ping")
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database unavailable"
+        )
+    return {"status": "ready"}
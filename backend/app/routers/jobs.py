@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from bson import ObjectId
+
+from app.schemas.job import JobCreate, JobResponse
+from app.services.auth import get_current_active_user
+from app.services.jobs import enqueue, find_job
+from app.services.permissions import RUN_JOBS, has_permission, require_permission
+from app.services.job_handlers import MAINTENANCE_JOB_KINDS
+from app.repositories.base import to_response
+
+router = APIRouter()
+
+@router.post("", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    job_data: JobCreate,
+    current_user = Depends(require_permission(RUN_JOBS))
+):
+    """
+    Queue a maintenance job: index reconciliation, coverage rebuild, a data
+    migration or unread-counter reconciliation (run_jobs permission)
+    """
+    if job_data.kind not in MAINTENANCE_JOB_KINDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Job kind must be one of: {', '.join(MAINTENANCE_JOB_KINDS)}"
+        )
+    job = await enqueue(job_data.kind, job_data.payload, created_by=str(current_user["_id"]))
+    return to_response(job)
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Status and, once finished, result of a job queued by the current user
+    """
+    job = await find_job(job_id) if ObjectId.is_valid(job_id) else None
+    if job is None or (job.get("created_by") != str(current_user["_id"]) and not has_permission(current_user, RUN_JOBS)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return to_response(job)
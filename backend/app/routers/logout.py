@@ -2,8 +2,9 @@ from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from jose import jwt
 
-from app.services.auth import get_current_user, blacklist_token
+from app.services.auth import get_current_user, blacklist_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from app.schemas.auth import Token
 
 router = APIRouter()
@@ -16,8 +17,13 @@ async def logout(current_user = Depends(get_current_user), token: str = Depends(
     if not token:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token missing")
 
-    # Blacklist token for remainder of its lifetime (assumed max 30 min)
-    expires_at = datetime.utcnow() + timedelta(minutes=30)
+    # Blacklist token for the remainder of its lifetime
+    exp = jwt.get_unverified_claims(token).get("exp")
+    if exp is not None:
+        expires_at = datetime.utcfromtimestamp(exp)
+    else:
+        expires_at = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # blacklist_token also evicts the token from the principal cache
     await blacklist_token(token, expires_at)
 
     return
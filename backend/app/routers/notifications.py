@@ -1,62 +1,204 @@
+import asyncio
+import os
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Union
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, status
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
-from app.schemas.notification import NotificationUpdate, NotificationResponse
-from app.services.auth import get_current_active_user
-from app.utils.database import get_database
+from app.schemas.notification import (
+    NotificationUpdate,
+    NotificationResponse,
+    UnreadCount,
+    MarkAllReadResult,
+    NotificationFanoutCreate,
+    NotificationFanoutResponse
+)
+from app.schemas.pagination import Page
+from app.services.auth import (
+    authenticate_stream,
+    get_current_active_user,
+    is_token_blacklisted,
+    optional_oauth2_scheme,
+)
+from app.services.permissions import SEND_NOTIFICATIONS, require_permission
+from app.services.notification_hub import OVERFLOW, notification_hub
+from app.services import notifications as notifications_service
+from app.services.notification_fanout import create_fanout
+from app.services.jobs import enqueue
+from app.services import versions
+from app.repositories import notification_fanouts as fanouts_repo
+from app.repositories import notifications as notifications_repo
+from app.repositories.base import to_response
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.serialization import dump, page_response, project, projection
+from app.utils.read_routing import no_read_routing
+from app.utils.roundtrips import AUTH_ROUNDTRIPS, roundtrip_budget
+
+# Load environment variables
+load_dotenv()
+
+# Idle streams send a comment this often so proxies keep them open and dead peers are noticed
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = float(os.getenv("NOTIFICATION_STREAM_HEARTBEAT_SECONDS", "15"))
+# Notifications replayed to a reconnecting stream that sends Last-Event-ID
+NOTIFICATION_STREAM_REPLAY_LIMIT = int(os.getenv("NOTIFICATION_STREAM_REPLAY_LIMIT", "100"))
 
 router = APIRouter()
 
-@router.get("", response_model=List[NotificationResponse])
-async def get_notifications(current_user=Depends(get_current_active_user)):
+
+def sse_event(doc: dict) -> str:
+    payload = dump(project(doc, projection(NotificationResponse))).decode()
+    return f"id: {doc['_id']}\nevent: notification\ndata: {payload}\n\n"
+
+@router.get("", response_model=Union[List[NotificationResponse], Page[NotificationResponse]])
+@roundtrip_budget(AUTH_ROUNDTRIPS + 2)
+async def get_notifications(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user=Depends(get_current_active_user)
+):
     """
-    Get notifications for the current user
+    Get notifications for the current user, newest first
     """
-    db = get_database()
-    raw = await db.notifications.find({"employee_id": str(current_user["_id"])})\
-                  .sort("created_at", -1)\
-                  .to_list(length=100)
-    # Convert ObjectId to string for each notification
-    for n in raw:
-        n["id"] = str(n["_id"])
-    return raw
+    cached = await versions.not_modified(request, response, versions.NOTIFICATIONS, str(current_user["_id"]))
+    if cached is not None:
+        return cached
+    raw, next_cursor = await notifications_repo.list_page(str(current_user["_id"]), limit, cursor)
+    return page_response(response, raw, NotificationResponse, next_cursor, cursor)
 
-@router.put("/{notification_id}", response_model=NotificationResponse)
-async def mark_notification_read(
-    notification_id: str,
-    update_data: NotificationUpdate,
-    current_user=Depends(get_current_active_user)
+@router.get("/stream")
+@no_read_routing
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
 ):
     """
-    Mark a notification as read
+    Server-Sent Events stream of new notifications for the current user.
+    The token is checked once on connect (Authorization header or access_token
+    query parameter); afterwards the connection only costs an idle queue.
+    Reconnecting clients that send Last-Event-ID get what they missed first.
+    """
+    token = token or access_token
+    current_user = await authenticate_stream(token)
+    employee_id = str(current_user["_id"])
+    # Subscribe before replaying so nothing inserted in between is lost
+    queue = notification_hub.subscribe(employee_id)
+
+    async def events():
+        try:
+            yield f"retry: {int(NOTIFICATION_STREAM_HEARTBEAT_SECONDS * 1000)}\n\n"
+            replayed = set()
+            if last_event_id and ObjectId.is_valid(last_event_id):
+                for doc in await notifications_repo.list_after(
+                    employee_id, last_event_id, NOTIFICATION_STREAM_REPLAY_LIMIT
+                ):
+                    replayed.add(doc["_id"])
+                    yield sse_event(doc)
+            while True:
+                try:
+                    doc = await asyncio.wait_for(queue.get(), NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected() or await is_token_blacklisted(token):
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if doc is OVERFLOW:
+                    return
+                if doc["_id"] not in replayed:
+                    yield sse_event(doc)
+        finally:
+            notification_hub.unsubscribe(employee_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/fanout", response_model=NotificationFanoutResponse, status_code=status.HTTP_202_ACCEPTED)
+async def start_fanout(
+    fanout_data: NotificationFanoutCreate,
+    current_user=Depends(require_permission(SEND_NOTIFICATIONS))
+):
+    """
+    Notify every active user matching the roles, locations and teams given
+    (send_notifications permission). Returns immediately; poll the fan-out for progress.
+    """
+    selector = fanout_data.dict(exclude={"message"}, exclude_none=True)
+    fanout = await create_fanout(fanout_data.message, selector, str(current_user["_id"]))
+    await enqueue("notification_fanout", {"fanout_id": str(fanout["_id"])}, created_by=str(current_user["_id"]))
+    return to_response(fanout)
+
+@router.get("/fanout/{fanout_id}", response_model=NotificationFanoutResponse)
+async def get_fanout(
+    fanout_id: str,
+    current_user=Depends(require_permission(SEND_NOTIFICATIONS))
+):
+    """
+    Progress of a notification fan-out (send_notifications permission)
+    """
+    fanout = await fanouts_repo.find_by_id(fanout_id) if ObjectId.is_valid(fanout_id) else None
+    if fanout is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Fan-out not found"
+        )
+    return to_response(fanout)
+
+@router.get("/unread-count", response_model=UnreadCount)
+async def get_unread_count(current_user=Depends(get_current_active_user)):
+    """
+    Number of unread notifications, read from the user's counter document
+    """
+    return {"unread": await notifications_repo.get_unread_count(str(current_user["_id"]))}
+
+@router.post("/read-all", response_model=MarkAllReadResult)
+async def mark_all_notifications_read(current_user=Depends(get_current_active_user)):
+    """
+    Mark every notification of the current user as read
     """
-    db = get_database()
+    return {"updated": await notifications_service.mark_all_read(str(current_user["_id"]))}
 
+async def _set_read(notification_id: str, current_user, is_read: bool) -> NotificationResponse:
     if not ObjectId.is_valid(notification_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid notification ID"
         )
 
-    notif = await db.notifications.find_one({
-        "_id": ObjectId(notification_id),
-        "employee_id": str(current_user["_id"])
-    })
+    # Ownership is part of the update filter
+    updated = await notifications_service.set_read(notification_id, str(current_user["_id"]), is_read)
 
-    if notif is None:
+    if updated is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Notification not found"
         )
 
-    # Update is_read
-    await db.notifications.update_one(
-        {"_id": ObjectId(notification_id)},
-        {"$set": {"is_read": update_data.is_read}}
-    )
+    return NotificationResponse.model_validate(to_response(updated))
+
+@router.post("/{notification_id}/read", response_model=NotificationResponse)
+async def mark_notification_read(
+    notification_id: str,
+    current_user=Depends(get_current_active_user)
+):
+    """
+    Mark a notification as read
+    """
+    return await _set_read(notification_id, current_user, True)
 
-    updated = await db.notifications.find_one({"_id": ObjectId(notification_id)})
-    updated["id"] = str(updated["_id"])
-    return NotificationResponse.model_validate(updated)
+@router.put("/{notification_id}", response_model=NotificationResponse)
+async def update_notification(
+    notification_id: str,
+    update_data: NotificationUpdate,
+    current_user=Depends(get_current_active_user)
+):
+    """
+    Set the read state of a notification
+    """
+    return await _set_read(notification_id, current_user, update_data.is_read)
@@ -1,23 +1,44 @@
-from datetime import datetime
 from typing import List
-from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pymongo.errors import DuplicateKeyError
 
-from app.schemas.user import UserUpdate, UserResponse
+from app.schemas.user import ASSIGNMENT_FIELDS, UserUpdate, UserResponse
 from app.schemas.schedule import AvailabilityResponse, AvailabilityUpdate
-from app.utils.database import get_database
 from app.services.auth import get_current_active_user
+from app.services.permissions import MANAGE_USERS, has_permission
+from app.services.principal_cache import principal_cache
+from app.services.availability_index import availability_index
+from app.services.user_directory import user_directory
+from app.services import versions
+from app.repositories import users as users_repo
+from app.repositories import availability as availability_repo
+from app.repositories.base import to_response
+from app.utils.serialization import documents_response
+from app.utils.roundtrips import AUTH_ROUNDTRIPS, roundtrip_budget
 
 router = APIRouter()
 
 @router.get("", response_model=UserResponse)
-async def get_profile(current_user = Depends(get_current_active_user)):
+@roundtrip_budget(AUTH_ROUNDTRIPS + 2)
+async def get_profile(
+    request: Request,
+    response: Response,
+    current_user = Depends(get_current_active_user)
+):
     """
     Get current user's profile
     """
-    user = current_user
-    user["id"] = str(user["_id"])
-    return user
+    cached = await versions.not_modified(request, response, versions.PROFILE, str(current_user["_id"]))
+    if cached is not None:
+        return cached
+    # The principal cache may predate the version the ETag was derived from
+    user = await users_repo.find_by_id(current_user["_id"])
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return to_response(user)
 
 @router.put("", response_model=UserResponse)
 async def update_profile(
@@ -28,37 +49,47 @@ async def update_profile(
     Update current user's profile
     """
     user_id = current_user["_id"]
-    # Regular users cannot change role
-    if profile_data.role is not None and current_user.get("role") != "admin":
+    # Regular users cannot change their role, locations, job roles or team
+    if not has_permission(current_user, MANAGE_USERS) and any(
+        getattr(profile_data, field) is not None for field in ASSIGNMENT_FIELDS
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions to change role"
+            detail="Not enough permissions to change role or assignments"
         )
-    db = get_database()
     update_data = {k: v for k, v in profile_data.dict(exclude_unset=True).items() if v is not None}
-    if update_data:
-        update_data["updated_at"] = datetime.utcnow()
-        await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
-    updated_user = await db.users.find_one({"_id": ObjectId(user_id)})
-    updated_user["id"] = str(updated_user["_id"])
-    return updated_user
+    if not update_data:
+        return to_response(current_user)
+    try:
+        async with versions.changes(versions.PROFILE, [str(user_id)]):
+            updated_user = await users_repo.update(user_id, update_data)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    principal_cache.invalidate_user(str(user_id))
+    user_directory.update(updated_user)
+    return to_response(updated_user)
 
 @router.get("/availability", response_model=List[AvailabilityResponse])
+@roundtrip_budget(AUTH_ROUNDTRIPS + 2)
 async def get_profile_availability(
+    request: Request,
+    response: Response,
     current_user = Depends(get_current_active_user)
 ):
     """
     Get availability for the current user
     """
-    db = get_database()
-    docs = await db.availability.find({"employee_id": str(current_user["_id"]) }).to_list(length=7)
-    results: List[AvailabilityResponse] = []
-    for d in docs:
-        d["id"] = str(d["_id"])
-        results.append(AvailabilityResponse.model_validate(d))
-    return results
+    cached = await versions.not_modified(request, response, versions.AVAILABILITY, str(current_user["_id"]))
+    if cached is not None:
+        return cached
+    docs = await availability_repo.list_for_employee(str(current_user["_id"]))
+    return documents_response(docs, AvailabilityResponse, response)
 
 @router.put("/availability", response_model=List[AvailabilityResponse])
+@roundtrip_budget(AUTH_ROUNDTRIPS + 4)
 async def upsert_profile_availability(
     avail_list: List[AvailabilityUpdate],
     current_user = Depends(get_current_active_user)
@@ -66,26 +97,9 @@ async def upsert_profile_availability(
     """
     Bulk upsert availability for the current user
     """
-    db = get_database()
     emp_id = str(current_user["_id"])
-    results = []
-    for item in avail_list:
-        existing = await db.availability.find_one({"employee_id": emp_id, "day_of_week": item.day_of_week})
-        doc = item.dict()
-        doc["employee_id"] = emp_id
-        doc["updated_at"] = datetime.utcnow()
-        if existing:
-            await db.availability.update_one({"_id": ObjectId(existing["_id"])}, {"$set": doc})
-            updated = await db.availability.find_one({"_id": ObjectId(existing["_id"])})
-            results.append(updated)
-        else:
-            doc["created_at"] = datetime.utcnow()
-            res = await db.availability.insert_one(doc)
-            new_doc = await db.availability.find_one({"_id": res.inserted_id})
-            results.append(new_doc)
-    # Convert documents to response models
-    final = []
-    for d in results:
-        d["id"] = str(d["_id"])
-        final.append(AvailabilityResponse.model_validate(d))
-    return final
+    # One bulk upsert plus one read, regardless of how many days are sent
+    async with versions.changes(versions.AVAILABILITY, [emp_id]):
+        results = await availability_repo.upsert_days(emp_id, [item.dict() for item in avail_list])
+    availability_index.update_many(results)
+    return documents_response(results, AvailabilityResponse)
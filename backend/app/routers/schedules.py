@@ -1,9 +1,9 @@
 from datetime import datetime, timedelta
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status, Path # type: ignore
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, Path # type: ignore
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
-from app.utils.database import get_database
 from app.schemas.schedule import (
     ScheduleCreate,
     ScheduleUpdate,
@@ -13,48 +13,160 @@ from app.schemas.schedule import (
     TimeOffRequestResponse,
     AvailabilityCreate,
     AvailabilityUpdate,
-    AvailabilityResponse
+    AvailabilityResponse,
+    ScheduleGenerationRequest,
+    ScheduleGenerationResult,
+    ScheduleBulkCreate,
+    ScheduleBulkResult,
+    AvailableEmployees,
+    CoverageHeatmap
 )
+from app.schemas.pagination import Page
+from app.schemas.job import JobResponse
 from app.services.auth import get_current_active_user
+from app.services.permissions import MANAGE_SCHEDULES, check_permission, require_permission
+from app.services.scheduling_engine import generate_schedules
+from app.services.schedule_booking import create_shifts
+from app.services.availability_index import availability_index
+from app.services import coverage
+from app.services.jobs import enqueue
+from app.services import versions
+from app.repositories import schedules as schedules_repo
+from app.repositories import time_off as time_off_repo
+from app.repositories import availability as availability_repo
+from app.repositories import users as users_repo
+from app.repositories.base import to_response
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.serialization import documents_response, page_response
+from app.utils.export import export_response
+from app.utils.slots import window_mask
+from app.utils.dates import MAX_SHIFT, SCHEDULE_MAX_SHIFT_HOURS, parse_datetime
+from app.utils.roundtrips import AUTH_ROUNDTRIPS, roundtrip_budget
+
+SCHEDULE_EXPORT_FIELDS = ["id", "employee_id", "start_time", "end_time", "location", "role", "status",
+                          "created_at", "updated_at"]
+TIME_OFF_EXPORT_FIELDS = ["id", "employee_id", "start_date", "end_date", "reason", "status",
+                          "created_at", "updated_at"]
+
+SCHEDULE_STATUSES = ("pending", "approved", "rejected", "cancelled")
 
 router = APIRouter()
 
+def schedule_filter(
+    employee_id: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    schedule_status: Optional[str],
+    location: Optional[str]
+) -> dict:
+    """
+    Build the schedules query shared by the list and export endpoints.
+    Dates are validated here, before an export starts streaming its response.
+    """
+    try:
+        start = parse_datetime(start_date) if start_date else None
+        end = parse_datetime(end_date) if end_date else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)"
+        )
+    if start and end and end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="End date must not be before start date"
+        )
+    return schedules_repo.list_filter(employee_id, start, end, schedule_status, location)
+
+def export_scope(scope: str, employee_id: Optional[str], current_user) -> Optional[str]:
+    """
+    Resolve which employee an export covers. Team scope (manage_schedules permission)
+    covers everyone unless narrowed to one employee.
+    """
+    if scope == "team":
+        check_permission(current_user, MANAGE_SCHEDULES)
+        return employee_id
+    return str(current_user["_id"])
+
 # Schedule endpoints
-@router.get("", response_model=List[ScheduleResponse])
+@router.get("", response_model=Union[List[ScheduleResponse], Page[ScheduleResponse]])
+@roundtrip_budget(AUTH_ROUNDTRIPS + 2)
 async def get_schedules(
+    request: Request,
+    response: Response,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     status: Optional[str] = None,
     location: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_user = Depends(get_current_active_user)
 ):
     """
-    Get schedules for the current user
+    Get schedules for the current user, ordered by start time.
+    Pass `cursor` (empty for the first page) to receive `{items, next_cursor}` pages.
     """
-    db = get_database()
+    cached = await versions.not_modified(request, response, versions.SCHEDULES, str(current_user["_id"]))
+    if cached is not None:
+        return cached
 
     # Build query
-    query = {"employee_id": str(current_user["_id"])}
-
-    if start_date and end_date:
-        query["start_time"] = {
-            "$gte": datetime.fromisoformat(start_date),
-            "$lte": datetime.fromisoformat(end_date)
-        }
-    elif start_date:
-        query["start_time"] = {"$gte": datetime.fromisoformat(start_date)}
-    elif end_date:
-        query["start_time"] = {"$lte": datetime.fromisoformat(end_date)}
-
-    if status:
-        query["status"] = status
+    query = schedule_filter(str(current_user["_id"]), start_date, end_date, status, location)
 
-    if location:
-        query["location"] = location
+    schedules, next_cursor = await schedules_repo.find_page(query, limit, cursor)
 
-    schedules = await db.schedules.find(query).to_list(length=100)
+    return page_response(response, schedules, ScheduleResponse, next_cursor, cursor)
 
-    return schedules
+@router.get("/export")
+async def export_schedules(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    scope: str = Query("self", regex="^(self|team)$"),
+    employee_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    status: Optional[str] = None,
+    location: Optional[str] = None,
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Stream schedules as NDJSON or CSV for payroll exports of any date range
+    """
+    scoped_employee = export_scope(scope, employee_id, current_user)
+    query = schedule_filter(scoped_employee, start_date, end_date, status, location)
+    return export_response(schedules_repo.stream(query), SCHEDULE_EXPORT_FIELDS, format, "schedules")
+
+@router.post("/generate", response_model=Union[ScheduleGenerationResult, JobResponse])
+async def generate(
+    request_data: ScheduleGenerationRequest,
+    response: Response,
+    background: bool = False,
+    current_user = Depends(require_permission(MANAGE_SCHEDULES))
+):
+    """
+    Generate shifts for the given staffing demand from availability, approved
+    time-off and existing shifts (manage_schedules permission). With
+    background=true the run is queued as a job and the job is returned.
+    """
+    if background:
+        # Retried attempts of the job share the key, so they never store a shift twice
+        job = await enqueue("schedule_generation",
+                            {"request": request_data.dict(), "generation_id": str(ObjectId())},
+                            created_by=str(current_user["_id"]))
+        response.status_code = status.HTTP_202_ACCEPTED
+        return to_response(job)
+    return await generate_schedules(request_data)
+
+@router.post("/bulk", response_model=ScheduleBulkResult)
+async def bulk_create_schedules(
+    bulk_data: ScheduleBulkCreate,
+    current_user = Depends(require_permission(MANAGE_SCHEDULES))
+):
+    """
+    Create many shifts at once (manage_schedules permission). Rows that overlap an
+    existing shift, another row, or name an unknown employee are reported per
+    index and the remaining rows are still created.
+    """
+    return await create_shifts(bulk_data.shifts, bulk_data.publish)
 
 @router.get("/{schedule_id:regex('^[0-9a-fA-F]{24}$')}", response_model=ScheduleResponse)
 async def get_schedule(
@@ -64,8 +176,6 @@ async def get_schedule(
     """
     Get a specific schedule by ID
     """
-    db = get_database()
-
     # Validate ObjectId
     if not ObjectId.is_valid(schedule_id):
         raise HTTPException(
@@ -73,10 +183,7 @@ async def get_schedule(
             detail="Invalid schedule ID"
         )
 
-    schedule = await db.schedules.find_one({
-        "_id": ObjectId(schedule_id),
-        "employee_id": str(current_user["_id"])
-    })
+    schedule = await schedules_repo.find_owned(schedule_id, str(current_user["_id"]))
 
     if schedule is None:
         raise HTTPException(
@@ -84,28 +191,141 @@ async def get_schedule(
             detail="Schedule not found"
         )
 
-    return schedule
+    return to_response(schedule)
+
+@router.put("/{schedule_id}", response_model=ScheduleResponse)
+async def update_schedule(
+    schedule_id: str,
+    update_data: ScheduleUpdate,
+    current_user = Depends(require_permission(MANAGE_SCHEDULES))
+):
+    """
+    Move or change the status of a shift (manage_schedules permission)
+    """
+    if not ObjectId.is_valid(schedule_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid schedule ID"
+        )
+    fields = {k: v for k, v in update_data.dict(exclude_unset=True).items() if v is not None}
+    if "status" in fields and fields["status"] not in SCHEDULE_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Status must be one of: {', '.join(SCHEDULE_STATUSES)}"
+        )
+
+    current = await schedules_repo.find_by_id(schedule_id)
+    if current is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Schedule not found"
+        )
+    merged = {**current, **fields}
+    if merged["end_time"] <= merged["start_time"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="End time must be after start time"
+        )
+    if merged["end_time"] - merged["start_time"] > MAX_SHIFT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Shifts cannot be longer than {SCHEDULE_MAX_SHIFT_HOURS} hours"
+        )
+    if merged["status"] not in coverage.INACTIVE_STATUSES and ({"start_time", "end_time"} & fields.keys()):
+        clashes = await schedules_repo.list_for_employees_between(
+            [merged["employee_id"]], merged["start_time"], merged["end_time"]
+        )
+        clashes = [doc for doc in clashes if doc["_id"] != current["_id"]]
+        if clashes:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Overlaps schedule {clashes[0]['_id']}"
+            )
+
+    async with versions.changes(versions.SCHEDULES, {current["employee_id"], merged["employee_id"]}):
+        before = await schedules_repo.update(schedule_id, fields)
+    if before is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Schedule not found"
+        )
+    # The pre-image returned by the update makes the rollup delta exact even under concurrent edits
+    after = {**before, **fields, "updated_at": datetime.utcnow()}
+    await coverage.record_changes([(before, after)])
+    return to_response(after)
+
+@router.get("/coverage", response_model=CoverageHeatmap)
+async def get_coverage(
+    location: str,
+    week_start: datetime,
+    role: Optional[str] = None,
+    current_user = Depends(require_permission(MANAGE_SCHEDULES))
+):
+    """
+    Hourly scheduled headcount per role at a location for one week (manage_schedules permission)
+    """
+    week_start = parse_datetime(week_start)
+    cells = await coverage.heatmap(week_start, location, role)
+    return {"location": location, "week_start": week_start, "cells": cells}
 
 # Time-off request endpoints
-@router.get("/time-off", response_model=List[TimeOffRequestResponse])
+@router.get("/time-off", response_model=Union[List[TimeOffRequestResponse], Page[TimeOffRequestResponse]])
+@roundtrip_budget(AUTH_ROUNDTRIPS + 2)
 async def get_time_off_requests(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_user = Depends(get_current_active_user)
 ):
     """
-    Get time-off requests for the current user
+    Get time-off requests for the current user, oldest first
     """
-    db = get_database()
-
-    raw_requests = await db.time_off_requests.find({
-        "employee_id": str(current_user["_id"])
-    }).to_list(length=100)
-    # Convert Mongo documents to Pydantic models with string id
-    results: List[TimeOffRequestResponse] = []
-    for doc in raw_requests:
-        # prepare dict for model
-        data = {**doc, 'id': str(doc['_id'])}
-        results.append(TimeOffRequestResponse.model_validate(data))
-    return results
+    cached = await versions.not_modified(request, response, versions.TIME_OFF, str(current_user["_id"]))
+    if cached is not None:
+        return cached
+    raw_requests, next_cursor = await time_off_repo.list_page(str(current_user["_id"]), limit, cursor)
+    return page_response(response, raw_requests, TimeOffRequestResponse, next_cursor, cursor)
+
+@router.get("/time-off/export")
+async def export_time_off_requests(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    scope: str = Query("self", regex="^(self|team)$"),
+    employee_id: Optional[str] = None,
+    status: Optional[str] = None,
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Stream time-off requests as NDJSON or CSV
+    """
+    query = {}
+    scoped_employee = export_scope(scope, employee_id, current_user)
+    if scoped_employee:
+        query["employee_id"] = scoped_employee
+    if status:
+        query["status"] = status
+    return export_response(time_off_repo.stream(query), TIME_OFF_EXPORT_FIELDS, format, "time_off_requests")
+
+@router.get("/time-off/overlapping", response_model=List[TimeOffRequestResponse])
+async def get_overlapping_time_off(
+    start: datetime,
+    end: datetime,
+    request_status: str = Query("approved", alias="status"),
+    employee_id: Optional[str] = None,
+    current_user = Depends(require_permission(MANAGE_SCHEDULES))
+):
+    """
+    List time-off requests intersecting [start, end), approved by default
+    (manage_schedules permission)
+    """
+    start, end = parse_datetime(start), parse_datetime(end)
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="End must be after start"
+        )
+    docs = await time_off_repo.list_overlapping(start, end, request_status, employee_id)
+    return documents_response(docs, TimeOffRequestResponse)
 
 @router.post("/time-off", response_model=TimeOffRequestResponse)
 async def create_time_off_request(
@@ -115,45 +335,42 @@ async def create_time_off_request(
     """
     Create a new time-off request
     """
-    db = get_database()
-
     # Validate dates
     try:
-        start_date = datetime.fromisoformat(request_data.start_date.replace('Z', ''))
-        end_date = datetime.fromisoformat(request_data.end_date.replace('Z', ''))
-
-        if start_date < datetime.utcnow():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Start date cannot be in the past"
-            )
-
-        if end_date < start_date:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="End date must be after start date"
-            )
+        start_date = parse_datetime(request_data.start_date)
+        end_date = parse_datetime(request_data.end_date)
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)"
         )
 
-    # Create request document
+    if start_date < datetime.utcnow():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Start date cannot be in the past"
+        )
+
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="End date must be after start date"
+        )
+
+    # Create request document; dates are stored as datetimes so they can be range-queried
     request_dict = request_data.dict()
+    request_dict["start_date"] = start_date
+    request_dict["end_date"] = end_date
     request_dict["employee_id"] = str(current_user["_id"])
     request_dict["status"] = "pending"
     request_dict["created_at"] = datetime.utcnow()
     request_dict["updated_at"] = datetime.utcnow()
 
     # Insert request into database
-    result = await db.time_off_requests.insert_one(request_dict)
-
-    # Get the created request
-    created_request = await db.time_off_requests.find_one({"_id": result.inserted_id})
+    async with versions.changes(versions.TIME_OFF, [request_dict["employee_id"]]):
+        created_request = await time_off_repo.insert(request_dict)
     # Map Mongo document to Pydantic model
-    data = {**created_request, 'id': str(created_request['_id'])}
-    return TimeOffRequestResponse.model_validate(data)
+    return TimeOffRequestResponse.model_validate(to_response(created_request))
 
 @router.put("/time-off/{request_id}", response_model=TimeOffRequestResponse)
 async def update_time_off_request(
@@ -161,39 +378,27 @@ async def update_time_off_request(
     update_data: TimeOffRequestUpdate,
     current_user = Depends(get_current_active_user)
 ):
-    db = get_database()
     # Validate ObjectId
     if not ObjectId.is_valid(request_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid request ID"
         )
-    # Fetch request
-    req = await db.time_off_requests.find_one({
-        "_id": ObjectId(request_id),
-        "employee_id": str(current_user["_id"])
-    })
-    if req is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Time-off request not found"
-        )
-    # Only pending can be updated
-    if req.get("status") != "pending":
+    # Only pending requests owned by the user match the update filter
+    employee_id = str(current_user["_id"])
+    async with versions.changes(versions.TIME_OFF, [employee_id]):
+        updated = await time_off_repo.update_pending(request_id, employee_id, update_data.dict(exclude_unset=True))
+    if updated is None:
+        if await time_off_repo.find_owned(request_id, employee_id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Time-off request not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only pending requests can be updated"
         )
-    # Prepare update
-    update_fields = update_data.dict(exclude_unset=True)
-    update_fields["updated_at"] = datetime.utcnow()
-    await db.time_off_requests.update_one(
-        {"_id": ObjectId(request_id)},
-        {"$set": update_fields}
-    )
-    updated = await db.time_off_requests.find_one({"_id": ObjectId(request_id)})
-    data = {**updated, 'id': str(updated['_id'])}
-    return TimeOffRequestResponse.model_validate(data)
+    return TimeOffRequestResponse.model_validate(to_response(updated))
 
 @router.delete("/time-off/{request_id}", response_model=TimeOffRequestResponse)
 async def cancel_time_off_request(
@@ -203,8 +408,6 @@ async def cancel_time_off_request(
     """
     Cancel a time-off request
     """
-    db = get_database()
-
     # Validate ObjectId
     if not ObjectId.is_valid(request_id):
         raise HTTPException(
@@ -212,58 +415,64 @@ async def cancel_time_off_request(
             detail="Invalid request ID"
         )
 
-    # Check if request exists and belongs to the current user
-    request = await db.time_off_requests.find_one({
-        "_id": ObjectId(request_id),
-        "employee_id": str(current_user["_id"])
-    })
+    # Ownership and pending status are checked by the update filter itself
+    employee_id = str(current_user["_id"])
+    async with versions.changes(versions.TIME_OFF, [employee_id]):
+        updated_request = await time_off_repo.cancel_pending(request_id, employee_id)
 
-    if request is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Time-off request not found"
-        )
-
-    # Check if request is pending
-    if request["status"] != "pending":
+    if updated_request is None:
+        # Only the failure path pays for a second lookup to pick the right error
+        if await time_off_repo.find_owned(request_id, employee_id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Time-off request not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only pending requests can be cancelled"
         )
-
-    # Update request status
-    await db.time_off_requests.update_one(
-        {"_id": ObjectId(request_id)},
-        {"$set": {"status": "cancelled", "updated_at": datetime.utcnow()}}
-    )
-
-    # Get updated request
-    updated_request = await db.time_off_requests.find_one({"_id": ObjectId(request_id)})
     # Map Mongo document to Pydantic model
-    data = {**updated_request, 'id': str(updated_request['_id'])}
-    return TimeOffRequestResponse.model_validate(data)
+    return TimeOffRequestResponse.model_validate(to_response(updated_request))
 
 # Availability endpoints
 @router.get("/availability", response_model=List[AvailabilityResponse])
+@roundtrip_budget(AUTH_ROUNDTRIPS + 2)
 async def get_availability(
+    request: Request,
+    response: Response,
     current_user = Depends(get_current_active_user)
 ):
     """
     Get availability for the current user
     """
-    db = get_database()
-
-    availability_docs = await db.availability.find({
-        "employee_id": str(current_user["_id"])
-    }).to_list(length=7)  # Maximum 7 days in a week
-
-    # Map Mongo documents to Pydantic models, ensuring _id is mapped to id
-    availability_responses: List[AvailabilityResponse] = []
-    for doc in availability_docs:
-        doc['id'] = str(doc['_id'])
-        availability_responses.append(AvailabilityResponse.model_validate(doc))
-
-    return availability_responses
+    cached = await versions.not_modified(request, response, versions.AVAILABILITY, str(current_user["_id"]))
+    if cached is not None:
+        return cached
+    availability_docs = await availability_repo.list_for_employee(str(current_user["_id"]))
+    return documents_response(availability_docs, AvailabilityResponse, response)
+
+@router.get("/availability/search", response_model=AvailableEmployees)
+async def search_availability(
+    day_of_week: int = Query(..., ge=0, le=6),
+    start_time: str = Query(..., regex="^([01][0-9]|2[0-3]):[0-5][0-9]$"),
+    end_time: str = Query(..., regex="^([01][0-9]|2[0-3]):[0-5][0-9]$"),
+    location: Optional[str] = None,
+    current_user = Depends(require_permission(MANAGE_SCHEDULES))
+):
+    """
+    Find employees available for the whole window (manage_schedules permission).
+    An end time at or before the start time runs past midnight.
+    """
+    candidates = availability_index.available(window_mask(day_of_week, start_time, end_time))
+    employee_ids = await users_repo.filter_eligible(candidates, location) if candidates else []
+    return {
+        "day_of_week": day_of_week,
+        "start_time": start_time,
+        "end_time": end_time,
+        "location": location,
+        "count": len(employee_ids),
+        "employee_ids": employee_ids,
+    }
 
 @router.post("/availability", response_model=AvailabilityResponse)
 async def create_availability(
@@ -273,33 +482,25 @@ async def create_availability(
     """
     Create a new availability record
     """
-    db = get_database()
-
-    # Check if availability for this day already exists
-    existing = await db.availability.find_one({
-        "employee_id": str(current_user["_id"]),
-        "day_of_week": availability_data.day_of_week
-    })
-
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Availability for day {availability_data.day_of_week} already exists"
-        )
-
     # Create availability document
     availability_dict = availability_data.dict()
     availability_dict["employee_id"] = str(current_user["_id"])
     availability_dict["created_at"] = datetime.utcnow()
     availability_dict["updated_at"] = datetime.utcnow()
 
-    # Insert availability into database
-    result = await db.availability.insert_one(availability_dict)
-
-    # Get the created availability
-    created_availability = await db.availability.find_one({"_id": result.inserted_id})
+    # Insert availability into database; the unique (employee_id, day_of_week)
+    # index rejects a day that already exists
+    try:
+        async with versions.changes(versions.AVAILABILITY, [availability_dict["employee_id"]]):
+            created_availability = await availability_repo.insert(availability_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Availability for day {availability_data.day_of_week} already exists"
+        )
+    availability_index.update(created_availability)
 
-    return created_availability
+    return to_response(created_availability)
 
 @router.put("/availability/{day_of_week}", response_model=AvailabilityResponse)
 async def update_availability(
@@ -310,8 +511,6 @@ async def update_availability(
     """
     Update availability for a specific day
     """
-    db = get_database()
-
     # Validate day of week
     if day_of_week < 0 or day_of_week > 6:
         raise HTTPException(
@@ -319,37 +518,12 @@ async def update_availability(
             detail="Day of week must be between 0 (Sunday) and 6 (Saturday)"
         )
 
-    # Check if availability exists
-    existing = await db.availability.find_one({
-        "employee_id": str(current_user["_id"]),
-        "day_of_week": day_of_week
-    })
-
-    if not existing:
-        # Create new availability if it doesn't exist
-        availability_dict = availability_data.dict()
-        availability_dict["employee_id"] = str(current_user["_id"])
-        availability_dict["day_of_week"] = day_of_week
-        availability_dict["created_at"] = datetime.utcnow()
-        availability_dict["updated_at"] = datetime.utcnow()
-
-        result = await db.availability.insert_one(availability_dict)
-        updated_availability = await db.availability.find_one({"_id": result.inserted_id})
-    else:
-        # Update existing availability
-        update_data = availability_data.dict()
-        update_data["updated_at"] = datetime.utcnow()
-
-        await db.availability.update_one(
-            {"employee_id": str(current_user["_id"]), "day_of_week": day_of_week},
-            {"$set": update_data}
+    # Create the day if it doesn't exist, otherwise update it, in one round trip
+    async with versions.changes(versions.AVAILABILITY, [str(current_user["_id"])]):
+        updated_availability = await availability_repo.upsert_day(
+            str(current_user["_id"]), day_of_week, availability_data.dict()
         )
-
-        updated_availability = await db.availability.find_one({
-            "employee_id": str(current_user["_id"]),
-            "day_of_week": day_of_week
-        })
+    availability_index.update(updated_availability)
 
     # Map Mongo document to Pydantic model
-    data = {**updated_availability, 'id': str(updated_availability['_id'])}
-    return AvailabilityResponse.model_validate(data)
+    return AvailabilityResponse.model_validate(to_response(updated_availability))
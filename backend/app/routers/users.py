@@ -1,38 +1,73 @@
+import os
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
 
-from app.utils.database import get_database
-from app.schemas.user import UserCreate, UserUpdate, UserResponse
-from app.services.auth import get_current_active_user, get_password_hash
+from app.schemas.user import ASSIGNMENT_FIELDS, UserCreate, UserUpdate, UserResponse, UserDirectoryEntry
+from app.schemas.pagination import Page
+from app.repositories import users as users_repo
+from app.repositories.base import to_response, to_responses
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginated
+from app.services.auth import get_current_active_user, get_password_hash_async
+from app.services.permissions import MANAGE_USERS, has_permission, require_permission
+from app.services.principal_cache import principal_cache
+from app.services.user_directory import user_directory
+from app.services import versions
+from app.utils.roundtrips import AUTH_ROUNDTRIPS, roundtrip_budget
+
+# Load environment variables
+load_dotenv()
+
+# Autocomplete answers at most this many suggestions
+USER_AUTOCOMPLETE_LIMIT = int(os.getenv("USER_AUTOCOMPLETE_LIMIT", "10"))
 
 router = APIRouter()
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=Union[List[UserResponse], Page[UserResponse]])
+@roundtrip_budget(AUTH_ROUNDTRIPS + 1)
 async def get_users(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100,
-    current_user = Depends(get_current_active_user)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    current_user = Depends(require_permission(MANAGE_USERS))
 ):
     """
-    Get all users (admin only)
+    Get all users (manage_users permission).
+    `q` matches the start of a first name, last name, full name or email; with
+    `q`, `role` or `is_active` users are ordered by last then first name.
+    `skip` is kept for existing callers; `cursor` pages in constant time at any depth.
     """
-    # Check if user is admin
-    if current_user.get("role") != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    
-    db = get_database()
-    users = await db.users.find().skip(skip).limit(limit).to_list(length=limit)
-    
-    # Convert ObjectId to string for each user
-    for user in users:
-        user["id"] = str(user["_id"])
-    
-    return users
+    query = users_repo.directory_filter(q, role, is_active)
+    if query:
+        users, next_cursor = await users_repo.search_page(query, limit, cursor)
+        return paginated(response, to_responses(users), next_cursor, cursor)
+
+    if skip and cursor is None:
+        users = await users_repo.list_users(skip, limit)
+        return to_responses(users)
+
+    users, next_cursor = await users_repo.list_page(limit, cursor)
+    return paginated(response, to_responses(users), next_cursor, cursor)
+
+@router.get("/autocomplete", response_model=List[UserDirectoryEntry])
+async def autocomplete_users(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(USER_AUTOCOMPLETE_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    current_user = Depends(require_permission(MANAGE_USERS))
+):
+    """
+    Suggest users whose name or email starts with q, from the in-memory directory (manage_users permission)
+    """
+    return user_directory.complete(q, limit, role, is_active)
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
@@ -42,15 +77,13 @@ async def get_user(
     """
     Get a specific user by ID
     """
-    # Check if user is admin or the requested user
-    if current_user.get("role") != "admin" and str(current_user.get("_id")) != user_id:
+    # Users may read themselves; anyone else needs manage_users
+    if not has_permission(current_user, MANAGE_USERS) and str(current_user.get("_id")) != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
-    db = get_database()
-    
     # Validate ObjectId
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -58,7 +91,7 @@ async def get_user(
             detail="Invalid user ID"
         )
     
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await users_repo.find_by_id(user_id)
     
     if user is None:
         raise HTTPException(
@@ -66,38 +99,18 @@ async def get_user(
             detail="User not found"
         )
     
-    # Convert ObjectId to string for response
-    user["id"] = str(user["_id"])
-    
-    return user
+    return to_response(user)
 
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user_data: UserCreate,
-    current_user = Depends(get_current_active_user)
+    current_user = Depends(require_permission(MANAGE_USERS))
 ):
     """
-    Create a new user (admin only)
+    Create a new user (manage_users permission)
     """
-    # Check if user is admin
-    if current_user.get("role") != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    
-    db = get_database()
-    
-    # Check if email already exists
-    existing_user = await db.users.find_one({"email": user_data.email})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
     # Hash the password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     # Create user document
     user_dict = user_data.dict(exclude={"password"})
@@ -106,16 +119,17 @@ async def create_user(
     user_dict["updated_at"] = datetime.utcnow()
     user_dict["is_active"] = True
     
-    # Insert user into database
-    result = await db.users.insert_one(user_dict)
-    
-    # Get the created user
-    created_user = await db.users.find_one({"_id": result.inserted_id})
-    
-    # Convert ObjectId to string for response
-    created_user["id"] = str(created_user["_id"])
+    # Insert user into database; the unique email index rejects duplicates
+    try:
+        created_user = await users_repo.insert(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    user_directory.update(created_user)
     
-    return created_user
+    return to_response(created_user)
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
@@ -126,22 +140,22 @@ async def update_user(
     """
     Update a user
     """
-    # Check if user is admin or the user being updated
-    if current_user.get("role") != "admin" and str(current_user.get("_id")) != user_id:
+    # Users may update themselves; anyone else needs manage_users
+    if not has_permission(current_user, MANAGE_USERS) and str(current_user.get("_id")) != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
-    # Regular users can't change their role
-    if current_user.get("role") != "admin" and user_data.role is not None:
+    # Regular users can't change their role, locations, job roles or team
+    if not has_permission(current_user, MANAGE_USERS) and any(
+        getattr(user_data, field) is not None for field in ASSIGNMENT_FIELDS
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions to change role"
+            detail="Not enough permissions to change role or assignments"
         )
     
-    db = get_database()
-    
     # Validate ObjectId
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -149,57 +163,35 @@ async def update_user(
             detail="Invalid user ID"
         )
     
-    # Check if user exists
-    existing_user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if not existing_user:
+    # Update user; the unique email index rejects an email that is already taken
+    update_data = {k: v for k, v in user_data.dict(exclude_unset=True).items() if v is not None}
+    try:
+        async with versions.changes(versions.PROFILE, [user_id]):
+            updated_user = await users_repo.update(user_id, update_data)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    
+    if updated_user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    principal_cache.invalidate_user(user_id)
+    user_directory.update(updated_user)
     
-    # Check if email is being changed and if it's already taken
-    if user_data.email is not None and user_data.email != existing_user.get("email"):
-        email_user = await db.users.find_one({"email": user_data.email})
-        if email_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-    
-    # Update user
-    update_data = {k: v for k, v in user_data.dict(exclude_unset=True).items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow()
-    
-    await db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": update_data}
-    )
-    
-    # Get updated user
-    updated_user = await db.users.find_one({"_id": ObjectId(user_id)})
-    
-    # Convert ObjectId to string for response
-    updated_user["id"] = str(updated_user["_id"])
-    
-    return updated_user
+    return to_response(updated_user)
 
 @router.delete("/{user_id}", response_model=UserResponse)
 async def delete_user(
     user_id: str,
-    current_user = Depends(get_current_active_user)
+    current_user = Depends(require_permission(MANAGE_USERS))
 ):
     """
-    Deactivate a user (admin only)
+    Deactivate a user (manage_users permission)
     """
-    # Check if user is admin
-    if current_user.get("role") != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    
-    db = get_database()
-    
     # Validate ObjectId
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -207,24 +199,15 @@ async def delete_user(
             detail="Invalid user ID"
         )
     
-    # Check if user exists
-    existing_user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if not existing_user:
+    # Deactivate user instead of deleting (soft delete)
+    async with versions.changes(versions.PROFILE, [user_id]):
+        updated_user = await users_repo.deactivate(user_id)
+    if updated_user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    principal_cache.invalidate_user(user_id)
+    user_directory.update(updated_user)
     
-    # Deactivate user instead of deleting (soft delete)
-    await db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
-    )
-    
-    # Get updated user
-    updated_user = await db.users.find_one({"_id": ObjectId(user_id)})
-    
-    # Convert ObjectId to string for response
-    updated_user["id"] = str(updated_user["_id"])
-    
-    return updated_user
+    return to_response(updated_user)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Any, Optional
+from pydantic import BaseModel
+
+class JobCreate(BaseModel):
+    kind: str
+    payload: dict = {}
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_by: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    run_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import List, Optional
+from pydantic import BaseModel, Field, validator
 
 class NotificationBase(BaseModel):
     message: str
@@ -29,3 +29,41 @@ class NotificationResponse(NotificationBase):
 
     class Config:
         orm_mode = True
+
+class UnreadCount(BaseModel):
+    unread: int
+
+class MarkAllReadResult(BaseModel):
+    updated: int
+
+class NotificationFanoutCreate(BaseModel):
+    message: str
+    roles: Optional[List[str]] = None
+    locations: Optional[List[str]] = None
+    teams: Optional[List[str]] = None
+
+    @validator('teams', always=True)
+    def selector_required(cls, v, values):
+        if not (v or values.get('roles') or values.get('locations')):
+            raise ValueError('At least one of roles, locations or teams is required')
+        return v
+
+class NotificationFanoutResponse(BaseModel):
+    id: str
+    message: str
+    selector: dict
+    status: str
+    total: int
+    delivered: int
+    failed: int
+    retries: int
+    chunks_done: int
+    errors: List[str]
+    created_by: str
+    created_at: datetime
+    updated_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    per_second: Optional[float] = None
+    last_error: Optional[str] = None
@@ -3,12 +3,24 @@ from typing import Optional, List
 from pydantic import BaseModel, Field, validator
 from bson import ObjectId
 
+from app.utils.dates import MAX_SHIFT, SCHEDULE_MAX_SHIFT_HOURS, parse_datetime
+
+def shift_not_too_long(cls, v, values):
+    if v and values.get('start_time') and v - values['start_time'] > MAX_SHIFT:
+        raise ValueError(f'Shifts cannot be longer than {SCHEDULE_MAX_SHIFT_HOURS} hours')
+    return v
+
 class ScheduleBase(BaseModel):
     start_time: datetime
     end_time: datetime
     location: str
     role: str
 
+    @validator('start_time', 'end_time')
+    def times_to_naive_utc(cls, v):
+        # Stored shifts are naive UTC; offset-aware input could not be compared with them
+        return parse_datetime(v)
+
 class ScheduleCreate(ScheduleBase):
     employee_id: str
 
@@ -18,6 +30,8 @@ class ScheduleCreate(ScheduleBase):
             raise ValueError('End time must be after start time')
         return v
 
+    _shift_not_too_long = validator('end_time', allow_reuse=True)(shift_not_too_long)
+
 class ScheduleUpdate(BaseModel):
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
@@ -25,12 +39,18 @@ class ScheduleUpdate(BaseModel):
     role: Optional[str] = None
     status: Optional[str] = None
 
+    @validator('start_time', 'end_time')
+    def times_to_naive_utc(cls, v):
+        return parse_datetime(v) if v is not None else v
+
     @validator('end_time')
     def end_time_must_be_after_start_time(cls, v, values):
         if v and 'start_time' in values and values['start_time'] and v <= values['start_time']:
             raise ValueError('End time must be after start time')
         return v
 
+    _shift_not_too_long = validator('end_time', allow_reuse=True)(shift_not_too_long)
+
 class ScheduleInDB(ScheduleBase):
     id: str = Field(..., alias="_id")
     employee_id: str
@@ -59,6 +79,9 @@ class TimeOffRequestBase(BaseModel):
 
     @validator('start_date', 'end_date')
     def validate_date_format(cls, v):
+        if isinstance(v, datetime):
+            # Stored documents hold native datetimes
+            return v
         try:
             # Try to parse the date string to ensure it's valid
             datetime.fromisoformat(v.replace('Z', '+00:00'))
@@ -78,6 +101,8 @@ class TimeOffRequestUpdate(BaseModel):
 
 class TimeOffRequestInDB(TimeOffRequestBase):
     id: str = Field(..., alias="_id")
+    start_date: datetime
+    end_date: datetime
     employee_id: str
     status: str
     created_at: datetime
@@ -89,6 +114,8 @@ class TimeOffRequestInDB(TimeOffRequestBase):
 
 class TimeOffRequestResponse(TimeOffRequestBase):
     id: str
+    start_date: datetime
+    end_date: datetime
     employee_id: str
     status: str
     created_at: datetime
@@ -143,3 +170,110 @@ class AvailabilityResponse(AvailabilityBase):
 
     class Config:
         orm_mode = True
+
+class StaffingDemand(BaseModel):
+    location: str
+    role: str
+    start_time: datetime
+    end_time: datetime
+    headcount: int = 1
+
+    @validator('start_time', 'end_time')
+    def times_to_naive_utc(cls, v):
+        return parse_datetime(v)
+
+    @validator('end_time')
+    def end_time_must_be_after_start_time(cls, v, values):
+        if 'start_time' in values and v <= values['start_time']:
+            raise ValueError('End time must be after start time')
+        return v
+
+    _shift_not_too_long = validator('end_time', allow_reuse=True)(shift_not_too_long)
+
+    @validator('headcount')
+    def headcount_must_be_positive(cls, v):
+        if v < 1:
+            raise ValueError('Headcount must be at least 1')
+        return v
+
+class ScheduleGenerationRequest(BaseModel):
+    horizon_start: datetime
+    horizon_end: datetime
+    demands: List[StaffingDemand]
+    employee_roles: List[str] = ["employee"]
+    max_hours_per_employee: Optional[float] = None
+    # Employees with no locations (or no job roles) are only candidates when set
+    include_unassigned: bool = False
+    publish: bool = False
+    dry_run: bool = False
+
+    @validator('horizon_start', 'horizon_end')
+    def horizon_to_naive_utc(cls, v):
+        # Compared with stored shifts and time-off, which are naive UTC
+        return parse_datetime(v)
+
+    @validator('horizon_end')
+    def horizon_end_must_be_after_start(cls, v, values):
+        if 'horizon_start' in values and v <= values['horizon_start']:
+            raise ValueError('Horizon end must be after horizon start')
+        return v
+
+    @validator('demands')
+    def demands_within_horizon(cls, v, values):
+        # Conflicts are only checked inside the horizon
+        start, end = values.get('horizon_start'), values.get('horizon_end')
+        if start is None or end is None:
+            return v
+        for i, demand in enumerate(v):
+            if demand.start_time < start or demand.end_time > end:
+                raise ValueError(f'Demand {i} is not within the horizon')
+        return v
+
+class UnfilledDemand(BaseModel):
+    location: str
+    role: str
+    start_time: datetime
+    end_time: datetime
+    requested: int
+    assigned: int
+
+class ScheduleGenerationResult(BaseModel):
+    employees_considered: int
+    demands: int
+    shifts_assigned: int
+    shifts_created: int
+    unfilled: List[UnfilledDemand]
+
+class ScheduleBulkCreate(BaseModel):
+    shifts: List[ScheduleCreate]
+    publish: bool = False
+
+class ScheduleRowError(BaseModel):
+    index: int
+    error: str
+    conflicts_with: Optional[str] = None
+
+class ScheduleBulkResult(BaseModel):
+    created: int
+    failed: int
+    ids: List[Optional[str]]
+    errors: List[ScheduleRowError]
+
+class AvailableEmployees(BaseModel):
+    day_of_week: int
+    start_time: str
+    end_time: str
+    location: Optional[str] = None
+    count: int
+    employee_ids: List[str]
+
+class CoverageCell(BaseModel):
+    role: str
+    hour: datetime
+    headcount: int
+    published: int
+
+class CoverageHeatmap(BaseModel):
+    location: str
+    week_start: datetime
+    cells: List[CoverageCell]
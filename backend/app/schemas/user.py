@@ -3,11 +3,25 @@ from typing import Optional, List
 from pydantic import BaseModel, EmailStr, Field, validator
 import re
 
+# Fields only users with the manage_users permission may change, on anyone
+ASSIGNMENT_FIELDS = ("role", "locations", "job_roles", "team")
+
+def assignment_not_blank(cls, v):
+    v = v.strip()
+    if not v:
+        raise ValueError('Locations and job roles cannot be blank')
+    return v
+
 class UserBase(BaseModel):
     email: EmailStr
     first_name: str
     last_name: str
     role: str
+    # Where and as what the user works; shift generation, availability search and
+    # notification fan-outs only match users whose lists name the location or role
+    locations: List[str] = []
+    job_roles: List[str] = []
+    team: Optional[str] = None
 
     @validator('role')
     def validate_role(cls, v):
@@ -18,6 +32,10 @@ class UserBase(BaseModel):
         # Make sure we don't override the original value
         return v
 
+    _assignment_not_blank = validator('locations', 'job_roles', each_item=True, allow_reuse=True)(
+        assignment_not_blank
+    )
+
 class UserCreate(UserBase):
     password: str
 
@@ -49,6 +67,13 @@ class UserUpdate(BaseModel):
     last_name: Optional[str] = None
     role: Optional[str] = None
     is_active: Optional[bool] = None
+    locations: Optional[List[str]] = None
+    job_roles: Optional[List[str]] = None
+    team: Optional[str] = None
+
+    _assignment_not_blank = validator('locations', 'job_roles', each_item=True, allow_reuse=True)(
+        assignment_not_blank
+    )
 
 class UserInDB(UserBase):
     id: str = Field(..., alias="_id")
@@ -69,6 +94,14 @@ class UserResponse(UserBase):
     class Config:
         orm_mode = True
 
+class UserDirectoryEntry(BaseModel):
+    id: str
+    first_name: str
+    last_name: str
+    email: str
+    role: str
+    is_active: bool
+
 class RoleBase(BaseModel):
     name: str
     permissions: List[str]
@@ -9,6 +9,13 @@ from dotenv import load_dotenv
 
 from app.utils.database import get_database
 from app.schemas.auth import TokenPayload
+from app.services.principal_cache import principal_cache
+from app.services.session_activity import session_activity
+from app.services.revocation import revocations
+from app.utils.tokens import token_digest
+from app.utils.worker_pool import BoundedWorkerPool, PoolSaturated
+from app.utils.indexes import register_index, register_query_shape
+from app.repositories import users as users_repo
 
 # Load environment variables
 load_dotenv()
@@ -20,27 +27,46 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 SESSION_TIMEOUT_MINUTES = 30  # inactivity timeout
 
+# Password hashing pool settings
+PASSWORD_HASH_POOL = os.getenv("PASSWORD_HASH_POOL", "thread")  # thread or process
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "2"))
+
+# Indexes backing the session lookups. Sessions outlive their access token only
+# as long as the refresh token could still reference them.
+register_index("sessions", "access_token")
+register_index("sessions", "created_at", expireAfterSeconds=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600)
+register_query_shape("sessions", {"access_token": "token"})
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt runs here instead of on the event loop
+password_pool = BoundedWorkerPool(PASSWORD_HASH_POOL, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE)
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+# Streams also accept the token as a query parameter, so the header is optional there
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
 # --------------------
 # Token blacklist utils
 # --------------------
 
 async def is_token_blacklisted(token: str) -> bool:
-    """Check if a token is in the blacklist collection"""
-    db = get_database()
-    blk = await db.token_blacklist.find_one({"token": token})
-    return blk is not None
+    """Check if a token is in the in-memory revocation set"""
+    return revocations.contains(token_digest(token))
 
 async def blacklist_token(token: str, expires_at: datetime):
     """Add a token to the blacklist so it can't be used again"""
+    principal_cache.invalidate_token(token)
+    digest = token_digest(token)
+    revocations.add(digest, expires_at)
     db = get_database()
+    # Only the digest is stored; the TTL index on expires_at reclaims the entry
     await db.token_blacklist.insert_one({
-        "token": token,
+        "token_digest": digest,
         "expires_at": expires_at,
         "created_at": datetime.utcnow()
     })
@@ -56,14 +82,21 @@ async def create_session(user_id: str, access_token: str, refresh_token: str):
     })
 
 async def delete_session_by_token(token: str):
+    principal_cache.invalidate_token(token)
+    session_activity.discard(token)
     db = get_database()
     await db.sessions.delete_one({"access_token": token})
 
 async def touch_session(token: str):
-    db = get_database()
-    await db.sessions.update_one({"access_token": token}, {"$set": {"last_activity": datetime.utcnow()}})
+    # Buffered and written behind in bulk by the session activity flusher
+    session_activity.touch(token)
 
 async def is_session_expired(token: str) -> bool:
+    # Activity not yet flushed is always newer than what the database holds
+    pending = session_activity.pending(token)
+    if pending is not None:
+        return datetime.utcnow() - pending > timedelta(minutes=SESSION_TIMEOUT_MINUTES)
+
     db = get_database()
     sess = await db.sessions.find_one({"access_token": token})
     if not sess:
@@ -73,6 +106,13 @@ async def is_session_expired(token: str) -> bool:
         return False
     return datetime.utcnow() - last > timedelta(minutes=SESSION_TIMEOUT_MINUTES)
 
+async def expire_session(token: str):
+    """
+    Revoke a token whose session timed out and remove the session record
+    """
+    await blacklist_token(token, datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    await delete_session_by_token(token)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a password against a hash
@@ -85,6 +125,34 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+async def _run_in_password_pool(fn, *args):
+    try:
+        return await password_pool.run(fn, *args)
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+        )
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against a hash without blocking the event loop
+    """
+    return await _run_in_password_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hash a password without blocking the event loop
+    """
+    return await _run_in_password_pool(get_password_hash, password)
+
+def shutdown_password_pool():
+    """
+    Release the password hashing pool when the application shuts down
+    """
+    password_pool.shutdown()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a new access token
@@ -122,6 +190,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    # Warm path: a recently verified principal needs no Mongo round trips
+    cached = principal_cache.get(token)
+    if cached is not None:
+        # Logouts on other workers reach the revocation set before the cache TTL runs out
+        if await is_token_blacklisted(token):
+            principal_cache.invalidate_token(token)
+            raise credentials_exception
+        now = datetime.utcnow()
+        if now - cached.last_activity > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
+            await expire_session(token)
+            raise credentials_exception
+        cached.last_activity = now
+        await touch_session(token)
+        return dict(cached.user)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -138,16 +221,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 
     # Check session timeout
     if await is_session_expired(token):
-        await blacklist_token(token, datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-        await delete_session_by_token(token)
+        await expire_session(token)
         raise credentials_exception
 
     await touch_session(token)
 
-    db = get_database()
-    # Convert string ID to ObjectId for MongoDB query
-    from bson import ObjectId
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await users_repo.find_by_id(user_id)
 
     if user is None:
         raise credentials_exception
@@ -158,7 +237,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             detail="Inactive user"
         )
 
-    return user
+    principal_cache.put(token, payload, user, datetime.utcnow())
+    return dict(user)
+
+async def authenticate_stream(token: Optional[str]):
+    """
+    Authenticate a long-lived stream once, when it connects. Browsers'
+    EventSource cannot set headers, so the token may come from the query string.
+    """
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_active_user(await get_current_user(token))
 
 async def get_current_active_user(current_user = Depends(get_current_user)):
     """
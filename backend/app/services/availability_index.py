@@ -0,0 +1,187 @@
+"""
+In-memory "who is available" index.
+
+Every availability day carries a packed 672-bit week-slot mask (slot_mask).
+Each worker keeps, per week slot, a bitset over employee ordinals of who is
+available in that slot, so "who can work Tuesday 14:00-18:00" is a bitwise
+AND of 16 integers instead of loading and parsing every employee's days.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.repositories import availability as availability_repo
+from app.utils.slots import SLOTS_PER_WEEK, availability_mask, mask_from_bytes, mask_to_bytes
+
+# Load environment variables
+load_dotenv()
+
+# How often each worker picks up availability written by other workers
+AVAILABILITY_INDEX_REFRESH_SECONDS = float(os.getenv("AVAILABILITY_INDEX_REFRESH_SECONDS", "30"))
+# Re-read this far behind the newest updated_at seen to tolerate clock skew between workers
+AVAILABILITY_INDEX_OVERLAP_SECONDS = float(os.getenv("AVAILABILITY_INDEX_OVERLAP_SECONDS", "10"))
+
+
+def _set_bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _doc_mask(doc: dict) -> Tuple[int, bool]:
+    """
+    Return a document's week mask and whether it had to be compiled from its times
+    """
+    stored = doc.get("slot_mask")
+    if stored is not None:
+        return mask_from_bytes(bytes(stored)), False
+    if not doc.get("is_available", True):
+        return 0, True
+    return availability_mask(doc["day_of_week"], doc["start_time"], doc["end_time"]), True
+
+
+class AvailabilityIndex:
+    """
+    Week-slot -> employee bitset inverted index
+    """
+
+    def __init__(self):
+        self._ordinals: Dict[str, int] = {}
+        self._employee_ids: List[str] = []
+        self._day_masks: Dict[Tuple[str, int], int] = {}
+        self._weekly: Dict[str, int] = {}
+        self._slots: List[int] = [0] * SLOTS_PER_WEEK
+        self._last_seen: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ordinal(self, employee_id: str) -> int:
+        ordinal = self._ordinals.get(employee_id)
+        if ordinal is None:
+            ordinal = len(self._employee_ids)
+            self._ordinals[employee_id] = ordinal
+            self._employee_ids.append(employee_id)
+        return ordinal
+
+    def set_day(self, employee_id: str, day_of_week: int, mask: int):
+        """
+        Replace one employee's mask for one day, touching only the slots that changed
+        """
+        if self._day_masks.get((employee_id, day_of_week), 0) == mask:
+            return
+        self._day_masks[(employee_id, day_of_week)] = mask
+        # Overnight windows spill into the next day, so recombine the whole week
+        weekly = 0
+        for day in range(7):
+            weekly |= self._day_masks.get((employee_id, day), 0)
+        previous = self._weekly.get(employee_id, 0)
+        if weekly == previous:
+            return
+        self._weekly[employee_id] = weekly
+        bit = 1 << self._ordinal(employee_id)
+        for slot in _set_bits(weekly & ~previous):
+            self._slots[slot] |= bit
+        for slot in _set_bits(previous & ~weekly):
+            self._slots[slot] &= ~bit
+
+    def update(self, doc: dict):
+        """
+        Apply a stored availability document
+        """
+        mask, _ = _doc_mask(doc)
+        self.set_day(doc["employee_id"], doc["day_of_week"], mask)
+        updated_at = doc.get("updated_at")
+        if updated_at and (self._last_seen is None or updated_at > self._last_seen):
+            self._last_seen = updated_at
+
+    def update_many(self, docs: List[dict]):
+        for doc in docs:
+            self.update(doc)
+
+    def available(self, mask: int) -> List[str]:
+        """
+        Ids of employees available in every week slot of mask
+        """
+        if not mask:
+            return []
+        result = -1
+        for slot in _set_bits(mask):
+            result &= self._slots[slot]
+            if not result:
+                return []
+        return [self._employee_ids[ordinal] for ordinal in _set_bits(result)]
+
+    async def _ingest(self, since: Optional[datetime] = None):
+        backfill = []
+        async for doc in availability_repo.stream_masks(since):
+            mask, compiled = _doc_mask(doc)
+            if compiled:
+                backfill.append((doc["_id"], mask_to_bytes(mask)))
+            self.update(doc)
+        # Days written before masks were stored get theirs persisted once
+        await availability_repo.set_slot_masks(backfill)
+
+    async def load(self):
+        """
+        Build the index from every availability document
+        """
+        await self._ingest()
+        if self._last_seen is None:
+            self._last_seen = datetime.utcnow()
+
+    async def refresh(self):
+        """
+        Pick up availability updated since the last refresh
+        """
+        since = self._last_seen - timedelta(seconds=AVAILABILITY_INDEX_OVERLAP_SECONDS)
+        await self._ingest(since)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(AVAILABILITY_INDEX_REFRESH_SECONDS)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Availability index refresh error: {e}")
+
+    async def start(self):
+        """
+        Warm the index and start the background refresher
+        """
+        await self.load()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background refresher
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self) -> int:
+        return len(self._weekly)
+
+
+availability_index = AvailabilityIndex()
+
+
+async def start_availability_index():
+    """
+    Warm the availability index when the application starts
+    """
+    await availability_index.start()
+
+
+async def stop_availability_index():
+    """
+    Stop availability index refreshes when the application shuts down
+    """
+    await availability_index.stop()
@@ -0,0 +1,184 @@
+"""
+Staffing-coverage rollups.
+
+coverage_rollups holds one document per (location, role, hour) with the
+number of shifts overlapping that hour: headcount counts every shift that
+is not cancelled or rejected, published only approved ones. Shift writes
+apply $inc deltas so dashboards read the rollup instead of aggregating
+schedules; `python -m app.services.coverage rebuild` recomputes it from
+scratch with one aggregation pipeline.
+"""
+import asyncio
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from pymongo import UpdateOne
+
+from app.utils.database import get_database
+from app.utils.indexes import register_index, register_query_shape
+
+# Shifts in these statuses no longer occupy anyone
+INACTIVE_STATUSES = ("cancelled", "rejected")
+PUBLISHED_STATUS = "approved"
+
+HOUR = timedelta(hours=1)
+
+register_index("coverage_rollups", [("location", 1), ("hour", 1), ("role", 1)], unique=True)
+register_query_shape("coverage_rollups", {"location": "store", "hour": {"$gte": datetime(2024, 1, 1),
+                                                                        "$lt": datetime(2024, 1, 8)}})
+
+Key = Tuple[str, str, datetime]
+
+
+def hour_buckets(start: datetime, end: datetime) -> List[datetime]:
+    """
+    Start of every hour that [start, end) overlaps
+    """
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    buckets = []
+    while hour < end:
+        buckets.append(hour)
+        hour += HOUR
+    return buckets
+
+
+def _contribution(shift: Optional[dict]) -> Dict[Key, Tuple[int, int]]:
+    if not shift or shift.get("status") in INACTIVE_STATUSES:
+        return {}
+    published = 1 if shift.get("status") == PUBLISHED_STATUS else 0
+    return {
+        (shift["location"], shift["role"], hour): (1, published)
+        for hour in hour_buckets(shift["start_time"], shift["end_time"])
+    }
+
+
+def shift_deltas(before: Optional[dict], after: Optional[dict]) -> Dict[Key, Tuple[int, int]]:
+    """
+    Net (headcount, published) change per bucket when a shift goes from before to after.
+    Pass None for before on creation and for after on deletion.
+    """
+    deltas: Dict[Key, List[int]] = defaultdict(lambda: [0, 0])
+    for key, (headcount, published) in _contribution(after).items():
+        deltas[key][0] += headcount
+        deltas[key][1] += published
+    for key, (headcount, published) in _contribution(before).items():
+        deltas[key][0] -= headcount
+        deltas[key][1] -= published
+    return {key: (d[0], d[1]) for key, d in deltas.items() if d[0] or d[1]}
+
+
+async def apply_deltas(deltas: Dict[Key, Tuple[int, int]]):
+    """
+    Apply bucket deltas with one unordered bulk write of upserting $inc updates
+    """
+    if not deltas:
+        return
+    db = get_database()
+    ops = [
+        UpdateOne(
+            {"location": location, "role": role, "hour": hour},
+            {"$inc": {"headcount": headcount, "published": published}},
+            upsert=True
+        )
+        for (location, role, hour), (headcount, published) in deltas.items()
+    ]
+    await db.coverage_rollups.bulk_write(ops, ordered=False)
+
+
+async def record_changes(changes: Iterable[Tuple[Optional[dict], Optional[dict]]]):
+    """
+    Fold (before, after) shift pairs into one set of deltas and apply it
+    """
+    total: Dict[Key, List[int]] = defaultdict(lambda: [0, 0])
+    for before, after in changes:
+        for key, (headcount, published) in shift_deltas(before, after).items():
+            total[key][0] += headcount
+            total[key][1] += published
+    await apply_deltas({key: (d[0], d[1]) for key, d in total.items() if d[0] or d[1]})
+
+
+async def record_created(shifts: List[dict]):
+    await record_changes((None, shift) for shift in shifts)
+
+
+def rebuild_pipeline() -> List[dict]:
+    """
+    Aggregation that recomputes every rollup document from schedules into coverage_rollups
+    """
+    first_hour = {"$dateTrunc": {"date": "$start_time", "unit": "hour"}}
+    return [
+        {"$match": {"status": {"$nin": list(INACTIVE_STATUSES)}}},
+        {"$project": {
+            "location": 1,
+            "role": 1,
+            "first_hour": first_hour,
+            "published": {"$cond": [{"$eq": ["$status", PUBLISHED_STATUS]}, 1, 0]},
+            "hours": {"$range": [0, {"$toInt": {"$ceil": {"$divide": [
+                {"$subtract": ["$end_time", first_hour]}, 3600 * 1000
+            ]}}}]},
+        }},
+        {"$unwind": "$hours"},
+        {"$group": {
+            "_id": {
+                "location": "$location",
+                "role": "$role",
+                "hour": {"$dateAdd": {"startDate": "$first_hour", "unit": "hour", "amount": "$hours"}},
+            },
+            "headcount": {"$sum": 1},
+            "published": {"$sum": "$published"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "location": "$_id.location",
+            "role": "$_id.role",
+            "hour": "$_id.hour",
+            "headcount": 1,
+            "published": 1,
+        }},
+        {"$out": "coverage_rollups"},
+    ]
+
+
+async def rebuild():
+    """
+    Replace coverage_rollups with a fresh aggregation over schedules.
+    $out swaps the collection atomically and keeps its indexes.
+    """
+    db = get_database()
+    await db.schedules.aggregate(rebuild_pipeline(), allowDiskUse=True).to_list(length=None)
+
+
+async def heatmap(week_start: datetime, location: str, role: Optional[str] = None) -> List[dict]:
+    """
+    Non-empty rollup cells of a location for the week starting at week_start
+    """
+    db = get_database()
+    query = {
+        "location": location,
+        "hour": {"$gte": week_start, "$lt": week_start + timedelta(days=7)},
+        "headcount": {"$gt": 0},
+    }
+    if role is not None:
+        query["role"] = role
+    cursor = db.coverage_rollups.find(query, {"_id": 0}).sort([("hour", 1), ("role", 1)])
+    return await cursor.to_list(length=None)
+
+
+async def _main(args) -> int:
+    from app.utils.database import connect_to_mongo, close_mongo_connection
+
+    if args != ["rebuild"]:
+        print("Usage: python -m app.services.coverage rebuild")
+        return 2
+    await connect_to_mongo()
+    try:
+        await rebuild()
+        print("Coverage rollups rebuilt")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
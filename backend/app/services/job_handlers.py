@@ -0,0 +1,55 @@
+"""
+Handlers for the background job kinds. Importing this module registers them.
+"""
+from app.schemas.schedule import ScheduleGenerationRequest
+from app.services import coverage
+from app.services.jobs import job_handler
+from app.services.migrations import MIGRATIONS
+from app.services.notification_fanout import run_fanout
+from app.services.notifications import reconcile_unread_counters
+from app.services.scheduling_engine import generate_schedules
+from app.utils import indexes
+
+# Kinds an admin may enqueue directly through the jobs API
+MAINTENANCE_JOB_KINDS = ("ensure_indexes", "coverage_rebuild", "migration", "reconcile_unread_counters")
+
+
+@job_handler("notification_fanout")
+async def notification_fanout(payload: dict):
+    await run_fanout(payload["fanout_id"])
+    return {"fanout_id": payload["fanout_id"]}
+
+
+@job_handler("schedule_generation")
+async def schedule_generation(payload: dict):
+    return await generate_schedules(ScheduleGenerationRequest(**payload["request"]),
+                                    generation_id=payload.get("generation_id"))
+
+
+@job_handler("ensure_indexes")
+async def ensure_indexes(payload: dict):
+    summary = await indexes.ensure_indexes()
+    if summary["failed"]:
+        raise RuntimeError(f"Index builds failed: {summary['failed']}")
+    return summary
+
+
+@job_handler("coverage_rebuild")
+async def coverage_rebuild(payload: dict):
+    await coverage.rebuild()
+    return {"rebuilt": True}
+
+
+@job_handler("migration")
+async def migration(payload: dict):
+    name = payload.get("name")
+    if name not in MIGRATIONS:
+        raise ValueError(f"Unknown migration: {name}")
+    kwargs = {"batch_size": payload["batch_size"]} if payload.get("batch_size") else {}
+    return await MIGRATIONS[name](**kwargs)
+
+
+@job_handler("reconcile_unread_counters")
+async def reconcile_counters(payload: dict):
+    kwargs = {"batch_size": payload["batch_size"]} if payload.get("batch_size") else {}
+    return await reconcile_unread_counters(**kwargs)
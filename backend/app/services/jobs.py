@@ -0,0 +1,277 @@
+"""
+Durable background jobs stored in the jobs collection.
+
+Workers claim a job atomically with find_one_and_update, which marks it
+running and gives it a lease. A worker keeps extending the lease while the
+handler runs. If the worker dies, the lease expires and the job becomes
+claimable again; this is the visibility timeout. A worker that can no
+longer extend a lease cancels the handler, so two workers never run the
+same job for long. Failed attempts are retried with exponential backoff
+until max_attempts.
+
+Workers run inside the API process (JOB_WORKER_IN_PROCESS) and/or as a
+separate process: python worker.py
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+
+from app.utils.database import get_database
+from app.utils.indexes import register_index, register_query_shape
+from app.repositories.base import object_id
+
+# Load environment variables
+load_dotenv()
+
+JOB_WORKER_IN_PROCESS = os.getenv("JOB_WORKER_IN_PROCESS", "true").lower() == "true"
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_VISIBILITY_TIMEOUT_SECONDS = float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+
+# Claiming looks up due queued jobs and running jobs whose lease expired
+register_index("jobs", [("status", 1), ("run_at", 1)])
+register_query_shape("jobs", {"status": "queued", "run_at": {"$lte": datetime(2024, 1, 1)}}, sort=[("run_at", 1)])
+register_index("jobs", [("status", 1), ("lease_until", 1)])
+register_query_shape("jobs", {"status": "running", "lease_until": {"$lte": datetime(2024, 1, 1)}})
+register_index("jobs", [("created_by", 1), ("created_at", -1), ("_id", -1)])
+
+JobHandler = Callable[[dict], Awaitable[Any]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    """
+    Register the coroutine that runs jobs of the given kind. It receives the
+    job's payload and its return value is stored as the job's result.
+    """
+    def decorator(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+async def enqueue(kind: str, payload: Optional[dict] = None, created_by: Optional[str] = None,
+                  max_attempts: int = JOB_MAX_ATTEMPTS, delay_seconds: float = 0) -> dict:
+    """
+    Store a queued job and return it
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    db = get_database()
+    now = datetime.utcnow()
+    job = {
+        "kind": kind,
+        "payload": payload or {},
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": now + timedelta(seconds=delay_seconds),
+        "lease_until": None,
+        "worker_id": None,
+        "result": None,
+        "error": None,
+        "created_by": created_by,
+        "created_at": now,
+        "updated_at": now,
+    }
+    result = await db.jobs.insert_one(job)
+    job["_id"] = result.inserted_id
+    return job
+
+
+async def find_job(job_id) -> Optional[dict]:
+    db = get_database()
+    return await db.jobs.find_one({"_id": object_id(job_id)})
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff before the next attempt, after the given number of attempts
+    """
+    return min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+
+class JobWorker:
+    """
+    Runs up to `concurrency` jobs at a time from the jobs collection
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, kinds: Optional[List[str]] = None):
+        self.concurrency = concurrency
+        self.kinds = kinds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        self.lost = 0
+
+    def _kinds(self) -> List[str]:
+        return self.kinds if self.kinds is not None else list(JOB_HANDLERS)
+
+    async def claim(self) -> Optional[dict]:
+        """
+        Atomically take the oldest due job, or one whose lease expired
+        """
+        db = get_database()
+        now = datetime.utcnow()
+        return await db.jobs.find_one_and_update(
+            {
+                "kind": {"$in": self._kinds()},
+                "$or": [
+                    {"status": "queued", "run_at": {"$lte": now}},
+                    {"status": "running", "lease_until": {"$lte": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": self.worker_id,
+                    "lease_until": now + timedelta(seconds=JOB_VISIBILITY_TIMEOUT_SECONDS),
+                    "started_at": now,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, job: dict, fields: dict):
+        # Only the current lease holder may settle the job
+        db = get_database()
+        await db.jobs.update_one(
+            {"_id": job["_id"], "worker_id": self.worker_id, "status": "running"},
+            {"$set": {**fields, "lease_until": None, "updated_at": datetime.utcnow()}}
+        )
+
+    async def _extend_lease(self, job: dict, handler: asyncio.Task) -> bool:
+        """
+        Extend the lease while handler runs. Cancels handler and returns True
+        once the lease is lost: another worker holds the job, or the lease
+        would expire before the next attempt to extend it.
+        """
+        db = get_database()
+        interval = JOB_VISIBILITY_TIMEOUT_SECONDS / 3
+        lease_until = job["lease_until"]
+        while True:
+            await asyncio.sleep(interval)
+            new_lease = datetime.utcnow() + timedelta(seconds=JOB_VISIBILITY_TIMEOUT_SECONDS)
+            try:
+                result = await db.jobs.update_one(
+                    {"_id": job["_id"], "worker_id": self.worker_id, "status": "running"},
+                    {"$set": {"lease_until": new_lease}}
+                )
+            except Exception as e:
+                print(f"Job {job['_id']} ({job['kind']}) lease extension failed: {e}")
+                if datetime.utcnow() + timedelta(seconds=interval) < lease_until:
+                    continue
+                print(f"Job {job['_id']} ({job['kind']}) lease is expiring, cancelling it")
+            else:
+                if result.matched_count:
+                    lease_until = new_lease
+                    continue
+                print(f"Job {job['_id']} ({job['kind']}) lease was taken over, cancelling it")
+            handler.cancel()
+            return True
+
+    async def run_job(self, job: dict):
+        """
+        Run a claimed job and record its result, retry or failure
+        """
+        if job["attempts"] > job["max_attempts"]:
+            # Its lease kept expiring: the job keeps killing or stalling its workers
+            await self._finish(job, {"status": "failed", "error": "Lease expired on every attempt",
+                                     "finished_at": datetime.utcnow()})
+            self.failed += 1
+            return
+
+        loop = asyncio.get_running_loop()
+        handler = loop.create_task(JOB_HANDLERS[job["kind"]](job["payload"]))
+        heartbeat = loop.create_task(self._extend_lease(job, handler))
+        try:
+            result = await handler
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result():
+                # The lease is lost, so settling the job is up to whoever holds it now
+                self.lost += 1
+                return
+            # Shutting down: hand the job back without charging it an attempt
+            await asyncio.shield(self._finish(job, {"status": "queued", "run_at": datetime.utcnow(),
+                                                    "attempts": job["attempts"] - 1}))
+            raise
+        except Exception as e:
+            print(f"Job {job['_id']} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+            if job["attempts"] < job["max_attempts"]:
+                run_at = datetime.utcnow() + timedelta(seconds=retry_delay(job["attempts"]))
+                await self._finish(job, {"status": "queued", "run_at": run_at, "error": str(e)})
+            else:
+                await self._finish(job, {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()})
+                self.failed += 1
+            return
+        finally:
+            heartbeat.cancel()
+
+        await self._finish(job, {"status": "succeeded", "result": result, "error": None,
+                                 "finished_at": datetime.utcnow()})
+        self.completed += 1
+
+    async def _loop(self):
+        while True:
+            try:
+                job = await self.claim()
+            except Exception as e:
+                print(f"Job claim error: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(JOB_POLL_SECONDS)
+                continue
+            await self.run_job(job)
+
+    def start(self):
+        """
+        Start the worker loops on the running event loop
+        """
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._loop()) for _ in range(self.concurrency)]
+        print(f"Job worker {self.worker_id} started with concurrency {self.concurrency}")
+
+    async def stop(self):
+        """
+        Stop the worker loops; jobs in flight are handed back to the queue
+        """
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+
+job_worker = JobWorker()
+
+
+async def start_job_worker():
+    """
+    Run a job worker inside the API process when JOB_WORKER_IN_PROCESS is enabled
+    """
+    if JOB_WORKER_IN_PROCESS:
+        job_worker.start()
+
+
+async def stop_job_worker():
+    """
+    Stop the in-process job worker when the application shuts down
+    """
+    await job_worker.stop()
@@ -0,0 +1,244 @@
+"""
+Batched online data migrations.
+
+Each migration walks its collection in _id order a batch at a time and
+rewrites documents with bulk writes whose filters include the old values,
+so it can run while the API is serving: a document changed concurrently is
+simply left for the next run. Migrations are idempotent and resumable, and
+bump the change versions of the employees whose documents they rewrite so
+conditional GETs do not answer 304 with the old representation.
+
+    python -m app.services.migrations <name> [--batch-size N]
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import DeleteOne, UpdateOne
+
+from app.utils.database import get_database
+from app.utils.dates import parse_datetime
+from app.repositories import availability as availability_repo
+from app.repositories import users as users_repo
+from app.services import versions
+
+# Load environment variables
+load_dotenv()
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+
+MIGRATIONS: Dict[str, Callable[..., Awaitable[dict]]] = {}
+
+
+def migration(name: str):
+    """
+    Register a migration under name for the command line
+    """
+    def decorator(fn):
+        MIGRATIONS[name] = fn
+        return fn
+    return decorator
+
+
+@migration("time_off_dates")
+async def migrate_time_off_dates(batch_size: int = MIGRATION_BATCH_SIZE) -> dict:
+    """
+    Convert time-off start_date/end_date stored as ISO strings to native datetimes
+    """
+    db = get_database()
+    string_dates = {"$or": [{"start_date": {"$type": "string"}}, {"end_date": {"$type": "string"}}]}
+    summary = {"scanned": 0, "migrated": 0, "invalid": 0}
+    last_id: Optional[ObjectId] = None
+
+    while True:
+        query = dict(string_dates)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.time_off_requests.find(query, {"employee_id": 1, "start_date": 1, "end_date": 1})\
+                                          .sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        summary["scanned"] += len(batch)
+
+        ops, employee_ids = [], set()
+        for doc in batch:
+            try:
+                fields = {field: parse_datetime(doc[field]) for field in ("start_date", "end_date")}
+            except (KeyError, TypeError, ValueError):
+                summary["invalid"] += 1
+                continue
+            ops.append(UpdateOne(
+                {"_id": doc["_id"], "start_date": doc["start_date"], "end_date": doc["end_date"]},
+                {"$set": fields}
+            ))
+            employee_ids.add(doc.get("employee_id"))
+        if ops:
+            async with versions.changes(versions.TIME_OFF, employee_ids - {None}):
+                result = await db.time_off_requests.bulk_write(ops, ordered=False)
+            summary["migrated"] += result.modified_count
+        print(f"time_off_dates: {summary}")
+    return summary
+
+
+@migration("user_search_fields")
+async def migrate_user_search_fields(batch_size: int = MIGRATION_BATCH_SIZE) -> dict:
+    """
+    Store the directory search fields on users created before they existed
+    """
+    db = get_database()
+    summary = {"scanned": 0, "migrated": 0}
+    last_id: Optional[ObjectId] = None
+
+    while True:
+        query = {"search_terms": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.users.find(query, {field: 1 for field in users_repo.SEARCH_FIELDS})\
+                              .sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        summary["scanned"] += len(batch)
+
+        ops = [
+            UpdateOne(
+                {"_id": doc["_id"], **{field: doc.get(field) for field in users_repo.SEARCH_FIELDS}},
+                {"$set": users_repo.search_fields(doc)}
+            )
+            for doc in batch
+        ]
+        result = await db.users.bulk_write(ops, ordered=False)
+        summary["migrated"] += result.modified_count
+        print(f"user_search_fields: {summary}")
+    return summary
+
+
+@migration("availability_slot_masks")
+async def migrate_availability_slot_masks(batch_size: int = MIGRATION_BATCH_SIZE) -> dict:
+    """
+    Recompute stored availability slot masks. Masks written before partial
+    slots were excluded count a window like 09:10-16:50 as available from
+    09:00 to 17:00.
+    """
+    db = get_database()
+    summary = {"scanned": 0, "migrated": 0}
+    last_id: Optional[ObjectId] = None
+    fields = ("day_of_week", "start_time", "end_time", "is_available", "slot_mask")
+
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        batch = await db.availability.find(query, {field: 1 for field in ("employee_id",) + fields})\
+                                     .sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        summary["scanned"] += len(batch)
+
+        ops, employee_ids = [], set()
+        for doc in batch:
+            mask = availability_repo.slot_mask(doc["day_of_week"], doc)
+            if doc.get("slot_mask") is not None and bytes(doc["slot_mask"]) == bytes(mask):
+                continue
+            # updated_at moves so every worker's availability index picks the new mask up
+            ops.append(UpdateOne(
+                {"_id": doc["_id"], **{field: doc.get(field) for field in fields}},
+                {"$set": {"slot_mask": mask, "updated_at": datetime.utcnow()}}
+            ))
+            employee_ids.add(doc.get("employee_id"))
+        if ops:
+            async with versions.changes(versions.AVAILABILITY, employee_ids - {None}):
+                result = await db.availability.bulk_write(ops, ordered=False)
+            summary["migrated"] += result.modified_count
+        print(f"availability_slot_masks: {summary}")
+    return summary
+
+
+async def _duplicate_groups(collection, keys, batch_size: int):
+    """
+    Yield the documents of each group sharing the given keys, oldest _id first
+    """
+    pipeline = [
+        {"$group": {"_id": {key: f"${key}" for key in keys}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    async for group in collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size):
+        yield await collection.find({"_id": {"$in": group["ids"]}}).sort("_id", 1).to_list(length=None)
+
+
+@migration("unique_duplicates")
+async def migrate_unique_duplicates(batch_size: int = MIGRATION_BATCH_SIZE) -> dict:
+    """
+    Resolve the duplicates that keep unique indexes from being built, so the
+    API can start. Of availability rows sharing an employee and day the most
+    recently updated one is kept and the others are deleted. Of users sharing
+    an email the oldest account keeps it; the others are deactivated and
+    their email is tagged with their id, for an admin to merge or delete.
+    """
+    db = get_database()
+    summary = {"availability_removed": 0, "users_renamed": 0}
+    now = datetime.utcnow()
+
+    async for rows in _duplicate_groups(db.availability, ("employee_id", "day_of_week"), batch_size):
+        keep = max(rows, key=lambda doc: (doc.get("updated_at") or doc.get("created_at") or datetime.min, doc["_id"]))
+        print(f"availability: keeping {keep['_id']} for employee {keep.get('employee_id')} "
+              f"day {keep.get('day_of_week')}, removing {len(rows) - 1}")
+        async with versions.changes(versions.AVAILABILITY, {keep.get("employee_id")} - {None}):
+            result = await db.availability.bulk_write(
+                [DeleteOne({"_id": doc["_id"]}) for doc in rows if doc is not keep], ordered=False
+            )
+            # updated_at moves so every worker's availability index re-reads the day
+            await db.availability.update_one({"_id": keep["_id"]}, {"$set": {"updated_at": now}})
+        summary["availability_removed"] += result.deleted_count
+
+    async for users in _duplicate_groups(db.users, ("email",), batch_size):
+        keep, others = users[0], users[1:]
+        if not isinstance(keep.get("email"), str):
+            print(f"users: {len(users)} accounts have no email, resolve them by hand: {[str(doc['_id']) for doc in users]}")
+            continue
+        print(f"users: {keep['email']} stays with {keep['_id']}, "
+              f"renaming {[str(doc['_id']) for doc in others]}")
+        ops = []
+        for doc in others:
+            local, _, domain = doc["email"].partition("@")
+            email = f"{local}+duplicate-{doc['_id']}@{domain}"
+            ops.append(UpdateOne(
+                {"_id": doc["_id"], "email": doc["email"]},
+                {"$set": {"email": email, "is_active": False, "duplicate_of": str(keep["_id"]), "updated_at": now,
+                          **users_repo.search_fields({**doc, "email": email})}}
+            ))
+        async with versions.changes(versions.PROFILE, [str(doc["_id"]) for doc in others]):
+            result = await db.users.bulk_write(ops, ordered=False)
+        summary["users_renamed"] += result.modified_count
+
+    print(f"unique_duplicates: {summary}")
+    return summary
+
+
+async def _main(args) -> int:
+    from app.services import migrations
+    from app.utils.database import connect_to_mongo, close_mongo_connection
+
+    # Use the imported module: under `python -m` this file is __main__ and
+    # has a registry of its own.
+    if not args or args[0] not in migrations.MIGRATIONS:
+        print(f"Usage: python -m app.services.migrations <{'|'.join(migrations.MIGRATIONS)}> [--batch-size N]")
+        return 2
+    batch_size = migrations.MIGRATION_BATCH_SIZE
+    if "--batch-size" in args:
+        batch_size = int(args[args.index("--batch-size") + 1])
+
+    await connect_to_mongo()
+    try:
+        summary = await migrations.MIGRATIONS[args[0]](batch_size=batch_size)
+        print(f"Done: {summary}")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,137 @@
+"""
+Org-wide notification fan-out.
+
+A fan-out resolves its recipients from a selector (roles, locations,
+teams), then writes one notification per recipient in chunks from a
+background job, recording progress on its notification_fanouts document.
+Chunks are retried with backoff; because notification _ids are assigned
+before the first attempt, a retry never duplicates what already landed.
+Each recorded chunk moves a checkpoint (last_recipient_id), where a
+retried job picks up.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.repositories import notification_fanouts as fanouts_repo
+from app.repositories import notifications as notifications_repo
+from app.repositories import users as users_repo
+from app.services.notifications import deliver
+
+# Load environment variables
+load_dotenv()
+
+FANOUT_CHUNK_SIZE = int(os.getenv("FANOUT_CHUNK_SIZE", "1000"))
+FANOUT_MAX_ATTEMPTS = int(os.getenv("FANOUT_MAX_ATTEMPTS", "3"))
+FANOUT_RETRY_BACKOFF_SECONDS = float(os.getenv("FANOUT_RETRY_BACKOFF_SECONDS", "0.5"))
+
+# A running or interrupted fan-out was left by an attempt whose job lease has passed on
+RESUMABLE_STATUSES = ("queued", "running", "interrupted")
+
+
+def _recipient_query(selector: dict) -> dict:
+    return users_repo.recipient_filter(selector.get("roles"), selector.get("locations"), selector.get("teams"))
+
+
+async def create_fanout(message: str, selector: dict, created_by: str) -> dict:
+    """
+    Record a queued fan-out with its recipient count; run_fanout does the writing
+    """
+    now = datetime.utcnow()
+    return await fanouts_repo.insert({
+        "message": message,
+        "selector": selector,
+        "status": "queued",
+        "total": await users_repo.count_matching(_recipient_query(selector)),
+        "delivered": 0,
+        "failed": 0,
+        "retries": 0,
+        "chunks_done": 0,
+        "errors": [],
+        "created_by": created_by,
+        "created_at": now,
+        "updated_at": now,
+    })
+
+
+async def _deliver_chunk(docs: List[dict]) -> Tuple[int, int, int, Optional[str]]:
+    """
+    Deliver one chunk, retrying what failed. Returns delivered, failed, retries and the last error.
+    """
+    pending = docs
+    delivered = 0
+    retries = 0
+    error = None
+    for attempt in range(FANOUT_MAX_ATTEMPTS):
+        if attempt:
+            retries += 1
+            await asyncio.sleep(FANOUT_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        try:
+            inserted, pending = await deliver(pending)
+        except Exception as e:
+            error = str(e)
+            continue
+        delivered += len(inserted)
+        if not pending:
+            return delivered, 0, retries, None
+        error = f"{len(pending)} notifications could not be inserted"
+    return delivered, len(pending), retries, error
+
+
+async def run_fanout(fanout_id):
+    """
+    Write the notifications of a fan-out, chunk by chunk. The caller holds
+    the job lease, so a fan-out left running or interrupted by an earlier
+    attempt is resumed from its checkpoint. Errors are re-raised for the job
+    queue to retry.
+    """
+    fanout = await fanouts_repo.find_by_id(fanout_id)
+    if fanout is None or fanout["status"] not in RESUMABLE_STATUSES:
+        return
+    fanout_id = str(fanout["_id"])
+    resumed = fanout["status"] != "queued"
+    fields = {"status": "running"}
+    if not resumed:
+        fields["started_at"] = datetime.utcnow()
+    await fanouts_repo.set_fields(fanout_id, fields)
+
+    started = time.monotonic()
+    delivered = 0
+    failed = fanout.get("failed", 0)
+    try:
+        async for employee_ids in users_repo.iter_matching_id_batches(
+            _recipient_query(fanout["selector"]), FANOUT_CHUNK_SIZE, after=fanout.get("last_recipient_id")
+        ):
+            already = []
+            if resumed:
+                # The previous attempt may have stopped after inserting this chunk but before recording it
+                already = await notifications_repo.find_fanout_recipients(fanout_id, employee_ids)
+                resumed = False
+            skip = set(already)
+            now = datetime.utcnow()
+            docs = [
+                {"employee_id": employee_id, "message": fanout["message"], "is_read": False,
+                 "created_at": now, "fanout_id": fanout_id}
+                for employee_id in employee_ids if employee_id not in skip
+            ]
+            chunk_delivered, chunk_failed, retries, error = await _deliver_chunk(docs)
+            chunk_delivered += len(skip)
+            delivered += chunk_delivered
+            failed += chunk_failed
+            await fanouts_repo.record_chunk(fanout_id, employee_ids[-1], chunk_delivered, chunk_failed,
+                                            retries, error)
+    except Exception as e:
+        print(f"Notification fan-out {fanout_id} interrupted: {e}")
+        await fanouts_repo.set_fields(fanout_id, {"status": "interrupted", "last_error": str(e)})
+        raise
+
+    elapsed = time.monotonic() - started
+    await fanouts_repo.set_fields(fanout_id, {
+        "status": "completed" if not failed else "completed_with_errors",
+        "finished_at": datetime.utcnow(),
+        "duration_seconds": round(elapsed, 3),
+        "per_second": round(delivered / elapsed, 1) if elapsed > 0 else None,
+    })
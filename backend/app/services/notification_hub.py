@@ -0,0 +1,197 @@
+"""
+In-process pub/sub for pushing new notifications to connected clients.
+
+Each open stream subscribes a bounded queue for its user. How new
+notifications reach the hub is chosen with NOTIFICATION_FANOUT:
+
+- local: delivered by the process that inserted them (single worker)
+- poll: every worker tails the notifications of its connected users by
+  created_at
+- change_stream: every worker watches inserts through a Mongo change
+  stream; needs a replica set (a single-node replica set works, e.g.
+  mongod --replSet rs0 and MONGODB_URL=...?replicaSet=rs0)
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from dotenv import load_dotenv
+
+from app.utils.database import get_database
+from app.utils.indexes import register_index, register_query_shape
+
+# Load environment variables
+load_dotenv()
+
+NOTIFICATION_FANOUT = os.getenv("NOTIFICATION_FANOUT", "local")
+NOTIFICATION_POLL_SECONDS = float(os.getenv("NOTIFICATION_POLL_SECONDS", "1"))
+# Re-read this far behind the newest created_at seen to tolerate clock skew between workers
+NOTIFICATION_POLL_OVERLAP_SECONDS = float(os.getenv("NOTIFICATION_POLL_OVERLAP_SECONDS", "5"))
+# Undelivered events buffered per connection before it is dropped as too slow
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.getenv("NOTIFICATION_STREAM_QUEUE_SIZE", "100"))
+
+FANOUT_BACKENDS = ("local", "poll", "change_stream")
+
+# The polling tailer reads the new notifications of the users connected to
+# this worker through the (employee_id, created_at, _id) index
+register_query_shape("notifications", {"employee_id": {"$in": ["employee"]},
+                                       "created_at": {"$gte": datetime(2024, 1, 1)}, "_id": {"$nin": []}})
+
+# Queued to a subscriber that fell too far behind; its stream should close
+OVERFLOW = object()
+
+
+class NotificationHub:
+    """
+    Per-user subscriber queues plus the cross-worker tailer feeding them
+    """
+
+    def __init__(self, backend: str = NOTIFICATION_FANOUT):
+        if backend not in FANOUT_BACKENDS:
+            raise ValueError(f"NOTIFICATION_FANOUT must be one of {FANOUT_BACKENDS}, got {backend!r}")
+        self.backend = backend
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._last_seen: Optional[datetime] = None
+        self._recent: Dict[Any, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, employee_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=NOTIFICATION_STREAM_QUEUE_SIZE)
+        self._subscribers.setdefault(employee_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, employee_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(employee_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[employee_id]
+
+    def connections(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def dispatch(self, doc: dict):
+        """
+        Hand a stored notification to every local stream of its recipient
+        """
+        for queue in list(self._subscribers.get(doc["employee_id"], ())):
+            try:
+                queue.put_nowait(doc)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # Make room for the overflow marker so the stream closes and the client reconnects
+                queue.get_nowait()
+                queue.put_nowait(OVERFLOW)
+                self.unsubscribe(doc["employee_id"], queue)
+                self.dropped += 1
+
+    def publish(self, docs: List[dict]):
+        """
+        Announce notifications that were just inserted by this worker.
+        With a cross-worker backend the tailer delivers them instead, so
+        every worker (including this one) sees each notification once.
+        """
+        if self.backend != "local":
+            return
+        for doc in docs:
+            self.dispatch(doc)
+
+    def _ingest(self, doc: dict):
+        created_at = doc.get("created_at") or datetime.utcnow()
+        if doc["_id"] in self._recent:
+            return
+        self._recent[doc["_id"]] = created_at
+        if self._last_seen is None or created_at > self._last_seen:
+            self._last_seen = created_at
+        self.dispatch(doc)
+
+    async def poll(self):
+        """
+        Deliver notifications of connected users created since the last poll.
+        The overlap window is re-scanned in the index only: notifications
+        already delivered are excluded by _id and not fetched again.
+        """
+        polled_at = datetime.utcnow()
+        since = self._last_seen - timedelta(seconds=NOTIFICATION_POLL_OVERLAP_SECONDS)
+        # Ids older than the overlap window can no longer be re-read
+        self._recent = {key: at for key, at in self._recent.items() if at >= since}
+        if self._subscribers:
+            db = get_database()
+            query = {
+                "employee_id": {"$in": list(self._subscribers)},
+                "created_at": {"$gte": since},
+                "_id": {"$nin": list(self._recent)},
+            }
+            async for doc in db.notifications.find(query).sort("created_at", 1):
+                self._ingest(doc)
+        # Nothing older than this poll is new to the next one, beyond the overlap
+        self._last_seen = max(self._last_seen, polled_at)
+
+    async def _run_poll(self):
+        while True:
+            await asyncio.sleep(NOTIFICATION_POLL_SECONDS)
+            try:
+                await self.poll()
+            except Exception as e:
+                print(f"Notification poll error: {e}")
+
+    async def _run_change_stream(self):
+        db = get_database()
+        resume_token = None
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with db.notifications.watch(pipeline, resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.dispatch(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Notification change stream error: {e}")
+                await asyncio.sleep(NOTIFICATION_POLL_SECONDS)
+
+    async def start(self):
+        """
+        Start the cross-worker tailer for the configured backend
+        """
+        if self.backend == "local" or (self._task is not None and not self._task.done()):
+            return
+        if self.backend == "poll":
+            self._last_seen = datetime.utcnow()
+            runner = self._run_poll()
+        else:
+            runner = self._run_change_stream()
+        self._task = asyncio.get_running_loop().create_task(runner)
+
+    async def stop(self):
+        """
+        Stop the tailer
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+notification_hub = NotificationHub()
+
+
+async def start_notification_hub():
+    """
+    Start cross-worker notification delivery when the application starts
+    """
+    await notification_hub.start()
+
+
+async def stop_notification_hub():
+    """
+    Stop cross-worker notification delivery when the application shuts down
+    """
+    await notification_hub.stop()
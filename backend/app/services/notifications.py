@@ -0,0 +1,101 @@
+"""
+Notification writes that keep the per-user unread counter
+(notification_counters, _id = employee id) and open streams in step.
+"""
+import asyncio
+import os
+import sys
+from collections import Counter
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.repositories import notifications as notifications_repo
+from app.repositories import users as users_repo
+from app.services.notification_hub import notification_hub
+from app.services import versions
+
+# Load environment variables
+load_dotenv()
+
+NOTIFICATION_RECONCILE_BATCH_SIZE = int(os.getenv("NOTIFICATION_RECONCILE_BATCH_SIZE", "500"))
+
+
+async def deliver(docs: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """
+    Store notifications, count them as unread and push them to their
+    recipients' open streams. Returns the stored and the failed documents.
+    Documents an earlier attempt already stored are returned as stored but
+    neither counted nor pushed again, so a retried batch is idempotent.
+    """
+    for doc in docs:
+        doc.setdefault("is_read", False)
+    async with versions.changes(versions.NOTIFICATIONS, (doc["employee_id"] for doc in docs)):
+        inserted, duplicates, failed = await notifications_repo.insert_many(docs)
+        await notifications_repo.increment_unread(
+            Counter(doc["employee_id"] for doc in inserted if not doc["is_read"])
+        )
+    notification_hub.publish(inserted)
+    return inserted + duplicates, failed
+
+
+async def set_read(notification_id, employee_id: str, is_read: bool) -> Optional[dict]:
+    """
+    Set the read state of one notification and adjust the unread counter if it changed
+    """
+    async with versions.changes(versions.NOTIFICATIONS, [employee_id]):
+        notification, changed = await notifications_repo.set_read(notification_id, employee_id, is_read)
+        if changed:
+            await notifications_repo.increment_unread({employee_id: -1 if is_read else 1})
+    return notification
+
+
+async def mark_all_read(employee_id: str) -> int:
+    """
+    Mark all of an employee's notifications read with one update_many.
+    The counter is decremented by exactly the number of documents changed,
+    so notifications inserted concurrently stay counted.
+    """
+    async with versions.changes(versions.NOTIFICATIONS, [employee_id]):
+        modified = await notifications_repo.mark_all_read(employee_id)
+        if modified:
+            await notifications_repo.increment_unread({employee_id: -modified})
+    return modified
+
+
+async def reconcile_unread_counters(batch_size: int = NOTIFICATION_RECONCILE_BATCH_SIZE) -> dict:
+    """
+    Recount unread notifications for every user in batches and repair counters that drifted
+    """
+    summary = {"checked": 0, "repaired": 0}
+    async for employee_ids in users_repo.iter_id_batches(batch_size):
+        observed = await notifications_repo.get_unread_counters(employee_ids)
+        actual = await notifications_repo.count_unread_by_employee(employee_ids)
+        repairs = [
+            (employee_id, observed.get(employee_id), actual.get(employee_id, 0))
+            for employee_id in employee_ids
+            if observed.get(employee_id, 0) != actual.get(employee_id, 0)
+        ]
+        summary["checked"] += len(employee_ids)
+        summary["repaired"] += await notifications_repo.repair_unread_counters(repairs)
+    return summary
+
+
+async def _main(args) -> int:
+    from app.utils.database import connect_to_mongo, close_mongo_connection
+
+    if not args or args[0] != "reconcile":
+        print("Usage: python -m app.services.notifications reconcile [--batch-size N]")
+        return 2
+    batch_size = NOTIFICATION_RECONCILE_BATCH_SIZE
+    if "--batch-size" in args:
+        batch_size = int(args[args.index("--batch-size") + 1])
+    await connect_to_mongo()
+    try:
+        print(f"Unread counters: {await reconcile_unread_counters(batch_size)}")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,151 @@
+"""
+Role-based permission checks resolved in memory.
+
+Each worker keeps a role name -> permission set map built from the roles
+collection, with built-in defaults for roles that have no stored document.
+A role write reloads the map in the worker that made it and bumps a
+version counter; the other workers compare that counter periodically and
+reload when it moved. Authorization decisions never query Mongo.
+"""
+import asyncio
+import os
+from typing import Dict, FrozenSet, Iterable, Optional
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, status
+
+from app.repositories import roles as roles_repo
+from app.services.auth import get_current_active_user
+
+# Load environment variables
+load_dotenv()
+
+# How often each worker checks whether roles changed in another worker
+PERMISSIONS_REFRESH_SECONDS = float(os.getenv("PERMISSIONS_REFRESH_SECONDS", "15"))
+
+ALL = "*"
+VIEW_SCHEDULE = "view_schedule"
+SUBMIT_TIME_OFF = "submit_time_off"
+MANAGE_SCHEDULES = "manage_schedules"
+SEND_NOTIFICATIONS = "send_notifications"
+MANAGE_USERS = "manage_users"
+MANAGE_ROLES = "manage_roles"
+RUN_JOBS = "run_jobs"
+
+# Used for built-in roles until a stored role document overrides them
+DEFAULT_ROLE_PERMISSIONS: Dict[str, FrozenSet[str]] = {
+    "employee": frozenset({VIEW_SCHEDULE, SUBMIT_TIME_OFF}),
+    "manager": frozenset({VIEW_SCHEDULE, SUBMIT_TIME_OFF, MANAGE_SCHEDULES, SEND_NOTIFICATIONS}),
+    "admin": frozenset({ALL}),
+}
+
+
+class PermissionResolver:
+    """
+    Role name -> permission set map, reloaded when the roles version changes
+    """
+
+    def __init__(self):
+        self._permissions: Dict[str, FrozenSet[str]] = dict(DEFAULT_ROLE_PERMISSIONS)
+        self.version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def set_roles(self, roles: Iterable[dict]):
+        permissions = dict(DEFAULT_ROLE_PERMISSIONS)
+        for role in roles:
+            permissions[role["name"]] = frozenset(role.get("permissions") or ())
+        # Admins keep every permission so a role edit cannot lock everyone out
+        permissions["admin"] = frozenset({ALL})
+        self._permissions = permissions
+
+    def permissions_for(self, role: Optional[str]) -> FrozenSet[str]:
+        return self._permissions.get(role, frozenset())
+
+    def allows(self, role: Optional[str], permission: str) -> bool:
+        granted = self.permissions_for(role)
+        return ALL in granted or permission in granted
+
+    async def load(self):
+        """
+        Rebuild the map from every stored role
+        """
+        # Read the version first: a write racing the load leaves it stale and forces another reload
+        version = await roles_repo.get_version()
+        self.set_roles(await roles_repo.list_roles(limit=None))
+        self.version = version
+
+    async def refresh(self):
+        """
+        Reload if roles changed since the last load
+        """
+        if await roles_repo.get_version() != self.version:
+            await self.load()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(PERMISSIONS_REFRESH_SECONDS)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Permission refresh error: {e}")
+
+    async def start(self):
+        """
+        Load roles and start the background version check
+        """
+        await self.load()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background version check
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+permission_resolver = PermissionResolver()
+
+
+def has_permission(current_user, permission: str) -> bool:
+    return permission_resolver.allows(current_user.get("role"), permission)
+
+
+def check_permission(current_user, permission: str):
+    """
+    Reject users whose role does not grant permission
+    """
+    if not has_permission(current_user, permission):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+
+
+def require_permission(permission: str):
+    """
+    Dependency returning the current active user if their role grants permission
+    """
+    async def dependency(current_user = Depends(get_current_active_user)):
+        check_permission(current_user, permission)
+        return current_user
+    return dependency
+
+
+async def start_permission_resolver():
+    """
+    Load role permissions when the application starts
+    """
+    await permission_resolver.start()
+
+
+async def stop_permission_resolver():
+    """
+    Stop role permission refreshes when the application shuts down
+    """
+    await permission_resolver.stop()
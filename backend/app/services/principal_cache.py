@@ -0,0 +1,118 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Set
+from dotenv import load_dotenv
+
+from app.utils.tokens import token_digest
+
+# Load environment variables
+load_dotenv()
+
+# Cache settings. The TTL bounds how long another worker's logout or user
+# update can go unnoticed by this process, so keep it short.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+
+class CachedPrincipal:
+    """
+    Verified state for one access token: decoded claims, user document and
+    the session's last activity as last seen by this process
+    """
+    __slots__ = ("claims", "user", "last_activity", "expires_at")
+
+    def __init__(self, claims: dict, user: dict, last_activity: datetime, expires_at: float):
+        self.claims = claims
+        self.user = user
+        self.last_activity = last_activity
+        self.expires_at = expires_at
+
+
+class PrincipalCache:
+    """
+    In-process TTL/LRU cache of verified principals keyed by token digest
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedPrincipal]" = OrderedDict()
+        self._digests_by_user: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[CachedPrincipal]:
+        """
+        Return the cached principal for a token, or None on a miss
+        """
+        digest = token_digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(digest)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return entry
+
+    def put(self, token: str, claims: dict, user: dict, last_activity: datetime) -> CachedPrincipal:
+        """
+        Cache a freshly verified principal. The entry never outlives the token itself.
+        """
+        digest = token_digest(token)
+        expires_at = time.monotonic() + self.ttl_seconds
+        exp = claims.get("exp")
+        if exp is not None:
+            expires_at = min(expires_at, time.monotonic() + (exp - time.time()))
+
+        self._remove(digest)
+        entry = CachedPrincipal(claims, user, last_activity, expires_at)
+        self._entries[digest] = entry
+        self._digests_by_user.setdefault(str(user["_id"]), set()).add(digest)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+        return entry
+
+    def invalidate_token(self, token: str):
+        """
+        Drop the cached principal for a single token (logout, session expiry)
+        """
+        self._remove(token_digest(token))
+
+    def invalidate_user(self, user_id: str):
+        """
+        Drop every cached principal belonging to a user (profile/role updates, deactivation)
+        """
+        for digest in list(self._digests_by_user.get(str(user_id), ())):
+            self._remove(digest)
+
+    def clear(self):
+        """
+        Drop all cached principals
+        """
+        self._entries.clear()
+        self._digests_by_user.clear()
+
+    def _remove(self, digest: str):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        user_id = str(entry.user["_id"])
+        digests = self._digests_by_user.get(user_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._digests_by_user[user_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_MAX_ENTRIES, PRINCIPAL_CACHE_TTL_SECONDS)
@@ -0,0 +1,38 @@
+"""
+Whether this worker should receive traffic.
+
+A worker reports ready only after every startup handler has run, i.e.
+once the Mongo pool and the in-memory caches (revocations, permissions,
+availability index, user directory) are warm, and stops as soon as it
+receives SIGTERM (see serve.py), while it still serves, so load balancers
+take it out of rotation before it closes its listener.
+"""
+
+ready = False
+
+
+async def mark_ready():
+    """
+    Registered as the last startup handler
+    """
+    global ready
+    ready = True
+
+
+def begin_shutdown():
+    """
+    Called from the SIGTERM handler, ahead of the connection drain
+    """
+    global ready
+    ready = False
+
+
+async def mark_not_ready():
+    """
+    Registered as the first shutdown handler, for servers started without serve.py
+    """
+    begin_shutdown()
+
+
+def is_ready() -> bool:
+    return ready
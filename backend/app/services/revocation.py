@@ -0,0 +1,161 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from dotenv import load_dotenv
+
+from app.utils.database import get_database
+from app.utils.tokens import token_digest
+from app.utils.indexes import register_index, register_query_shape
+
+# Load environment variables
+load_dotenv()
+
+# How often each worker pulls revocations written by other workers
+REVOCATION_POLL_SECONDS = float(os.getenv("REVOCATION_POLL_SECONDS", "5"))
+# Re-read this far behind the newest created_at seen to tolerate clock skew between workers
+REVOCATION_POLL_OVERLAP_SECONDS = float(os.getenv("REVOCATION_POLL_OVERLAP_SECONDS", "10"))
+
+BUCKET_SECONDS = 60
+
+# Expired revocations are reclaimed by the TTL index; created_at drives the incremental poll
+register_index("token_blacklist", "expires_at", expireAfterSeconds=0)
+register_index("token_blacklist", "created_at")
+register_query_shape("token_blacklist", {"created_at": {"$gte": datetime(2024, 1, 1)}})
+
+
+class RevocationSet:
+    """
+    Exact in-process set of revoked token digests.
+
+    Digests are grouped into one-minute buckets by expiry so expired
+    revocations can be dropped a bucket at a time; a revoked token is only
+    worth remembering until it would have expired anyway.
+    """
+
+    def __init__(self):
+        self._expires: Dict[str, datetime] = {}
+        self._buckets: Dict[int, Set[str]] = {}
+        self._last_seen: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, digest: str, expires_at: datetime):
+        """
+        Remember a revoked token digest until its expiry
+        """
+        if expires_at <= datetime.utcnow():
+            return
+        previous = self._expires.get(digest)
+        if previous is not None:
+            if previous >= expires_at:
+                return
+            self._buckets.get(self._bucket(previous), set()).discard(digest)
+        self._expires[digest] = expires_at
+        self._buckets.setdefault(self._bucket(expires_at), set()).add(digest)
+
+    def contains(self, digest: str) -> bool:
+        """
+        Return True if the digest is revoked and not yet expired
+        """
+        expires_at = self._expires.get(digest)
+        return expires_at is not None and expires_at > datetime.utcnow()
+
+    def purge_expired(self):
+        """
+        Drop every bucket whose tokens have all expired
+        """
+        current = self._bucket(datetime.utcnow())
+        for bucket in [b for b in self._buckets if b < current]:
+            for digest in self._buckets.pop(bucket):
+                self._expires.pop(digest, None)
+
+    def _ingest(self, doc: dict):
+        digest = doc.get("token_digest")
+        if digest is None and doc.get("token"):
+            # Entries written before tokens were stored as digests
+            digest = token_digest(doc["token"])
+        if digest and doc.get("expires_at"):
+            self.add(digest, doc["expires_at"])
+        created_at = doc.get("created_at")
+        if created_at and (self._last_seen is None or created_at > self._last_seen):
+            self._last_seen = created_at
+
+    async def load(self):
+        """
+        Load every unexpired revocation from Mongo
+        """
+        db = get_database()
+        cursor = db.token_blacklist.find(
+            {"expires_at": {"$gt": datetime.utcnow()}},
+            {"token_digest": 1, "token": 1, "expires_at": 1, "created_at": 1}
+        )
+        async for doc in cursor:
+            self._ingest(doc)
+        if self._last_seen is None:
+            self._last_seen = datetime.utcnow()
+
+    async def poll(self):
+        """
+        Pull revocations created since the last poll
+        """
+        db = get_database()
+        since = self._last_seen - timedelta(seconds=REVOCATION_POLL_OVERLAP_SECONDS)
+        cursor = db.token_blacklist.find(
+            {"created_at": {"$gte": since}},
+            {"token_digest": 1, "token": 1, "expires_at": 1, "created_at": 1}
+        )
+        async for doc in cursor:
+            self._ingest(doc)
+        self.purge_expired()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(REVOCATION_POLL_SECONDS)
+            try:
+                await self.poll()
+            except Exception as e:
+                print(f"Revocation sync error: {e}")
+
+    async def start(self):
+        """
+        Load revocations and start the background poller
+        """
+        await self.load()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background poller
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def _bucket(when: datetime) -> int:
+        return int(when.timestamp()) // BUCKET_SECONDS
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+
+revocations = RevocationSet()
+
+
+async def start_revocation_sync():
+    """
+    Load the revocation set when the application starts
+    """
+    await revocations.start()
+
+
+async def stop_revocation_sync():
+    """
+    Stop revocation polling when the application shuts down
+    """
+    await revocations.stop()
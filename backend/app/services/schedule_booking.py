@@ -0,0 +1,116 @@
+"""
+Bulk shift creation with double-booking protection.
+
+Overlaps are found per employee with a sort-and-sweep over the batch's
+shifts plus the employee's existing shifts, which are fetched with one
+indexed range query per batch of employees rather than one per shift.
+"""
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+from dotenv import load_dotenv
+
+from app.repositories import schedules as schedules_repo
+from app.repositories import users as users_repo
+from app.schemas.schedule import ScheduleCreate
+from app.services.scheduling_engine import SCHEDULE_INSERT_CHUNK_SIZE
+from app.services import coverage, versions
+
+# Load environment variables
+load_dotenv()
+
+# Employees covered by each existing-shift range query
+OVERLAP_QUERY_EMPLOYEE_BATCH = int(os.getenv("OVERLAP_QUERY_EMPLOYEE_BATCH", "500"))
+
+
+def sweep_overlaps(new_shifts: List[Tuple[int, datetime, datetime]],
+                   existing: List[Tuple[str, datetime, datetime]]) -> Dict[int, Union[str, int]]:
+    """
+    Find which new shifts of one employee overlap an existing shift or an
+    earlier-starting new shift. O(n log n) in the number of shifts.
+
+    new_shifts are (row index, start, end); existing are (schedule id, start, end).
+    Returns row index -> id of the conflicting schedule, or the conflicting
+    row index for a conflict within the batch.
+    """
+    # Existing shifts sort ahead of new ones that start at the same moment
+    events = [(start, 0, end, sid) for sid, start, end in existing]
+    events += [(start, 1, end, index) for index, start, end in new_shifts]
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    conflicts: Dict[int, Union[str, int]] = {}
+    latest_end: Optional[datetime] = None
+    latest_owner = None
+    for start, is_new, end, ref in events:
+        if latest_end is not None and start < latest_end:
+            if is_new:
+                conflicts[ref] = latest_owner
+                continue
+        if latest_end is None or end > latest_end:
+            latest_end, latest_owner = end, ref
+    return conflicts
+
+
+async def _existing_shifts(by_employee: Dict[str, List[Tuple[int, datetime, datetime]]]) -> Dict[str, list]:
+    existing: Dict[str, list] = {emp_id: [] for emp_id in by_employee}
+    employee_ids = list(by_employee)
+    for i in range(0, len(employee_ids), OVERLAP_QUERY_EMPLOYEE_BATCH):
+        batch = employee_ids[i:i + OVERLAP_QUERY_EMPLOYEE_BATCH]
+        start = min(s for emp_id in batch for _, s, _ in by_employee[emp_id])
+        end = max(e for emp_id in batch for _, _, e in by_employee[emp_id])
+        for doc in await schedules_repo.list_for_employees_between(batch, start, end):
+            existing[doc["employee_id"]].append((str(doc["_id"]), doc["start_time"], doc["end_time"]))
+    return existing
+
+
+async def create_shifts(shifts: List[ScheduleCreate], publish: bool) -> dict:
+    """
+    Validate and insert a batch of shifts, reporting errors per input row
+    """
+    errors: Dict[int, dict] = {}
+
+    active = set(await users_repo.find_active_ids(list({s.employee_id for s in shifts})))
+    by_employee: Dict[str, List[Tuple[int, datetime, datetime]]] = {}
+    for index, shift in enumerate(shifts):
+        if shift.employee_id not in active:
+            errors[index] = {"index": index, "error": "Unknown or inactive employee"}
+            continue
+        by_employee.setdefault(shift.employee_id, []).append((index, shift.start_time, shift.end_time))
+
+    existing = await _existing_shifts(by_employee)
+    for employee_id, rows in by_employee.items():
+        for index, conflict in sweep_overlaps(rows, existing[employee_id]).items():
+            if isinstance(conflict, str):
+                errors[index] = {"index": index, "error": "Overlaps an existing shift", "conflicts_with": conflict}
+            else:
+                errors[index] = {"index": index, "error": "Overlaps another shift in this batch",
+                                 "conflicts_with": f"row {conflict}"}
+
+    now = datetime.utcnow()
+    shift_status = "approved" if publish else "pending"
+    valid_rows = [i for i in range(len(shifts)) if i not in errors]
+    docs = []
+    for index in valid_rows:
+        doc = shifts[index].dict()
+        doc.update({"status": shift_status, "created_at": now, "updated_at": now})
+        docs.append(doc)
+
+    async with versions.changes(versions.SCHEDULES, (doc["employee_id"] for doc in docs)):
+        created, insert_errors = await schedules_repo.insert_many(docs, SCHEDULE_INSERT_CHUNK_SIZE)
+    for position, message in insert_errors.items():
+        index = valid_rows[position]
+        errors[index] = {"index": index, "error": message}
+    inserted = [doc for position, doc in enumerate(docs) if position not in insert_errors]
+    await coverage.record_created(inserted)
+
+    ids: List[Optional[str]] = [None] * len(shifts)
+    for position, index in enumerate(valid_rows):
+        if index not in errors and "_id" in docs[position]:
+            ids[index] = str(docs[position]["_id"])
+
+    return {
+        "created": created,
+        "failed": len(errors),
+        "ids": ids,
+        "errors": [errors[i] for i in sorted(errors)],
+    }
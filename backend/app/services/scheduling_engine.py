@@ -0,0 +1,260 @@
+"""
+Automatic shift generation.
+
+Availability, approved time-off and existing shifts are laid out as boolean
+matrices of employees x 15-minute slots over the requested horizon, so the
+feasibility of a shift for every employee is one vectorized slice check.
+Demands are filled in start-time order, giving each shift to the feasible
+employees with the fewest hours assigned so far. Only employees assigned to
+a demand's location and job role are feasible for it; those with no
+locations or job roles at all are left out unless include_unassigned is set.
+
+Background runs pass a generation_id stored on every shift they create. A
+retried run counts the shifts an earlier attempt already stored towards
+their demands and only creates the rest.
+"""
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+from app.repositories import availability as availability_repo
+from app.repositories import schedules as schedules_repo
+from app.repositories import time_off as time_off_repo
+from app.repositories import users as users_repo
+from app.schemas.schedule import ScheduleGenerationRequest, StaffingDemand
+from app.services import coverage, versions
+from app.utils.slots import (
+    SLOT_MINUTES,
+    SLOTS_PER_DAY,
+    SLOTS_PER_WEEK,
+    floor_to_slot,
+    slot_offset,
+    week_slot,
+)
+
+# Load environment variables
+load_dotenv()
+
+SCHEDULE_INSERT_CHUNK_SIZE = int(os.getenv("SCHEDULE_INSERT_CHUNK_SIZE", "1000"))
+
+
+class SlotGrid:
+    """
+    Maps datetimes within the horizon to column indices of the slot matrices
+    """
+
+    def __init__(self, start: datetime, end: datetime):
+        self.origin = floor_to_slot(start)
+        self.n_slots = slot_offset(self.origin, end, round_up=True)
+        self.end = self.origin + timedelta(minutes=SLOT_MINUTES * self.n_slots)
+
+    def span(self, start: datetime, end: datetime) -> Tuple[int, int]:
+        """
+        Slot range [a, b) covering start..end, clipped to the horizon. Demands
+        lie within it; existing shifts and time-off may overhang it.
+        """
+        a = max(0, slot_offset(self.origin, start))
+        b = min(self.n_slots, slot_offset(self.origin, end, round_up=True))
+        return a, max(a, b)
+
+
+def weekly_availability(employee_index: Dict[str, int], availability_docs: List[dict]) -> np.ndarray:
+    """
+    Build an employees x week-slots matrix from weekly availability windows,
+    using the packed slot_mask stored on each day where present. Only slots a
+    window fully covers count as available.
+    """
+    weekly = np.zeros((len(employee_index), SLOTS_PER_WEEK), dtype=bool)
+    for doc in availability_docs:
+        row = employee_index.get(doc["employee_id"])
+        if row is None:
+            continue
+        stored = doc.get("slot_mask")
+        if stored is None:
+            stored = availability_repo.slot_mask(doc["day_of_week"], doc)
+        packed = np.frombuffer(bytes(stored), dtype=np.uint8)
+        weekly[row] |= np.unpackbits(packed, bitorder="little").astype(bool)
+    return weekly
+
+
+def horizon_availability(weekly: np.ndarray, grid: SlotGrid) -> np.ndarray:
+    """
+    Repeat the weekly pattern across the horizon
+    """
+    columns = (week_slot(grid.origin) + np.arange(grid.n_slots)) % SLOTS_PER_WEEK
+    return weekly[:, columns]
+
+
+def block_intervals(free: np.ndarray, employee_index: Dict[str, int], docs: List[dict],
+                    grid: SlotGrid, start_field: str, end_field: str):
+    """
+    Mark the slots covered by each document's interval as unavailable
+    """
+    for doc in docs:
+        row = employee_index.get(doc["employee_id"])
+        if row is None:
+            continue
+        a, b = grid.span(doc[start_field], doc[end_field])
+        free[row, a:b] = False
+
+
+def eligibility_masks(employees: List[dict], field: str, values,
+                      include_unassigned: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Per-value eligibility vectors. Employees whose field is missing or empty
+    are eligible for no value, or for every value with include_unassigned.
+    """
+    masks = {}
+    for value in values:
+        masks[value] = np.fromiter(
+            (value in emp[field] if emp.get(field) else include_unassigned for emp in employees),
+            dtype=bool,
+            count=len(employees)
+        )
+    return masks
+
+
+def assign_shifts(demands: List[StaffingDemand], free: np.ndarray, grid: SlotGrid,
+                  location_masks: Dict[str, np.ndarray], role_masks: Dict[str, np.ndarray],
+                  max_slots: Optional[int],
+                  headcounts: Optional[List[int]] = None) -> Tuple[List[Tuple[int, np.ndarray]], List[int]]:
+    """
+    Fill demands greedily in start-time order. Mutates `free` as shifts are assigned.
+    headcounts overrides how many employees each demand still needs.
+
+    Returns (demand index, assigned employee rows) pairs and the assigned
+    count per demand.
+    """
+    if headcounts is None:
+        headcounts = [demand.headcount for demand in demands]
+    load = np.zeros(free.shape[0], dtype=np.int64)
+    assignments = []
+    assigned_counts = [0] * len(demands)
+    order = sorted(range(len(demands)), key=lambda i: demands[i].start_time)
+
+    for i in order:
+        demand = demands[i]
+        headcount = headcounts[i]
+        a, b = grid.span(demand.start_time, demand.end_time)
+        if b <= a or headcount < 1:
+            continue
+        length = b - a
+        candidates = location_masks[demand.location] & role_masks[demand.role]
+        if max_slots is not None:
+            candidates &= load + length <= max_slots
+        rows = np.flatnonzero(candidates)
+        if rows.size == 0:
+            continue
+        rows = rows[free[rows, a:b].all(axis=1)]
+        if rows.size == 0:
+            continue
+        if rows.size > headcount:
+            rows = rows[np.argpartition(load[rows], headcount - 1)[:headcount]]
+        free[rows, a:b] = False
+        load[rows] += length
+        assignments.append((i, rows))
+        assigned_counts[i] = int(rows.size)
+    return assignments, assigned_counts
+
+
+def remaining_headcounts(demands: List[StaffingDemand], stored: List[dict]) -> Tuple[List[int], List[int]]:
+    """
+    Split each demand's headcount into what earlier attempts of the same
+    generation already stored and what is still needed
+    """
+    available = Counter((doc["location"], doc["role"], doc["start_time"], doc["end_time"]) for doc in stored)
+    done = []
+    for demand in demands:
+        key = (demand.location, demand.role, demand.start_time, demand.end_time)
+        count = min(demand.headcount, available[key])
+        available[key] -= count
+        done.append(count)
+    return done, [demand.headcount - count for demand, count in zip(demands, done)]
+
+
+async def generate_schedules(request: ScheduleGenerationRequest, generation_id: Optional[str] = None) -> dict:
+    """
+    Generate and (unless dry_run) store shifts covering the requested demand.
+    Repeating a call with the same generation_id does not create duplicates.
+    """
+    grid = SlotGrid(request.horizon_start, request.horizon_end)
+
+    employees = await users_repo.list_active_by_roles(
+        request.employee_roles, {"_id": 1, "locations": 1, "job_roles": 1}
+    )
+    employee_ids = [str(emp["_id"]) for emp in employees]
+    employee_index = {emp_id: row for row, emp_id in enumerate(employee_ids)}
+
+    availability_docs = await availability_repo.list_available_for_employees(employee_ids)
+    time_off_docs = await time_off_repo.list_approved_for_employees(employee_ids, grid.origin, grid.end)
+    existing_shifts = await schedules_repo.list_overlapping(grid.origin, grid.end)
+
+    stored = [doc for doc in existing_shifts if generation_id and doc.get("generation_id") == generation_id]
+    done, headcounts = remaining_headcounts(request.demands, stored)
+
+    free = horizon_availability(weekly_availability(employee_index, availability_docs), grid)
+    block_intervals(free, employee_index, time_off_docs, grid, "start_date", "end_date")
+    block_intervals(free, employee_index, existing_shifts, grid, "start_time", "end_time")
+
+    location_masks = eligibility_masks(employees, "locations", {d.location for d in request.demands},
+                                       request.include_unassigned)
+    role_masks = eligibility_masks(employees, "job_roles", {d.role for d in request.demands},
+                                   request.include_unassigned)
+    max_slots = None
+    if request.max_hours_per_employee is not None:
+        max_slots = int(request.max_hours_per_employee * 60 // SLOT_MINUTES)
+
+    assignments, assigned_counts = assign_shifts(
+        request.demands, free, grid, location_masks, role_masks, max_slots, headcounts
+    )
+    assigned_counts = [count + already for count, already in zip(assigned_counts, done)]
+
+    now = datetime.utcnow()
+    shift_status = "approved" if request.publish else "pending"
+    docs = []
+    for demand_index, rows in assignments:
+        demand = request.demands[demand_index]
+        for row in rows:
+            docs.append({
+                "employee_id": employee_ids[row],
+                "start_time": demand.start_time,
+                "end_time": demand.end_time,
+                "location": demand.location,
+                "role": demand.role,
+                "status": shift_status,
+                "created_at": now,
+                "updated_at": now,
+            })
+            if generation_id:
+                docs[-1]["generation_id"] = generation_id
+
+    created = 0
+    if docs and not request.dry_run:
+        async with versions.changes(versions.SCHEDULES, (doc["employee_id"] for doc in docs)):
+            created, insert_errors = await schedules_repo.insert_many(docs, SCHEDULE_INSERT_CHUNK_SIZE)
+        inserted = [doc for i, doc in enumerate(docs) if i not in insert_errors]
+        await coverage.record_created(inserted)
+
+    unfilled = [
+        {
+            "location": demand.location,
+            "role": demand.role,
+            "start_time": demand.start_time,
+            "end_time": demand.end_time,
+            "requested": demand.headcount,
+            "assigned": assigned_counts[i],
+        }
+        for i, demand in enumerate(request.demands)
+        if assigned_counts[i] < demand.headcount
+    ]
+
+    return {
+        "employees_considered": len(employees),
+        "demands": len(request.demands),
+        "shifts_assigned": len(docs) + len(stored),
+        "shifts_created": created + len(stored),
+        "unfilled": unfilled,
+    }
@@ -0,0 +1,115 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+from app.utils.database import get_database
+
+# Load environment variables
+load_dotenv()
+
+# Write-behind settings for session last_activity updates
+SESSION_TOUCH_FLUSH_SECONDS = float(os.getenv("SESSION_TOUCH_FLUSH_SECONDS", "5"))
+SESSION_TOUCH_BATCH_SIZE = int(os.getenv("SESSION_TOUCH_BATCH_SIZE", "500"))
+
+
+class SessionActivityBuffer:
+    """
+    Coalesces session touches in memory and writes them behind in bulk.
+
+    Only the latest activity per access token is kept, so a client polling
+    every few seconds costs one write per flush interval instead of one per
+    request. `$max` keeps last_activity monotonic when several workers flush
+    the same session.
+    """
+
+    def __init__(self, flush_seconds: float, batch_size: int):
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self._pending: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Counters for comparing request volume with write volume
+        self.touches = 0
+        self.writes = 0
+        self.flushes = 0
+
+    def touch(self, token: str, when: Optional[datetime] = None):
+        """
+        Record activity for a session without touching the database
+        """
+        self._pending[token] = when or datetime.utcnow()
+        self.touches += 1
+
+    def pending(self, token: str) -> Optional[datetime]:
+        """
+        Return the not-yet-flushed activity timestamp for a session, if any
+        """
+        return self._pending.get(token)
+
+    def discard(self, token: str):
+        """
+        Forget pending activity for a session that is being removed
+        """
+        self._pending.pop(token, None)
+
+    async def flush(self):
+        """
+        Write all pending touches as unordered bulk writes
+        """
+        if not self._pending:
+            return
+        db = get_database()
+        if db is None:
+            return
+
+        pending, self._pending = self._pending, {}
+        items = list(pending.items())
+        for i in range(0, len(items), self.batch_size):
+            chunk = items[i:i + self.batch_size]
+            ops = [
+                UpdateOne({"access_token": token}, {"$max": {"last_activity": ts}})
+                for token, ts in chunk
+            ]
+            try:
+                await db.sessions.bulk_write(ops, ordered=False)
+                self.writes += len(ops)
+                self.flushes += 1
+            except Exception as e:
+                print(f"Failed to flush session activity: {e}")
+                # Put the chunk back unless a newer touch arrived meanwhile
+                for token, ts in chunk:
+                    if token not in self._pending:
+                        self._pending[token] = ts
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Session activity flusher error: {e}")
+
+    def start(self):
+        """
+        Start the periodic background flusher
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background flusher and write out whatever is still pending
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+session_activity = SessionActivityBuffer(SESSION_TOUCH_FLUSH_SECONDS, SESSION_TOUCH_BATCH_SIZE)
@@ -0,0 +1,157 @@
+"""
+In-memory user autocomplete.
+
+Each worker keeps the lowercased search terms of every user (see
+users_repo.search_fields) in one sorted list of (term, user id) pairs.
+A prefix lookup is a bisect to the first term >= prefix followed by a scan
+while terms still start with it, which serves keystroke-by-keystroke
+autocomplete without a database round trip. Local writes update it
+directly; writes from other workers are picked up by a periodic refresh.
+"""
+import asyncio
+import os
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.repositories import users as users_repo
+
+# Load environment variables
+load_dotenv()
+
+# How often each worker picks up users written by other workers
+USER_DIRECTORY_REFRESH_SECONDS = float(os.getenv("USER_DIRECTORY_REFRESH_SECONDS", "30"))
+# Re-read this far behind the newest updated_at seen to tolerate clock skew between workers
+USER_DIRECTORY_OVERLAP_SECONDS = float(os.getenv("USER_DIRECTORY_OVERLAP_SECONDS", "10"))
+
+SUMMARY_FIELDS = ("first_name", "last_name", "email", "role", "is_active")
+
+
+class UserDirectory:
+    """
+    Sorted (term, user id) prefix index plus a summary of each user
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[str, str]] = []
+        self._terms: Dict[str, List[str]] = {}
+        self._users: Dict[str, dict] = {}
+        self._last_seen: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _remove_terms(self, user_id: str):
+        for term in self._terms.pop(user_id, ()):
+            i = bisect_left(self._entries, (term, user_id))
+            if i < len(self._entries) and self._entries[i] == (term, user_id):
+                del self._entries[i]
+
+    def update(self, doc: dict):
+        """
+        Apply a stored user document
+        """
+        user_id = str(doc["_id"])
+        terms = users_repo.search_fields(doc)["search_terms"]
+        if self._terms.get(user_id) != terms:
+            self._remove_terms(user_id)
+            for term in terms:
+                insort(self._entries, (term, user_id))
+            self._terms[user_id] = terms
+        self._users[user_id] = {"id": user_id, **{field: doc.get(field) for field in SUMMARY_FIELDS}}
+        updated_at = doc.get("updated_at")
+        if updated_at and (self._last_seen is None or updated_at > self._last_seen):
+            self._last_seen = updated_at
+
+    def complete(self, prefix: str, limit: int, role: Optional[str] = None,
+                 is_active: Optional[bool] = None) -> List[dict]:
+        """
+        Users with a name or email term starting with prefix, in term order
+        """
+        prefix = users_repo.normalize(prefix)
+        if not prefix:
+            return []
+        matches = []
+        seen = set()
+        i = bisect_left(self._entries, (prefix, ""))
+        while i < len(self._entries) and len(matches) < limit:
+            term, user_id = self._entries[i]
+            i += 1
+            if not term.startswith(prefix):
+                break
+            if user_id in seen:
+                continue
+            seen.add(user_id)
+            user = self._users[user_id]
+            if role is not None and user["role"] != role:
+                continue
+            if is_active is not None and bool(user["is_active"]) != is_active:
+                continue
+            matches.append(user)
+        return matches
+
+    async def _ingest(self, since: Optional[datetime] = None):
+        async for doc in users_repo.stream_directory(since):
+            self.update(doc)
+
+    async def load(self):
+        """
+        Build the directory from every user
+        """
+        await self._ingest()
+        if self._last_seen is None:
+            self._last_seen = datetime.utcnow()
+
+    async def refresh(self):
+        """
+        Pick up users updated since the last refresh
+        """
+        since = self._last_seen - timedelta(seconds=USER_DIRECTORY_OVERLAP_SECONDS)
+        await self._ingest(since)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(USER_DIRECTORY_REFRESH_SECONDS)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"User directory refresh error: {e}")
+
+    async def start(self):
+        """
+        Warm the directory and start the background refresher
+        """
+        await self.load()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background refresher
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+user_directory = UserDirectory()
+
+
+async def start_user_directory():
+    """
+    Warm the user directory when the application starts
+    """
+    await user_directory.start()
+
+
+async def stop_user_directory():
+    """
+    Stop user directory refreshes when the application shuts down
+    """
+    await user_directory.stop()
@@ -0,0 +1,87 @@
+"""
+Per-user change counters behind conditional GETs.
+
+change_versions holds one document per user (_id = user id) with a counter
+per resource. Every write runs inside `changes`, which bumps the counters of
+the users whose view it changes both before and after the write. A list
+endpoint reads that single document, derives its ETag from it, and answers
+If-None-Match with 304 before running its query.
+"""
+import hashlib
+from contextlib import asynccontextmanager
+from typing import Iterable, Optional
+from fastapi import Request, Response, status
+from pymongo import UpdateOne
+
+from app.utils.database import get_database, get_read_database, read_session
+
+SCHEDULES = "schedules"
+TIME_OFF = "time_off"
+AVAILABILITY = "availability"
+NOTIFICATIONS = "notifications"
+PROFILE = "profile"
+
+
+async def bump(resource: str, user_ids: Iterable[str]):
+    """
+    Record that resource changed for each of the given users
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    db = get_database()
+    await db.change_versions.bulk_write(
+        [UpdateOne({"_id": user_id}, {"$inc": {resource: 1}}, upsert=True) for user_id in user_ids],
+        ordered=False
+    )
+
+
+@asynccontextmanager
+async def changes(resource: str, user_ids: Iterable[str]):
+    """
+    Wrap a write that changes resource for the given users. The first bump
+    means a write that lands is never served as a 304 to an ETag taken before
+    it, even if the second bump fails. The second bump outdates ETags taken
+    during the write, whose bodies may be from before it; only they can be
+    stale, and only if that bump fails.
+    """
+    user_ids = set(user_ids)
+    await bump(resource, user_ids)
+    try:
+        yield
+    finally:
+        await bump(resource, user_ids)
+
+
+async def current(resource: str, user_id: str) -> int:
+    # Read where the body will be read from, before it, so the body is never older than the ETag
+    db = get_read_database()
+    doc = await db.change_versions.find_one({"_id": user_id}, {resource: 1}, session=read_session())
+    return doc.get(resource, 0) if doc else 0
+
+
+def make_etag(resource: str, user_id: str, version: int, request: Request) -> str:
+    # Query parameters (filters, cursor, limit) select different bodies at the same version
+    variant = hashlib.sha1(f"{user_id}?{request.url.query}".encode()).hexdigest()[:16]
+    return f'W/"{resource}-{version}-{variant}"'
+
+
+def _matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = {tag.strip() for tag in header.split(",")}
+    # Weak comparison: W/"x" matches "x"
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+
+async def not_modified(request: Request, response: Response, resource: str, user_id: str) -> Optional[Response]:
+    """
+    Return a 304 response if the client's If-None-Match is current, otherwise
+    set the ETag on response and return None so the handler builds the body
+    """
+    etag = make_etag(resource, user_id, await current(resource, user_id), request)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,6 +1,13 @@
+import asyncio
 import os
+from contextvars import ContextVar
+from typing import Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
+from pymongo.read_preferences import SecondaryPreferred
+
+from app.utils.metrics import METRICS_ENABLED, command_listener
+from app.utils.roundtrips import ROUNDTRIP_BUDGETS
 
 # Load environment variables
 load_dotenv()
@@ -9,33 +16,74 @@ load_dotenv()
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "nextera_workforce")
 
+# Connection pool settings, per worker process
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "10"))
+# How long a request waits for a free pooled connection before failing
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "30000"))
+# Secondaries further behind the primary than this are not read from (90 is the server's minimum)
+READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", "90"))
+
 # Global database client and connection objects
 client = None
 db = None
+read_db = None
+
+# Database handle and session that read-only repository calls of the current request use
+_read_target: ContextVar[Optional[Tuple[object, object]]] = ContextVar("read_target", default=None)
 
 async def connect_to_mongo():
     """
     Connect to MongoDB when the application starts
     """
-    global client, db
+    global client, db, read_db
     
     try:
-        client = AsyncIOMotorClient(MONGODB_URL)
+        monitored = METRICS_ENABLED or ROUNDTRIP_BUDGETS != "off"
+        client = AsyncIOMotorClient(
+            MONGODB_URL,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+            event_listeners=[command_listener] if monitored else []
+        )
         db = client[DB_NAME]
+        read_db = db.with_options(read_preference=SecondaryPreferred(max_staleness=READ_MAX_STALENESS_SECONDS))
         
         # Verify connection
         await client.admin.command('ping')
+        await warm_pool()
         print(f"Connected to MongoDB at {MONGODB_URL}")
+
+        from app.services.session_activity import session_activity
+        session_activity.start()
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
         raise e
 
+async def warm_pool():
+    """
+    Open minPoolSize connections now rather than on the first requests:
+    concurrent pings each check out a connection of their own
+    """
+    await asyncio.gather(*(client.admin.command('ping') for _ in range(MONGODB_MIN_POOL_SIZE)))
+
 async def close_mongo_connection():
     """
     Close MongoDB connection when the application shuts down
     """
     global client
     
+    # Write out buffered session activity before the client goes away
+    from app.services.session_activity import session_activity
+    await session_activity.stop()
+
     if client:
         client.close()
         print("MongoDB connection closed")
@@ -45,3 +93,37 @@ def get_database():
     Return database instance
     """
     return db
+
+def get_client():
+    return client
+
+def get_secondary_database():
+    """
+    Return the secondary-preferred database handle
+    """
+    return read_db if read_db is not None else db
+
+def route_reads(database, session=None):
+    """
+    Send the current request's read-only repository calls to database, in
+    session. Returns a token for unroute_reads.
+    """
+    return _read_target.set((database, session))
+
+def unroute_reads(token):
+    _read_target.reset(token)
+
+def get_read_database():
+    """
+    Return the database handle for reads that may be served by a secondary:
+    the one routed for the current request, otherwise the primary
+    """
+    target = _read_target.get()
+    return target[0] if target is not None else db
+
+def read_session():
+    """
+    Return the causally consistent session of the current request's routed reads, if any
+    """
+    target = _read_target.get()
+    return target[1] if target is not None else None
@@ -0,0 +1,24 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Union
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Longest shift accepted. Overlap queries look back this far from the start
+# of a window, which bounds the range of start times they scan.
+SCHEDULE_MAX_SHIFT_HOURS = int(os.getenv("SCHEDULE_MAX_SHIFT_HOURS", "24"))
+MAX_SHIFT = timedelta(hours=SCHEDULE_MAX_SHIFT_HOURS)
+
+
+def parse_datetime(value: Union[str, datetime]) -> datetime:
+    """
+    Parse an ISO 8601 string (or pass through a datetime) as a naive UTC
+    datetime, the form Mongo stores and returns dates in
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, List
+from bson import ObjectId
+from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse
+
+# Load environment variables
+load_dotenv()
+
+# Documents fetched per Motor batch and rows written per streamed chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "500"))
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+def _row(doc: dict, fields: List[str]) -> list:
+    return [_cell(doc.get("_id") if field == "id" else doc.get(field)) for field in fields]
+
+
+async def _ndjson_rows(cursor, fields: List[str]) -> AsyncIterator[bytes]:
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps(dict(zip(fields, _row(doc, fields)))))
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def _csv_rows(cursor, fields: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    async for doc in cursor:
+        writer.writerow(_row(doc, fields))
+        rows += 1
+        if rows >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_response(cursor, fields: List[str], fmt: str, filename: str) -> StreamingResponse:
+    """
+    Stream a Motor cursor as NDJSON or CSV without materializing the result set.
+    Memory use is bounded by the cursor batch size and the chunk size.
+    """
+    cursor = cursor.batch_size(EXPORT_BATCH_SIZE)
+    if fmt == "csv":
+        body, media_type = _csv_rows(cursor, fields), "text/csv"
+    else:
+        body, media_type = _ndjson_rows(cursor, fields), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
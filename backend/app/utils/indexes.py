@@ -0,0 +1,252 @@
+"""
+Declarative index registry.
+
+Modules declare the indexes (and the query shapes) of the collections they
+use with `register_index` / `register_query_shape`. `ensure_indexes` then
+reconciles the registry against the database idempotently; it runs at
+startup and from the command line:
+
+    python -m app.utils.indexes            # create or fix indexes
+    python -m app.utils.indexes --verify   # also explain() every query shape
+"""
+import asyncio
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from pymongo import IndexModel
+
+from app.utils.database import get_database
+
+# Options that make two indexes with the same key pattern differ
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+# Name suffix of the stand-in index kept while a drifted index is rebuilt
+BRIDGE_SUFFIX = "_rebuild"
+
+
+class IndexSpec:
+    def __init__(self, collection: str, keys: List[Tuple[str, Any]], options: Dict[str, Any]):
+        self.collection = collection
+        self.keys = keys
+        self.options = options
+        self.model = IndexModel(keys, **options)
+        self.name = self.model.document["name"]
+
+
+class QueryShape:
+    def __init__(self, collection: str, filter: dict, sort: Optional[List[Tuple[str, int]]], name: str):
+        self.collection = collection
+        self.filter = filter
+        self.sort = sort
+        self.name = name
+
+
+_indexes: List[IndexSpec] = []
+_query_shapes: List[QueryShape] = []
+
+
+def _normalize_keys(keys) -> List[Tuple[str, Any]]:
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    return [(k, d) for k, d in keys]
+
+
+def register_index(collection: str, keys, **options) -> IndexSpec:
+    """
+    Declare an index on a collection. Accepts the same keys/options as create_index.
+    """
+    spec = IndexSpec(collection, _normalize_keys(keys), options)
+    for existing in _indexes:
+        if existing.collection == collection and existing.name == spec.name:
+            return existing
+    _indexes.append(spec)
+    return spec
+
+
+def register_query_shape(collection: str, filter: dict, sort: Optional[Sequence[Tuple[str, int]]] = None,
+                         name: Optional[str] = None) -> QueryShape:
+    """
+    Declare a query shape that must be served by an index. Filter values are samples.
+    """
+    shape = QueryShape(collection, filter, list(sort) if sort else None, name or f"{collection}:{'+'.join(filter)}")
+    _query_shapes.append(shape)
+    return shape
+
+
+def registered_indexes() -> List[IndexSpec]:
+    return list(_indexes)
+
+
+def registered_query_shapes() -> List[QueryShape]:
+    return list(_query_shapes)
+
+
+def _matches(spec: IndexSpec, info: dict) -> bool:
+    if [(k, d) for k, d in info["key"]] != spec.keys:
+        return False
+    for option in COMPARED_OPTIONS:
+        if info.get(option) != spec.options.get(option):
+            # Mongo reports unique/sparse only when set
+            if option in ("unique", "sparse") and not info.get(option) and not spec.options.get(option):
+                continue
+            return False
+    return True
+
+
+def _bridge_model(spec: IndexSpec) -> IndexModel:
+    """
+    Index that serves the spec's queries while the spec itself is rebuilt.
+    Mongo refuses two indexes with the same key pattern, so it takes one
+    more key (or one fewer when the pattern already ends in _id).
+    """
+    if any(k == "_id" for k, _ in spec.keys):
+        keys = spec.keys[:-1]
+    else:
+        keys = spec.keys + [("_id", 1)]
+    options = {k: v for k, v in spec.options.items() if k in ("sparse", "partialFilterExpression")}
+    return IndexModel(keys, name=f"{spec.name}{BRIDGE_SUFFIX}", **options)
+
+
+def _ttl_drift_only(spec: IndexSpec, info: dict) -> bool:
+    if "expireAfterSeconds" not in spec.options or "expireAfterSeconds" not in info:
+        return False
+    return all(
+        bool(info.get(option)) == bool(spec.options.get(option)) if option in ("unique", "sparse")
+        else info.get(option) == spec.options.get(option)
+        for option in COMPARED_OPTIONS if option != "expireAfterSeconds"
+    )
+
+
+async def _rebuild(db, collection: str, spec: IndexSpec, same_keys: Dict[str, dict]):
+    """
+    Replace indexes with the spec's key pattern by the spec, never leaving
+    the collection without an index for those keys
+    """
+    if len(same_keys) == 1:
+        name, info = next(iter(same_keys.items()))
+        if _ttl_drift_only(spec, info):
+            await db.command("collMod", collection,
+                             index={"name": name, "expireAfterSeconds": spec.options["expireAfterSeconds"]})
+            return
+
+    bridge = _bridge_model(spec)
+    await db[collection].create_indexes([bridge])
+    for name in same_keys:
+        await db[collection].drop_index(name)
+    # If this fails (e.g. duplicates under a new unique constraint) the bridge keeps serving queries
+    await db[collection].create_indexes([spec.model])
+    await db[collection].drop_index(bridge.document["name"])
+
+
+async def ensure_indexes(db=None) -> Dict[str, List[str]]:
+    """
+    Create missing indexes and rebuild ones whose options drifted.
+
+    Returns a summary of created, rebuilt and failed index names, and of
+    unique indexes that are missing as a result. Existing indexes that are
+    not registered are left alone.
+    """
+    db = db if db is not None else get_database()
+    summary = {"created": [], "rebuilt": [], "failed": [], "missing_unique": []}
+
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in _indexes:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    for collection, specs in by_collection.items():
+        existing = await db[collection].index_information()
+        for spec in specs:
+            label = f"{collection}.{spec.name}"
+            same_keys = {name: info for name, info in existing.items()
+                         if [(k, d) for k, d in info["key"]] == spec.keys}
+            # Left behind by an earlier rebuild that failed
+            leftover_bridge = f"{spec.name}{BRIDGE_SUFFIX}" in existing
+            if any(_matches(spec, info) for info in same_keys.values()):
+                if leftover_bridge:
+                    await db[collection].drop_index(f"{spec.name}{BRIDGE_SUFFIX}")
+                continue
+            try:
+                if same_keys:
+                    await _rebuild(db, collection, spec, same_keys)
+                else:
+                    await db[collection].create_indexes([spec.model])
+                    if leftover_bridge:
+                        await db[collection].drop_index(f"{spec.name}{BRIDGE_SUFFIX}")
+                summary["rebuilt" if same_keys else "created"].append(label)
+            except Exception as e:
+                print(f"Failed to create index {label}: {e}")
+                summary["failed"].append(label)
+                if spec.options.get("unique"):
+                    summary["missing_unique"].append(label)
+    return summary
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            yield from _plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def verify_query_plans(db=None) -> List[str]:
+    """
+    explain() every registered query shape and return those planned as a COLLSCAN
+    """
+    db = db if db is not None else get_database()
+    failures = []
+    for shape in _query_shapes:
+        command = {"find": shape.collection, "filter": shape.filter}
+        if shape.sort:
+            command["sort"] = dict(shape.sort)
+        explained = await db.command("explain", command, verbosity="queryPlanner")
+        winning = explained["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_plan_stages(winning)):
+            failures.append(shape.name)
+    return failures
+
+
+async def ensure_indexes_on_startup():
+    """
+    Reconcile registered indexes when the application starts. Startup fails
+    while a unique index is missing; the unique_duplicates migration resolves
+    the duplicates that prevent building one.
+    """
+    summary = await ensure_indexes()
+    if summary["created"] or summary["rebuilt"]:
+        print(f"Indexes created: {summary['created']}, rebuilt: {summary['rebuilt']}")
+    # Writes rely on unique indexes (DuplicateKeyError) to reject duplicates
+    if summary["missing_unique"]:
+        raise RuntimeError(f"Unique indexes could not be built: {summary['missing_unique']}; resolve the "
+                           f"duplicates with `python -m app.services.migrations unique_duplicates`")
+
+
+async def _main(verify: bool) -> int:
+    from app.app import create_app
+    from app.utils import indexes
+    from app.utils.database import connect_to_mongo, close_mongo_connection
+
+    # Building the app imports every router, which registers their indexes.
+    # Use the imported module: under `python -m` this file is __main__ and
+    # has a registry of its own.
+    create_app()
+    await connect_to_mongo()
+    try:
+        summary = await indexes.ensure_indexes()
+        print(f"Created: {summary['created']}")
+        print(f"Rebuilt: {summary['rebuilt']}")
+        if summary["failed"]:
+            print(f"Failed: {summary['failed']}")
+            return 1
+        if verify:
+            failures = await indexes.verify_query_plans()
+            if failures:
+                print(f"Query shapes planned as COLLSCAN: {failures}")
+                return 1
+            print(f"All {len(indexes.registered_query_shapes())} query shapes use an index")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main("--verify" in sys.argv[1:])))
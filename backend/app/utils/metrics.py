@@ -0,0 +1,266 @@
+"""
+Request and Mongo metrics in Prometheus text format.
+
+MetricsMiddleware times every HTTP request and counts responses per route
+template and status. CommandMetricsListener, attached to the Motor client,
+times every Mongo command. The middleware puts a RequestStats in a
+contextvar and Motor copies the context into the executor thread that runs
+the command, so each command is also charged to the request that issued it.
+
+Counters live in this process; with several workers each one serves its
+own numbers and Prometheus should scrape every worker.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+# Load environment variables
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Upper bounds, in seconds, of the request latency histogram buckets
+METRICS_LATENCY_BUCKETS = tuple(
+    float(bound) for bound in os.getenv(
+        "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+    ).split(",")
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; counts are per bucket and made cumulative when rendered
+    """
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    """
+    Latency and Mongo work of one (method, route template)
+    """
+    __slots__ = ("latency", "commands", "command_seconds")
+
+    def __init__(self, latency_buckets: Tuple[float, ...]):
+        self.latency = Histogram(latency_buckets)
+        self.commands = 0
+        self.command_seconds = 0.0
+
+
+class RequestStats:
+    """
+    Mongo work done on behalf of one request. trace, when set to a list,
+    also collects a description of every command started.
+    """
+    __slots__ = ("commands", "seconds", "trace")
+
+    def __init__(self):
+        self.commands = 0
+        self.seconds = 0.0
+        self.trace: Optional[List[str]] = None
+
+    def add(self, command_name: str, seconds: float, failed: bool):
+        self.commands += 1
+        self.seconds += seconds
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide request and Mongo command counters
+    """
+
+    def __init__(self, latency_buckets: Tuple[float, ...] = METRICS_LATENCY_BUCKETS):
+        self.latency_buckets = latency_buckets
+        # Commands complete on Motor's executor threads
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.commands: Dict[str, List[float]] = {}
+
+    def request_started(self):
+        # Requests start and finish on the event loop thread only, so no lock
+        self.in_flight += 1
+
+    def request_finished(self, method: str, route: str, status_code: int, seconds: float,
+                         stats: RequestStats):
+        self.in_flight -= 1
+        with self._lock:
+            key = (method, route, status_code)
+            self.responses[key] = self.responses.get(key, 0) + 1
+            route_metrics = self.routes.get((method, route))
+            if route_metrics is None:
+                route_metrics = self.routes[(method, route)] = RouteMetrics(self.latency_buckets)
+            route_metrics.latency.observe(seconds)
+            route_metrics.commands += stats.commands
+            route_metrics.command_seconds += stats.seconds
+
+    def command_finished(self, command_name: str, seconds: float, failed: bool,
+                         stats: Optional[RequestStats] = None):
+        # A request's concurrent commands can finish on different threads
+        with self._lock:
+            if stats is not None:
+                stats.add(command_name, seconds, failed)
+            totals = self.commands.setdefault(command_name, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            if failed:
+                totals[2] += 1
+
+    def render(self) -> str:
+        """
+        All metrics in Prometheus text exposition format
+        """
+        with self._lock:
+            lines = [
+                "# HELP http_requests_in_flight Requests currently being served",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# HELP http_responses_total Responses by route template and status",
+                "# TYPE http_responses_total counter",
+            ]
+            for (method, route, status_code), count in sorted(self.responses.items()):
+                lines.append(f"http_responses_total{_labels(method=method, route=route, status=status_code)} {count}")
+
+            lines += [
+                "# HELP http_request_duration_seconds Request latency by route template",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            routes = sorted(self.routes.items())
+            for (method, route), route_metrics in routes:
+                histogram = route_metrics.latency
+                cumulative = 0
+                for bound, count in zip((*histogram.bounds, "+Inf"), histogram.counts):
+                    cumulative += count
+                    labels = _labels(method=method, route=route, le=bound)
+                    lines.append(f"http_request_duration_seconds_bucket{labels} {cumulative}")
+                labels = _labels(method=method, route=route)
+                lines.append(f"http_request_duration_seconds_sum{labels} {histogram.sum}")
+                lines.append(f"http_request_duration_seconds_count{labels} {cumulative}")
+
+            lines += [
+                "# HELP http_request_mongo_commands_total Mongo commands issued while serving each route",
+                "# TYPE http_request_mongo_commands_total counter",
+            ]
+            for (method, route), route_metrics in routes:
+                lines.append(f"http_request_mongo_commands_total{_labels(method=method, route=route)} "
+                             f"{route_metrics.commands}")
+            lines += [
+                "# HELP http_request_mongo_seconds_total Time spent in Mongo commands while serving each route",
+                "# TYPE http_request_mongo_seconds_total counter",
+            ]
+            for (method, route), route_metrics in routes:
+                lines.append(f"http_request_mongo_seconds_total{_labels(method=method, route=route)} "
+                             f"{route_metrics.command_seconds}")
+
+            lines += [
+                "# HELP mongo_commands_total Mongo commands by name, including background work",
+                "# TYPE mongo_commands_total counter",
+            ]
+            for name, (count, _, _) in sorted(self.commands.items()):
+                lines.append(f"mongo_commands_total{_labels(command=name)} {count}")
+            lines += [
+                "# HELP mongo_command_seconds_total Time spent in Mongo commands by name",
+                "# TYPE mongo_command_seconds_total counter",
+            ]
+            for name, (_, seconds, _) in sorted(self.commands.items()):
+                lines.append(f"mongo_command_seconds_total{_labels(command=name)} {seconds}")
+            lines += [
+                "# HELP mongo_command_failures_total Failed Mongo commands by name",
+                "# TYPE mongo_command_failures_total counter",
+            ]
+            for name, (_, _, failures) in sorted(self.commands.items()):
+                lines.append(f"mongo_command_failures_total{_labels(command=name)} {failures}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Times Mongo commands and charges them to the current request, if any
+    """
+
+    def started(self, event):
+        stats = request_stats.get()
+        if stats is not None and stats.trace is not None:
+            target = event.command.get(event.command_name)
+            stats.trace.append(f"{event.command_name} {target}" if isinstance(target, str) else event.command_name)
+
+    def _finished(self, event, failed: bool):
+        metrics.command_finished(event.command_name, event.duration_micros / 1e6, failed, request_stats.get())
+
+    def succeeded(self, event):
+        self._finished(event, False)
+
+    def failed(self, event):
+        self._finished(event, True)
+
+
+command_listener = CommandMetricsListener()
+
+
+def route_template(scope) -> str:
+    # FastAPI records the matched route in the scope while routing
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing each HTTP request, so streaming responses
+    pass through untouched
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.request_started()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.request_finished(scope["method"], route_template(scope), status_code,
+                                     time.perf_counter() - started, stats)
+            request_stats.reset(token)
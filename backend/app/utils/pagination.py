@@ -0,0 +1,129 @@
+"""
+Opaque keyset (cursor) pagination.
+
+A cursor encodes the sort key and _id of the last document on a page, so
+the next page is an indexed range scan that starts right after it instead
+of skipping over every earlier document.
+"""
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from bson import ObjectId
+from dotenv import load_dotenv
+from fastapi import HTTPException, Response, status
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Cursor sort values go into the query, so anything but a plain scalar is rejected
+CURSOR_VALUE_TYPES = (str, int, float, datetime)
+
+
+def encode_cursor(doc: dict, field: Optional[str]) -> str:
+    """
+    Build the cursor pointing just after doc for a (field, _id) sort
+    """
+    value = doc.get(field) if field else None
+    if isinstance(value, datetime):
+        key = {"d": value.isoformat()}
+    else:
+        key = {"v": value}
+    raw = json.dumps([key, str(doc["_id"])], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    """
+    Return the (sort value, _id) encoded in a cursor. Raises 400 when malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key, oid = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = datetime.fromisoformat(key["d"]) if "d" in key else key["v"]
+        return value, ObjectId(oid)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _valid_value(value, value_type: Optional[type]) -> bool:
+    # Documents missing the sort field page with a null value
+    if value is None:
+        return True
+    # bool is an int subclass; exact types also keep dict/list operators out
+    if type(value) not in CURSOR_VALUE_TYPES:
+        return False
+    if value_type is float:
+        return isinstance(value, (int, float))
+    return value_type is None or isinstance(value, value_type)
+
+
+def keyset_filter(field: Optional[str], direction: int, cursor: str, value_type: Optional[type] = None) -> dict:
+    """
+    Filter matching documents that sort strictly after the cursor. value_type
+    is the sort field's type; a cursor holding anything else is rejected with 400.
+    Null and missing values sort before every other value, so they come first
+    in ascending order and last in descending order.
+    """
+    value, oid = decode_cursor(cursor)
+    op = "$gt" if direction > 0 else "$lt"
+    if not field:
+        return {"_id": {op: oid}}
+    if not _valid_value(value, value_type):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    # $gt/$lt never match across types, so the null branches are spelled out
+    if value is None:
+        tied = {field: None, "_id": {op: oid}}
+        return {"$or": [{field: {"$ne": None}}, tied]} if direction > 0 else tied
+    after = [
+        {field: {op: value}},
+        {field: value, "_id": {op: oid}},
+    ]
+    if direction < 0:
+        after.append({field: None})
+    return {"$or": after}
+
+
+def sort_spec(field: Optional[str], direction: int) -> List[Tuple[str, int]]:
+    if not field:
+        return [("_id", direction)]
+    return [(field, direction), ("_id", direction)]
+
+
+async def fetch_page(collection, query: dict, field: Optional[str], direction: int,
+                     limit: int, cursor: Optional[str] = None, session=None,
+                     value_type: Optional[type] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch one page ordered by (field, _id) and return it with the next cursor,
+    which is None on the last page
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(field, direction, cursor, value_type)]}
+    docs = await collection.find(query, session=session).sort(sort_spec(field, direction)).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], field)
+    return docs, next_cursor
+
+
+def paginated(response: Response, items: List[dict], next_cursor: Optional[str], cursor: Optional[str]):
+    """
+    Shape a page for the caller. Callers that did not pass a cursor keep getting
+    a bare list; the next cursor is always available in the X-Next-Cursor header.
+    """
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if cursor is None:
+        return items
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,142 @@
+"""
+Per-router read routing to secondaries.
+
+Routers are mounted with Depends(read_routing(name)). GET requests to the
+routers named in SECONDARY_READ_ROUTERS send their read-only repository
+calls (those using get_read_database) to a secondary-preferred handle.
+Reads of one request share a causally consistent session, so a later read
+never sees older data than an earlier one, e.g. a list body is never
+older than the change version its ETag was derived from.
+
+The session lives as long as the dependency, i.e. until the response has
+been sent. Endpoints that hold their response open, like event streams,
+are marked @no_read_routing and read from the primary without a session.
+
+A user who just wrote reads from the primary for READ_YOUR_WRITES_SECONDS.
+The worker that took the write remembers the token, and a cookie carries
+the pin to other workers.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+from fastapi import Request, Response
+
+from app.utils.database import get_client, get_secondary_database, route_reads, unroute_reads
+from app.utils.tokens import token_digest
+
+# Load environment variables
+load_dotenv()
+
+# Routers whose GETs may read from secondaries, e.g. schedules,notifications,roles,users
+SECONDARY_READ_ROUTERS = {
+    name.strip() for name in os.getenv("SECONDARY_READ_ROUTERS", "").split(",") if name.strip()
+}
+READ_CAUSAL_SESSIONS = os.getenv("READ_CAUSAL_SESSIONS", "true").lower() == "true"
+# Longer than the replication lag you expect under load
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+# Tokens this worker remembers as recent writers; past this the oldest pins are dropped
+READ_YOUR_WRITES_MAX_ENTRIES = int(os.getenv("READ_YOUR_WRITES_MAX_ENTRIES", "10000"))
+
+READ_PRIMARY_COOKIE = "read_primary_until"
+READ_METHODS = ("GET", "HEAD")
+
+
+class RecentWriters:
+    """
+    In-process TTL/LRU set of tokens whose reads stay on the primary, keyed
+    by token digest. Every pin lasts ttl_seconds, so the oldest entry is
+    always the first to expire and expired pins are dropped from the front.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def pin(self, token: str):
+        now = time.monotonic()
+        digest = token_digest(token)
+        self._entries.pop(digest, None)
+        self._entries[digest] = now + self.ttl_seconds
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or next(iter(self._entries.values())) <= now):
+            self._entries.popitem(last=False)
+
+    def pinned(self, token: str) -> bool:
+        until = self._entries.get(token_digest(token))
+        return until is not None and until > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+recent_writers = RecentWriters(READ_YOUR_WRITES_MAX_ENTRIES, READ_YOUR_WRITES_SECONDS)
+
+
+def no_read_routing(fn):
+    """
+    Keep an endpoint's reads on the primary, outside any session. Use it on
+    endpoints whose response stays open, so no session is held for its lifetime.
+    """
+    fn.no_read_routing = True
+    return fn
+
+
+def _routable(request: Request) -> bool:
+    endpoint = getattr(request.scope.get("route"), "endpoint", None)
+    return not getattr(endpoint, "no_read_routing", False)
+
+
+def _bearer_token(request: Request) -> Optional[str]:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return token if scheme.lower() == "bearer" and token else None
+
+
+def _pin(request: Request, response: Response):
+    token = _bearer_token(request)
+    if token:
+        recent_writers.pin(token)
+    until = time.time() + READ_YOUR_WRITES_SECONDS
+    response.set_cookie(READ_PRIMARY_COOKIE, str(until), max_age=math.ceil(READ_YOUR_WRITES_SECONDS),
+                        httponly=True, samesite="lax")
+
+
+def _pinned(request: Request) -> bool:
+    token = _bearer_token(request)
+    if token and recent_writers.pinned(token):
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_routing(router: str):
+    """
+    Router dependency choosing where the request's reads go
+    """
+    async def dependency(request: Request, response: Response):
+        if request.method not in READ_METHODS:
+            _pin(request, response)
+            yield
+            return
+        if router not in SECONDARY_READ_ROUTERS or not _routable(request) or _pinned(request):
+            yield
+            return
+        if not READ_CAUSAL_SESSIONS:
+            token = route_reads(get_secondary_database())
+            try:
+                yield
+            finally:
+                unroute_reads(token)
+            return
+        async with await get_client().start_session(causal_consistency=True) as session:
+            token = route_reads(get_secondary_database(), session)
+            try:
+                yield
+            finally:
+                unroute_reads(token)
+    return dependency
@@ -0,0 +1,92 @@
+"""
+Per-route Mongo round-trip budgets.
+
+An endpoint declares how many Mongo commands one request may issue with
+@roundtrip_budget(n), placed under the router decorator. Budgets count the
+whole request, so they include the authentication cold path
+(AUTH_ROUNDTRIPS). RoundTripBudgetMiddleware counts commands through the
+metrics command listener and, per ROUNDTRIP_BUDGETS:
+
+- off: nothing is traced (the default)
+- warn: requests over budget print their command sequence; the response
+  itself is never changed
+"""
+import os
+from typing import Optional
+from dotenv import load_dotenv
+
+from app.utils.metrics import RequestStats, request_stats, route_template
+
+# Load environment variables
+load_dotenv()
+
+ROUNDTRIP_BUDGETS = os.getenv("ROUNDTRIP_BUDGETS", "off").lower()
+BUDGET_MODES = ("off", "warn")
+
+# An uncached bearer token costs a sessions lookup and a users lookup
+AUTH_ROUNDTRIPS = 2
+
+
+def roundtrip_budget(max_commands: int):
+    """
+    Declare the most Mongo commands a request to the decorated endpoint may issue
+    """
+    def decorator(fn):
+        fn.roundtrip_budget = max_commands
+        return fn
+    return decorator
+
+
+def route_budget(scope) -> Optional[int]:
+    route = scope.get("route")
+    return getattr(getattr(route, "endpoint", None), "roundtrip_budget", None)
+
+
+def budget_violation(scope, stats: RequestStats) -> Optional[str]:
+    """
+    Describe how the request overran its route's budget, or None if it did not
+    """
+    budget = route_budget(scope)
+    if budget is None or stats.commands <= budget:
+        return None
+    return (f"{scope['method']} {route_template(scope)} issued {stats.commands} Mongo commands, "
+            f"budget is {budget}: {', '.join(stats.trace or [])}")
+
+
+class RoundTripBudgetMiddleware:
+    """
+    Pure ASGI middleware checking each request against its route's budget
+    once the handler has started its response
+    """
+
+    def __init__(self, app, mode: str = ROUNDTRIP_BUDGETS):
+        if mode not in BUDGET_MODES:
+            raise ValueError(f"ROUNDTRIP_BUDGETS must be one of {BUDGET_MODES}, got {mode!r}")
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.mode == "off":
+            await self.app(scope, receive, send)
+            return
+
+        # Share the metrics middleware's stats when it runs outside this one
+        stats = request_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = request_stats.set(stats)
+        stats.trace = []
+
+        async def send_checked(message):
+            if message["type"] == "http.response.start":
+                violation = budget_violation(scope, stats)
+                if violation is not None:
+                    print(f"Round-trip budget exceeded: {violation}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_checked)
+        finally:
+            if token is not None:
+                request_stats.reset(token)
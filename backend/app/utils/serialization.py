@@ -0,0 +1,76 @@
+"""
+One-pass JSON serialization of Motor documents.
+
+Read endpoints that return stored documents unchanged can skip building a
+Pydantic model per document and then validating it again as the
+response_model. Each response schema is compiled once into a field
+projection (response field, document key, default). Documents are picked
+through it and encoded by orjson directly to bytes, which are returned as
+a raw response. The schema still documents the endpoint in OpenAPI.
+"""
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from pydantic import BaseModel
+
+from app.utils.pagination import paginated
+
+Projection = Tuple[Tuple[str, str, Any], ...]
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+@lru_cache(maxsize=None)
+def projection(schema: Type[BaseModel]) -> Projection:
+    """
+    Compile a response schema into (field, document key, default) triples.
+    The id field reads the document's _id.
+    """
+    fields = []
+    for name, field in schema.model_fields.items():
+        source = "_id" if name == "id" else (field.alias or name)
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        fields.append((name, source, default))
+    return tuple(fields)
+
+
+def project(doc: dict, fields: Projection) -> dict:
+    return {name: doc.get(source, default) for name, source, default in fields}
+
+
+def dump(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+def json_response(body: bytes, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """
+    Wrap encoded JSON in a raw response, keeping headers already set on the
+    handler's injected response (ETag, X-Next-Cursor), which FastAPI only
+    merges into responses it builds itself
+    """
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"} if response else None
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def documents_response(docs: List[dict], schema: Type[BaseModel], response: Optional[Response] = None) -> Response:
+    """
+    Serialize a list of documents shaped as schema
+    """
+    fields = projection(schema)
+    return json_response(dump([project(doc, fields) for doc in docs]), response)
+
+
+def page_response(response: Response, docs: List[dict], schema: Type[BaseModel],
+                  next_cursor: Optional[str], cursor: Optional[str]) -> Response:
+    """
+    Same contract as pagination.paginated, serialized in one pass
+    """
+    fields = projection(schema)
+    body = paginated(response, [project(doc, fields) for doc in docs], next_cursor, cursor)
+    return json_response(dump(body), response)
@@ -0,0 +1,110 @@
+"""
+Fixed-width time slots shared by scheduling and availability code.
+
+The week is split into 15-minute slots starting Sunday 00:00, matching
+AvailabilityModel.day_of_week (0 = Sunday).
+"""
+import math
+from datetime import datetime, timedelta
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+
+
+def day_of_week(moment: datetime) -> int:
+    """
+    Day of week with 0 = Sunday, as stored on availability documents
+    """
+    return (moment.weekday() + 1) % 7
+
+
+def week_slot(moment: datetime) -> int:
+    """
+    Slot index of a moment within its Sunday-based week
+    """
+    return day_of_week(moment) * SLOTS_PER_DAY + (moment.hour * 60 + moment.minute) // SLOT_MINUTES
+
+
+def floor_to_slot(moment: datetime) -> datetime:
+    """
+    Round a datetime down to the start of its slot
+    """
+    return moment.replace(minute=moment.minute - moment.minute % SLOT_MINUTES, second=0, microsecond=0)
+
+
+def slot_offset(origin: datetime, moment: datetime, round_up: bool = False) -> int:
+    """
+    Number of whole slots between origin and moment
+    """
+    minutes = (moment - origin) / timedelta(minutes=SLOT_MINUTES)
+    return math.ceil(minutes) if round_up else math.floor(minutes)
+
+
+# Bytes in a packed week of slots (bit i = week slot i, little-endian)
+WEEK_MASK_BYTES = SLOTS_PER_WEEK // 8
+FULL_WEEK_MASK = (1 << SLOTS_PER_WEEK) - 1
+
+
+def range_mask(start: int, end: int) -> int:
+    """
+    Bitmask of week slots [start, end), wrapping past the end of the week
+    """
+    length = end - start
+    if length <= 0:
+        return 0
+    if length >= SLOTS_PER_WEEK:
+        return FULL_WEEK_MASK
+    start %= SLOTS_PER_WEEK
+    mask = ((1 << length) - 1) << start
+    return (mask | (mask >> SLOTS_PER_WEEK)) & FULL_WEEK_MASK
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _day_window(day: int, start_time: str, end_time: str) -> tuple:
+    # Minutes since the start of the week; an end at or before the start runs past midnight
+    start = day * 24 * 60 + _minutes(start_time)
+    end = day * 24 * 60 + _minutes(end_time)
+    if end <= start:
+        end += 24 * 60
+    return start, end
+
+
+def window_mask(day: int, start_time: str, end_time: str) -> int:
+    """
+    Bitmask of every week slot an "HH:MM"-"HH:MM" window on a day touches,
+    rounding outward. Use it for demand and query windows: a slot needs
+    staff if any part of it is wanted.
+    An end time at or before the start runs past midnight into the next day.
+    """
+    start, end = _day_window(day, start_time, end_time)
+    return range_mask(start // SLOT_MINUTES, math.ceil(end / SLOT_MINUTES))
+
+
+def availability_mask(day: int, start_time: str, end_time: str) -> int:
+    """
+    Bitmask of the week slots an "HH:MM"-"HH:MM" availability window on a day
+    covers completely, rounding inward: someone available 09:10-16:50 is
+    not available for the 09:00 or 16:45 slots.
+    An end time at or before the start runs past midnight into the next day.
+    """
+    start, end = _day_window(day, start_time, end_time)
+    return range_mask(math.ceil(start / SLOT_MINUTES), end // SLOT_MINUTES)
+
+
+def mask_to_bytes(mask: int) -> bytes:
+    """
+    Pack a week mask into WEEK_MASK_BYTES bytes
+    """
+    return mask.to_bytes(WEEK_MASK_BYTES, "little")
+
+
+def mask_from_bytes(data: bytes) -> int:
+    """
+    Unpack a week mask stored by mask_to_bytes
+    """
+    return int.from_bytes(data, "little")
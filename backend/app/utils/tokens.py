@@ -0,0 +1,8 @@
+import hashlib
+
+
+def token_digest(token: str) -> str:
+    """
+    Return a stable SHA-256 hex digest for a raw JWT string
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
@@ -0,0 +1,65 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class PoolSaturated(Exception):
+    """
+    Raised when a bounded pool already has its maximum amount of queued work
+    """
+
+
+class BoundedWorkerPool:
+    """
+    Runs blocking callables off the event loop with a bounded backlog.
+
+    At most `workers` calls run at once and at most `queue_size` more may
+    wait for a worker; anything beyond that is rejected immediately with
+    PoolSaturated instead of piling up behind the pool.
+    """
+
+    def __init__(self, kind: str, workers: int, queue_size: int):
+        if kind not in ("thread", "process"):
+            raise ValueError("Pool kind must be 'thread' or 'process'")
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: Optional[Executor] = None
+        self._inflight = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run fn(*args) in the pool, raising PoolSaturated if the backlog is full
+        """
+        if self._inflight >= self.capacity:
+            raise PoolSaturated()
+        self._inflight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._inflight -= 1
+
+    def shutdown(self):
+        """
+        Release the pool's threads or processes
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,102 @@
+import asyncio
+import importlib.util
+import os
+import signal
+import uvicorn
+from dotenv import load_dotenv
+from uvicorn.supervisors import Multiprocess
+
+from app.services.notification_hub import NOTIFICATION_FANOUT
+from app.services.readiness import begin_shutdown
+
+# Load environment variables
+load_dotenv()
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+# How long a worker keeps answering /ready with 503, while still serving, after SIGTERM
+SERVER_SHUTDOWN_DELAY_SECONDS = float(os.getenv("SERVER_SHUTDOWN_DELAY_SECONDS", "5"))
+# How long a worker keeps serving in-flight requests once it stops accepting connections
+SERVER_GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "30"))
+SERVER_KEEP_ALIVE_SECONDS = int(os.getenv("SERVER_KEEP_ALIVE_SECONDS", "5"))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+class DrainingServer(uvicorn.Server):
+    """
+    A uvicorn server that reports not ready as soon as it is asked to stop,
+    then keeps serving for shutdown_delay seconds so load balancers notice
+    before uvicorn closes the listener and drains connections
+    """
+
+    def __init__(self, config: uvicorn.Config, shutdown_delay: float = SERVER_SHUTDOWN_DELAY_SECONDS):
+        super().__init__(config)
+        self.shutdown_delay = shutdown_delay
+        self.draining = False
+
+    def handle_exit(self, sig, frame):
+        if not self.draining:
+            self.draining = True
+            begin_shutdown()
+            print(f"Received signal {sig}, not ready; draining in {self.shutdown_delay}s")
+            if self.shutdown_delay > 0:
+                asyncio.get_event_loop().call_later(self.shutdown_delay, super().handle_exit, sig, frame)
+                return
+        elif sig != signal.SIGINT:
+            # The supervisor forwards the SIGTERM a process group may already have received
+            return
+        # Ctrl+C again skips the delay, and a third time forces the exit
+        super().handle_exit(sig, frame)
+
+class DrainingSupervisor(Multiprocess):
+    """
+    Signals every worker before waiting for any of them; uvicorn's supervisor
+    stops them one at a time, leaving the rest ready while the first drains
+    """
+
+    def shutdown(self):
+        for process in self.processes:
+            process.terminate()
+        # Joins each worker; the SIGTERM it sends again is ignored while draining
+        super().shutdown()
+
+def main():
+    """
+    Run the API in production: several worker processes, no reload, uvloop
+    and httptools when installed. On SIGTERM each worker reports not ready,
+    keeps serving for SERVER_SHUTDOWN_DELAY_SECONDS, then stops accepting
+    connections and drains in-flight requests before shutting down. Workers
+    answer /ready only after their startup warm-up has finished.
+    """
+    if SERVER_WORKERS > 1 and NOTIFICATION_FANOUT == "local":
+        # Streams would only see notifications inserted by their own worker
+        raise SystemExit(f"NOTIFICATION_FANOUT=local needs SERVER_WORKERS=1, got {SERVER_WORKERS}; "
+                         "use poll or change_stream with several workers")
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+    print(f"Starting {SERVER_WORKERS} workers on {SERVER_HOST}:{SERVER_PORT} (loop={loop}, http={http})")
+    config = uvicorn.Config(
+        "main:app",
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=SERVER_WORKERS,
+        loop=loop,
+        http=http,
+        backlog=SERVER_BACKLOG,
+        timeout_keep_alive=SERVER_KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        proxy_headers=True,
+    )
+    # What uvicorn.run does, with the draining server in each worker
+    server = DrainingServer(config)
+    if config.workers > 1:
+        sock = config.bind_socket()
+        DrainingSupervisor(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+if __name__ == "__main__":
+    main()
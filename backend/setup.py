@@ -29,6 +29,7 @@ def main():
         print("venv\\Scripts\\activate && python main.py")
     else:
         print("source venv/bin/activate && python main.py")
+    print("For production, run python serve.py instead (multiple workers, no reload)")
 
 if __name__ == "__main__":
     main()
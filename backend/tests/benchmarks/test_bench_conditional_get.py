@@ -0,0 +1,74 @@
+"""
+A dashboard refresh loop: one user re-fetching the five dashboard lists
+with and without If-None-Match while nothing changes. Reports the response
+bytes, process CPU time and Mongo commands of each loop.
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+DASHBOARD = ["/api/v1/schedules", "/api/v1/schedules/time-off", "/api/v1/profile/availability",
+             "/api/v1/notifications", "/api/v1/profile"]
+REFRESHES = 200
+
+
+async def _seed(db, employee_id: str):
+    start = datetime(2026, 1, 5, 9)
+    await db.schedules.insert_many([
+        {"employee_id": employee_id, "start_time": start + timedelta(days=i), "location": "Store 1",
+         "end_time": start + timedelta(days=i, hours=8), "role": "cashier", "status": "approved",
+         "created_at": start, "updated_at": start} for i in range(50)
+    ])
+    await db.time_off_requests.insert_many([
+        {"employee_id": employee_id, "start_date": start + timedelta(days=i), "reason": "Holiday",
+         "end_date": start + timedelta(days=i + 1), "status": "approved", "created_at": start,
+         "updated_at": start} for i in range(20)
+    ])
+    await db.availability.insert_many([
+        {"employee_id": employee_id, "day_of_week": day, "start_time": "09:00", "end_time": "17:00",
+         "is_available": True} for day in range(7)
+    ])
+    await db.notifications.insert_many([
+        {"employee_id": employee_id, "message": f"Shift {i} was published", "is_read": False,
+         "created_at": start + timedelta(minutes=i)} for i in range(50)
+    ])
+
+
+async def _refresh_loop(client, headers, conditional: bool):
+    etags = {}
+    total_bytes = 0
+    statuses = set()
+    cpu = time.process_time()
+    for _ in range(REFRESHES):
+        for path in DASHBOARD:
+            request_headers = dict(headers)
+            if conditional and path in etags:
+                request_headers["If-None-Match"] = etags[path]
+            response = await client.get(path, headers=request_headers)
+            etags[path] = response.headers["etag"]
+            total_bytes += len(response.content)
+            statuses.add(response.status_code)
+    return total_bytes, time.process_time() - cpu, statuses
+
+
+async def test_dashboard_refresh_loop(client, login, user_id, db, mongo_commands):
+    headers = await login("employee@example.com", role="employee")
+    await _seed(db, await user_id("employee@example.com"))
+    results = {}
+    for conditional in (False, True):
+        before = mongo_commands()
+        total_bytes, cpu, statuses = await _refresh_loop(client, headers, conditional)
+        results[conditional] = (total_bytes, cpu, mongo_commands() - before)
+        label = "If-None-Match" if conditional else "unconditional"
+        print(f"\n{label}: {REFRESHES} refreshes of {len(DASHBOARD)} lists, {total_bytes / 1024:.0f} KiB, "
+              f"{cpu:.2f} s CPU, {results[conditional][2]} Mongo commands, statuses {sorted(statuses)}")
+
+    plain, conditional = results[False], results[True]
+    print(f"saved {1 - conditional[0] / plain[0]:.1%} of bytes, {1 - conditional[1] / plain[1]:.1%} of CPU")
+    # Only the first refresh of each list carries a body
+    assert conditional[0] * REFRESHES <= plain[0] * 1.01
+    assert conditional[1] < plain[1]
+    assert conditional[2] < plain[2]
@@ -0,0 +1,114 @@
+"""
+Metrics overhead on an authenticated GET /api/v1/users/{user_id}.
+
+Timing the whole request with and without MetricsMiddleware differs by
+less than the run-to-run noise, so the cost is measured per component
+instead: the middleware wrapped around a no-op ASGI app, plus the command
+listener's started/succeeded callbacks once per Mongo command the request
+issues. Their sum is compared with the request served by create_app()
+without metrics, driven straight through ASGI so no client cost dilutes
+it. With a real server every command adds a network round trip, so the
+overhead there is lower still. The end-to-end comparison is printed too.
+"""
+import gc
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import app as app_module
+from app.app import create_app
+from app.utils.metrics import CommandMetricsListener, MetricsMiddleware, RequestStats, request_stats
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+REQUESTS = 500
+ROUNDS = 15
+MAX_OVERHEAD = 0.02
+
+
+def _scope(path: str, headers: dict) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "server": ("test", 80), "client": ("127.0.0.1", 1234), "root_path": "",
+        "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _per_request(app, path: str, headers: dict) -> float:
+    """
+    Best per-request time over ROUNDS rounds of REQUESTS requests
+    """
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            for _ in range(REQUESTS):
+                await app(_scope(path, headers), _receive, send)
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+    assert set(statuses) == {200}
+    return best / REQUESTS
+
+
+def _listener_cost() -> float:
+    """
+    Best time for the listener callbacks of one command issued during a request
+    """
+    listener = CommandMetricsListener()
+    started_event = SimpleNamespace(command_name="find", command={"find": "users"})
+    succeeded_event = SimpleNamespace(command_name="find", duration_micros=800)
+    token = request_stats.set(RequestStats())
+    best = float("inf")
+    try:
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            for _ in range(REQUESTS):
+                listener.started(started_event)
+                listener.succeeded(succeeded_event)
+            best = min(best, time.perf_counter() - started)
+    finally:
+        request_stats.reset(token)
+    return best / REQUESTS
+
+
+async def test_metrics_overhead_is_under_two_percent(app, login, user_id, mongo_commands, monkeypatch):
+    headers = await login()
+    path = f"/api/v1/users/{await user_id('admin@example.com')}"
+    monkeypatch.setattr(app_module, "METRICS_ENABLED", False)
+    bare = create_app()
+    assert not any(getattr(route, "path", None) == "/metrics" for route in bare.routes)
+
+    before = mongo_commands()
+    await _per_request(bare, path, headers)
+    commands = (mongo_commands() - before) / (ROUNDS * REQUESTS)
+
+    request = await _per_request(bare, path, headers)
+    middleware = (await _per_request(MetricsMiddleware(_noop_app), "/", {})
+                  - await _per_request(_noop_app, "/", {}))
+    listener = commands * _listener_cost()
+    overhead = (middleware + listener) / request
+
+    with_metrics = await _per_request(app, path, headers)
+    print(f"\nrequest without metrics {request * 1e6:.0f} us, {commands:.0f} Mongo commands; "
+          f"middleware {middleware * 1e6:.2f} us, listener {listener * 1e6:.2f} us, overhead {overhead:.2%}"
+          f"\nend to end: without metrics {request * 1e6:.0f} us, with metrics {with_metrics * 1e6:.0f} us")
+    assert overhead < MAX_OVERHEAD
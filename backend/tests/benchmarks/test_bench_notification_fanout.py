@@ -0,0 +1,41 @@
+"""
+Fan-out throughput for 50,000 recipients: notifications written per
+second and Mongo commands per chunk. The stand-in scans a collection for
+every upsert, so without TEST_MONGODB_URL the run uses 5,000 recipients
+and only the command count is asserted.
+"""
+import os
+import time
+
+import pytest
+
+from app.services.notification_fanout import FANOUT_CHUNK_SIZE, create_fanout, run_fanout
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+REAL_SERVER = bool(os.getenv("TEST_MONGODB_URL"))
+RECIPIENTS = 50_000 if REAL_SERVER else 5_000
+
+
+async def test_fanout_throughput(db, mongo_commands):
+    await db.users.insert_many([
+        {"email": f"e{i}@example.com", "role": "employee", "is_active": True} for i in range(RECIPIENTS)
+    ])
+    fanout = await create_fanout("Week 2 is published", {"roles": ["employee"]}, "admin")
+
+    before = mongo_commands()
+    started = time.perf_counter()
+    await run_fanout(fanout["_id"])
+    elapsed = time.perf_counter() - started
+    commands = mongo_commands() - before
+
+    progress = await db.notification_fanouts.find_one({"_id": fanout["_id"]})
+    chunks = progress["chunks_done"]
+    print(f"\n{progress['delivered']} notifications in {elapsed:.2f} s "
+          f"({progress['delivered'] / elapsed:.0f}/s), {chunks} chunks of {FANOUT_CHUNK_SIZE}, "
+          f"{commands} Mongo commands")
+    assert (progress["status"], progress["delivered"]) == ("completed", RECIPIENTS)
+    # Per chunk: recipient page, insert, counter increments, version bump, progress update
+    assert commands <= 5 * chunks + 5
+    if REAL_SERVER:
+        assert progress["delivered"] / elapsed > 10_000
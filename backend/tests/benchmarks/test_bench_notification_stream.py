@@ -0,0 +1,64 @@
+"""
+Idle Server-Sent Events connections held by one worker: 10,000 streams
+spread over 100 users. Reports the connect time, memory per idle
+connection, Mongo commands while idle and the time to push one
+notification to every user.
+"""
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from app.services.auth import create_access_token
+from app.services.notification_hub import notification_hub
+from app.services.notifications import deliver
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+USERS = 100
+CONNECTIONS = 10_000
+
+
+async def test_ten_thousand_idle_streams(db, open_stream, mongo_commands):
+    result = await db.users.insert_many([
+        {"email": f"e{i}@example.com", "role": "employee", "is_active": True} for i in range(USERS)
+    ])
+    employee_ids = [str(employee_id) for employee_id in result.inserted_ids]
+    tokens = [create_access_token({"sub": employee_id, "role": "employee"}) for employee_id in employee_ids]
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    streams = []
+    for i in range(CONNECTIONS):
+        stream = await open_stream("/api/v1/notifications/stream",
+                                   {"Authorization": f"Bearer {tokens[i % USERS]}"})
+        assert stream.status == 200
+        await stream.read()  # retry hint
+        streams.append(stream)
+    connect_time = time.perf_counter() - started
+    per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / CONNECTIONS
+    tracemalloc.stop()
+    assert notification_hub.connections() == CONNECTIONS
+
+    before = mongo_commands()
+    await asyncio.sleep(1)
+    idle_commands = mongo_commands() - before
+
+    started = time.perf_counter()
+    await deliver([{"employee_id": employee_id, "message": "Week published", "created_at": datetime.utcnow()}
+                   for employee_id in employee_ids])
+    received = 0
+    for stream in streams:
+        while not (await stream.read()).startswith("id: "):
+            pass
+        received += 1
+    push_time = time.perf_counter() - started
+
+    print(f"\n{CONNECTIONS} streams for {USERS} users: connected in {connect_time:.2f} s, "
+          f"{per_connection / 1024:.1f} KiB each, {idle_commands} Mongo commands idle for 1 s, "
+          f"{received} events pushed in {push_time:.2f} s")
+    assert received == CONNECTIONS
+    assert idle_commands == 0
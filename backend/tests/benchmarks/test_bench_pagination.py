@@ -0,0 +1,60 @@
+"""
+Page latency at increasing depths of one employee's schedule, keyset
+cursor vs skip/limit.
+
+The request asks for 1M schedules. That needs a real server
+(TEST_MONGODB_URL), where pages are index range scans. The in-memory
+stand-in has no indexes and filters every document on each query, so
+without a server the benchmark uses BENCH_SCHEDULES (default 20000)
+documents and reports the latencies without asserting flatness.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.repositories import schedules as schedules_repo
+from app.utils.indexes import ensure_indexes
+from app.utils.pagination import encode_cursor
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+TEST_MONGODB_URL = os.getenv("TEST_MONGODB_URL")
+SCHEDULES = int(os.getenv("BENCH_SCHEDULES", "1000000" if TEST_MONGODB_URL else "20000"))
+PAGE = 100
+BATCH = 10000
+
+
+async def _timed(fn) -> float:
+    started = time.perf_counter()
+    await fn()
+    return (time.perf_counter() - started) * 1000
+
+
+async def test_page_latency_by_depth(app, db):
+    await ensure_indexes(db)
+    start = datetime(2020, 1, 1)
+    for offset in range(0, SCHEDULES, BATCH):
+        await db.schedules.insert_many([
+            {"employee_id": "e1", "start_time": start + timedelta(hours=i), "end_time": start + timedelta(hours=i + 1),
+             "location": "A", "role": "cashier", "status": "approved"}
+            for i in range(offset, min(offset + BATCH, SCHEDULES))
+        ])
+
+    results = []
+    for depth in (0, SCHEDULES // 10, SCHEDULES // 2, SCHEDULES - PAGE):
+        anchor = await db.schedules.find({"employee_id": "e1"}).sort([("start_time", 1), ("_id", 1)])\
+                                   .skip(max(depth - 1, 0)).limit(1).to_list(1)
+        cursor = encode_cursor(anchor[0], "start_time") if depth else None
+        keyset_ms = await _timed(lambda: schedules_repo.find_page({"employee_id": "e1"}, PAGE, cursor))
+        skip_ms = await _timed(lambda: db.schedules.find({"employee_id": "e1"})
+                               .sort([("start_time", 1), ("_id", 1)]).skip(depth).limit(PAGE).to_list(PAGE))
+        results.append((depth, keyset_ms, skip_ms))
+
+    print(f"\n{SCHEDULES} schedules, page size {PAGE}")
+    for depth, keyset_ms, skip_ms in results:
+        print(f"depth {depth:>8}: cursor {keyset_ms:8.2f} ms, skip {skip_ms:8.2f} ms")
+    if TEST_MONGODB_URL:
+        # Index range scans cost the same at any depth
+        assert results[-1][1] < max(5 * results[0][1], 20)
@@ -0,0 +1,51 @@
+"""
+Latency of an unrelated GET while a login storm hashes passwords. With
+bcrypt on the event loop every login would stall the GET for the length
+of a hash; in the pool the GET stays near its idle latency.
+"""
+import asyncio
+import statistics
+import time
+
+import pytest
+
+from app.services.auth import pwd_context
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+LOGINS = 40
+PROBES = 50
+
+
+async def _probe_latencies(client) -> list:
+    latencies = []
+    for _ in range(PROBES):
+        started = time.perf_counter()
+        assert (await client.get("/health")).status_code == 200
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def test_get_latency_during_login_storm(client, login, password):
+    # Production cost factor, so a verification takes as long as it does in production
+    pwd_context.update(bcrypt__rounds=12)
+    try:
+        await login()
+        idle = await _probe_latencies(client)
+
+        async def storm():
+            for _ in range(LOGINS // 4):
+                await client.post("/api/v1/auth/login",
+                                  data={"username": "admin@example.com", "password": password})
+        logins = asyncio.gather(*(storm() for _ in range(4)))
+        busy = await _probe_latencies(client)
+        await logins
+    finally:
+        pwd_context.update(bcrypt__rounds=4)
+
+    idle_p95 = statistics.quantiles(idle, n=20)[-1]
+    busy_p95 = statistics.quantiles(busy, n=20)[-1]
+    print(f"\nGET /health p95: idle {idle_p95:.2f} ms, during {LOGINS} logins {busy_p95:.2f} ms")
+    # One bcrypt hash at cost 12 is ~250 ms; a blocked loop would show that here
+    assert busy_p95 < 50
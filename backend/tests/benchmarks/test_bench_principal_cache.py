@@ -0,0 +1,34 @@
+"""
+Mongo round trips and latency of authenticated requests, cold vs warm
+principal cache. Run with: python -m pytest --benchmark -s tests/benchmarks
+"""
+import time
+
+import pytest
+
+from app.services.principal_cache import principal_cache
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+REQUESTS = 500
+
+
+async def _measure(client, headers, mongo_commands, cold: bool):
+    commands = mongo_commands()
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        if cold:
+            principal_cache.clear()
+        assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+    elapsed = time.perf_counter() - started
+    return (mongo_commands() - commands) / REQUESTS, elapsed / REQUESTS * 1000
+
+
+async def test_principal_cache_round_trips(client, login, mongo_commands):
+    headers = await login()
+    cold_commands, cold_ms = await _measure(client, headers, mongo_commands, cold=True)
+    warm_commands, warm_ms = await _measure(client, headers, mongo_commands, cold=False)
+    print(f"\nGET /auth/me cold: {cold_commands:.1f} Mongo commands, {cold_ms:.2f} ms per request")
+    print(f"GET /auth/me warm: {warm_commands:.1f} Mongo commands, {warm_ms:.2f} ms per request")
+    assert cold_commands >= 1
+    assert warm_commands == 0
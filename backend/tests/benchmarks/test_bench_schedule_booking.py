@@ -0,0 +1,43 @@
+"""
+Bulk creation of thousands of shifts: wall time and Mongo commands for
+one request. Overlap checks issue one range query per
+OVERLAP_QUERY_EMPLOYEE_BATCH employees, so the command count does not
+grow with the number of shifts.
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.scheduling_engine import SCHEDULE_INSERT_CHUNK_SIZE
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+EMPLOYEES = 500
+SHIFTS_PER_EMPLOYEE = 10
+
+
+async def test_bulk_create_thousands_of_shifts(client, login, db, mongo_commands):
+    headers = await login()
+    result = await db.users.insert_many([
+        {"email": f"e{i}@example.com", "role": "employee", "is_active": True} for i in range(EMPLOYEES)
+    ])
+    start = datetime(2026, 1, 5, 9)
+    shifts = [
+        {"employee_id": str(employee_id), "location": "A", "role": "cashier",
+         "start_time": (start + timedelta(days=day)).isoformat(),
+         "end_time": (start + timedelta(days=day, hours=8)).isoformat()}
+        for employee_id in result.inserted_ids for day in range(SHIFTS_PER_EMPLOYEE)
+    ]
+
+    before = mongo_commands()
+    started = time.perf_counter()
+    response = await client.post("/api/v1/schedules/bulk", json={"shifts": shifts}, headers=headers)
+    elapsed = time.perf_counter() - started
+    commands = mongo_commands() - before
+
+    assert response.status_code == 200
+    assert response.json()["created"] == len(shifts)
+    print(f"\n{len(shifts)} shifts for {EMPLOYEES} employees: {elapsed:.2f} s, {commands} Mongo commands")
+    # Active check, one overlap query, insert chunks, coverage and version writes
+    assert commands <= 6 + len(shifts) // SCHEDULE_INSERT_CHUNK_SIZE
@@ -0,0 +1,93 @@
+"""
+Shift generation at the requested scale: four weeks for 5,000 employees
+across 50 locations. Reports the wall time of the whole run and of the
+in-memory assignment alone. The in-memory stand-in scans for every $in
+match and writes slowly, so without TEST_MONGODB_URL the run is a dry run
+and only the assignment time is asserted.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.repositories import availability as availability_repo
+from app.schemas.schedule import ScheduleGenerationRequest
+from app.services import scheduling_engine
+from app.services.scheduling_engine import generate_schedules
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+EMPLOYEES = 5000
+LOCATIONS = 50
+WEEKS = 4
+REAL_SERVER = bool(os.getenv("TEST_MONGODB_URL"))
+ROLES = ("cashier", "stock", "supervisor")
+HORIZON_START = datetime(2026, 1, 4)  # a Sunday
+
+
+async def _seed(db):
+    users = await db.users.insert_many([
+        {"email": f"e{i}@example.com", "role": "employee", "is_active": True,
+         "locations": [f"L{i % LOCATIONS}"], "job_roles": [ROLES[i % len(ROLES)]]}
+        for i in range(EMPLOYEES)
+    ])
+    availability = []
+    for i, employee_id in enumerate(users.inserted_ids):
+        for day in range(7):
+            if (i + day) % 7 < 2:
+                continue  # two days off a week
+            doc = {"employee_id": str(employee_id), "day_of_week": day, "is_available": True,
+                   "start_time": "07:00", "end_time": "23:00"}
+            doc["slot_mask"] = availability_repo.slot_mask(day, doc)
+            availability.append(doc)
+    await db.availability.insert_many(availability)
+
+
+def _demands():
+    demands = []
+    for day in range(WEEKS * 7):
+        date = HORIZON_START + timedelta(days=day)
+        for location in range(LOCATIONS):
+            for role, headcount in zip(ROLES, (8, 6, 2)):
+                for start_hour in (7, 15):
+                    demands.append({
+                        "location": f"L{location}", "role": role, "headcount": headcount,
+                        "start_time": date + timedelta(hours=start_hour),
+                        "end_time": date + timedelta(hours=start_hour + 8),
+                    })
+    return demands
+
+
+async def test_generate_four_weeks_for_5000_employees(db, monkeypatch):
+    await _seed(db)
+    request = ScheduleGenerationRequest(
+        horizon_start=HORIZON_START, horizon_end=HORIZON_START + timedelta(weeks=WEEKS),
+        demands=_demands(), max_hours_per_employee=40 * WEEKS, dry_run=not REAL_SERVER,
+    )
+
+    assign_time = 0.0
+    assign_shifts = scheduling_engine.assign_shifts
+
+    def timed_assign(*args):
+        nonlocal assign_time
+        started = time.perf_counter()
+        try:
+            return assign_shifts(*args)
+        finally:
+            assign_time += time.perf_counter() - started
+
+    monkeypatch.setattr(scheduling_engine, "assign_shifts", timed_assign)
+    started = time.perf_counter()
+    result = await generate_schedules(request)
+    elapsed = time.perf_counter() - started
+
+    requested = sum(d.headcount for d in request.demands)
+    print(f"\n{len(request.demands)} demands ({requested} shifts) for {EMPLOYEES} employees at "
+          f"{LOCATIONS} locations over {WEEKS} weeks: {result['shifts_assigned']} assigned, "
+          f"{result['shifts_created']} created in {elapsed:.2f} s, assignment {assign_time:.2f} s")
+    assert result["shifts_assigned"] > 0.9 * requested
+    assert assign_time < 5
+    if REAL_SERVER:
+        assert result["shifts_created"] == result["shifts_assigned"]
+        assert elapsed < 30
@@ -0,0 +1,62 @@
+"""
+Serializing lists of 100 and 10,000 documents: the one-pass orjson path
+against the previous path, where the handler built a model per document
+and FastAPI dumped, re-validated and encoded it as the response_model.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.repositories.base import to_response
+from app.schemas.schedule import TimeOffRequestResponse
+from app.utils.serialization import documents_response
+
+pytestmark = pytest.mark.benchmark
+
+SCHEMA = TimeOffRequestResponse
+ADAPTER = TypeAdapter(List[SCHEMA])
+
+
+def _documents(count: int) -> List[dict]:
+    start = datetime(2026, 1, 5, 9)
+    return [
+        {"_id": ObjectId(), "employee_id": str(ObjectId()), "start_date": start + timedelta(days=i),
+         "end_date": start + timedelta(days=i + 2), "reason": "Family holiday", "status": "approved",
+         "created_at": start, "updated_at": start}
+        for i in range(count)
+    ]
+
+
+def pydantic_path(docs: List[dict]) -> bytes:
+    models = [SCHEMA.model_validate(to_response(doc)) for doc in docs]
+    content = [model.model_dump(by_alias=True) for model in models]
+    return JSONResponse(ADAPTER.dump_python(ADAPTER.validate_python(content), mode="json")).body
+
+
+def one_pass_path(docs: List[dict]) -> bytes:
+    return documents_response(docs, SCHEMA).body
+
+
+def _best_of(fn, docs: List[dict], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(docs)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+@pytest.mark.parametrize("count,repeat", [(100, 200), (10_000, 5)])
+def test_one_pass_serialization_against_pydantic(count, repeat):
+    docs = _documents(count)
+    assert len(one_pass_path(docs)) <= len(pydantic_path(docs))
+    slow = _best_of(pydantic_path, docs, repeat)
+    fast = _best_of(one_pass_path, docs, repeat)
+    print(f"\n{count} documents: pydantic {slow * 1000:.2f} ms, one pass {fast * 1000:.2f} ms, "
+          f"{slow / fast:.1f}x faster")
+    assert fast < slow
@@ -0,0 +1,29 @@
+"""
+Session write volume for a client polling with one token, per-request
+update_one (before) vs the write-behind buffer (after).
+"""
+import pytest
+
+from app.services.session_activity import session_activity
+
+pytestmark = [pytest.mark.anyio, pytest.mark.benchmark]
+
+REQUESTS = 1000
+# Requests served between two flushes, e.g. 5 s of a client polling at 40 requests/s
+REQUESTS_PER_FLUSH = 200
+
+
+async def test_session_write_volume(client, login):
+    headers = await login()
+    for i in range(REQUESTS):
+        assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+        if (i + 1) % REQUESTS_PER_FLUSH == 0:
+            await session_activity.flush()
+    await session_activity.flush()
+
+    # Before, touch_session ran one update_one per authenticated request
+    before = session_activity.touches
+    after = session_activity.writes
+    print(f"\n{REQUESTS} requests: {before} session writes before, {after} after "
+          f"({before / after:.0f}x fewer)")
+    assert after == REQUESTS // REQUESTS_PER_FLUSH
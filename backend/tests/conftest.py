@@ -0,0 +1,345 @@
+"""
+Shared test fixtures.
+
+Tests drive create_app() through an httpx AsyncClient, or through
+open_stream for endless responses, which the httpx transport would buffer. They run against an
+in-memory Mongo stand-in (mongomock-motor) unless TEST_MONGODB_URL points at
+a real server, e.g. a local mongod or a three-member replica set:
+
+    TEST_MONGODB_URL=mongodb://localhost:27017 python -m pytest
+
+The stand-in emits no command events, so its collection operations are
+reported to the metrics command listener path by hand: one command per
+call, which is what the server would see for the small result sets used
+here. The roundtrips fixture records the commands of each request it
+sends, so tests can hold routes to their @roundtrip_budget. Benchmarks
+are skipped unless --benchmark is given.
+"""
+import asyncio
+import os
+import threading
+import uuid
+from functools import wraps
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import mongomock
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from app.app import create_app
+from app.services import auth as auth_service
+from app.services.availability_index import availability_index
+from app.services.notification_hub import notification_hub
+from app.services.permissions import permission_resolver
+from app.services.principal_cache import principal_cache
+from app.services.revocation import revocations
+from app.services.session_activity import (
+    SESSION_TOUCH_BATCH_SIZE, SESSION_TOUCH_FLUSH_SECONDS, session_activity
+)
+from app.services.user_directory import user_directory
+from app.utils import database
+from app.utils.metrics import command_listener, metrics, request_stats, route_template
+from app.utils.read_routing import READ_YOUR_WRITES_MAX_ENTRIES, READ_YOUR_WRITES_SECONDS, recent_writers
+from app.utils.roundtrips import route_budget
+
+TEST_MONGODB_URL = os.getenv("TEST_MONGODB_URL")
+PASSWORD = "Passw0rd!x"
+
+# Collection methods that are one server command each
+MONGOMOCK_COMMANDS = {
+    "find": "find", "find_one": "find", "insert_one": "insert", "insert_many": "insert",
+    "update_one": "update", "update_many": "update", "replace_one": "update",
+    "delete_one": "delete", "delete_many": "delete", "find_one_and_update": "findAndModify",
+    "find_one_and_replace": "findAndModify", "find_one_and_delete": "findAndModify",
+    "bulk_write": "bulkWrite", "aggregate": "aggregate", "count_documents": "aggregate",
+    "distinct": "distinct",
+}
+_mongomock_depth = threading.local()
+# Commands of the request the roundtrips fixture is recording, if any
+_command_log: Optional[list] = None
+
+
+class CommandLogListener(monitoring.CommandListener):
+    """
+    Adds real-server commands to the roundtrips fixture's log
+    """
+
+    def started(self, event):
+        if _command_log is not None:
+            target = event.command.get(event.command_name)
+            _command_log.append(f"{event.command_name} {target}" if isinstance(target, str) else event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def _recorded(command_name, method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # mongomock implements some operations on top of others, e.g. find_one on find
+        depth = getattr(_mongomock_depth, "value", 0)
+        if depth == 0:
+            stats = request_stats.get()
+            if stats is not None and stats.trace is not None:
+                stats.trace.append(f"{command_name} {self.name}")
+            metrics.command_finished(command_name, 0.0, False, stats)
+            if _command_log is not None:
+                _command_log.append(f"{command_name} {self.name}")
+        _mongomock_depth.value = depth + 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _mongomock_depth.value = depth
+    return wrapper
+
+
+for _name, _command in MONGOMOCK_COMMANDS.items():
+    setattr(mongomock.collection.Collection, _name,
+            _recorded(_command, getattr(mongomock.collection.Collection, _name)))
+
+
+def _create_indexes(self, indexes, session=None, **kwargs):
+    # mongomock's own create_indexes drops options such as partialFilterExpression
+    names = []
+    for index in indexes:
+        options = {key: value for key, value in index.document.items() if key not in ("key", "name")}
+        names.append(self.create_index(list(index.document["key"].items()), name=index.document["name"], **options))
+    return names
+
+
+mongomock.collection.Collection.create_indexes = _create_indexes
+
+# Tests create many users; the production cost factor only slows them down
+auth_service.pwd_context.update(bcrypt__rounds=4)
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", default=False,
+                     help="run the benchmarks under tests/benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark; run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+def reset_process_state():
+    """
+    Forget everything the in-process caches and indexes learned in another test
+    """
+    principal_cache.clear()
+    session_activity.__init__(SESSION_TOUCH_FLUSH_SECONDS, SESSION_TOUCH_BATCH_SIZE)
+    revocations.__init__()
+    permission_resolver.__init__()
+    availability_index.__init__()
+    user_directory.__init__()
+    # One process: inserts reach its streams directly, whatever .env deploys with
+    notification_hub.__init__("local")
+    metrics.__init__()
+    recent_writers.__init__(READ_YOUR_WRITES_MAX_ENTRIES, READ_YOUR_WRITES_SECONDS)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(anyio_backend):
+    if TEST_MONGODB_URL:
+        client = AsyncIOMotorClient(TEST_MONGODB_URL, event_listeners=[command_listener, CommandLogListener()])
+        name = f"test_{uuid.uuid4().hex[:12]}"
+    else:
+        client = AsyncMongoMockClient()
+        name = "test"
+    database.client = client
+    database.db = client[name]
+    database.read_db = database.db
+    reset_process_state()
+    yield database.db
+    if TEST_MONGODB_URL:
+        await client.drop_database(name)
+        client.close()
+    database.client = database.db = database.read_db = None
+
+
+@pytest.fixture
+def app(db):
+    return create_app()
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+
+@pytest.fixture
+def password():
+    return PASSWORD
+
+
+@pytest.fixture
+def login(client):
+    """
+    Register a user and return Authorization headers for them
+    """
+    async def login(email: str = "admin@example.com", role: str = "admin", **fields) -> dict:
+        body = {"email": email, "password": PASSWORD, "first_name": "Test", "last_name": "User",
+                "role": role, **fields}
+        response = await client.post("/api/v1/auth/register", json=body)
+        assert response.status_code == 200, response.text
+        response = await client.post("/api/v1/auth/login", data={"username": email, "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return login
+
+
+@pytest.fixture
+def mongo_commands():
+    """
+    Return how many Mongo commands this process has issued so far
+    """
+    def mongo_commands() -> int:
+        return sum(totals[0] for totals in metrics.commands.values())
+    return mongo_commands
+
+
+@pytest.fixture
+def user_id(db):
+    """
+    Look up a user's id by email
+    """
+    async def user_id(email: str) -> str:
+        return str((await db.users.find_one({"email": email}))["_id"])
+    return user_id
+
+
+class ASGIStream:
+    """
+    A streaming response read chunk by chunk straight from the ASGI app
+    """
+
+    def __init__(self, app, path: str, headers: Optional[dict] = None):
+        url = urlsplit(path)
+        self.scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "server": ("test", 80), "client": ("127.0.0.1", 1234), "root_path": "",
+            "path": url.path, "raw_path": url.path.encode(), "query_string": url.query.encode(),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        }
+        self.app = app
+        self.status: Optional[int] = None
+        self._incoming: asyncio.Queue = asyncio.Queue()
+        self._outgoing: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _receive(self):
+        return await self._incoming.get()
+
+    async def _send(self, message):
+        await self._outgoing.put(message)
+
+    async def open(self) -> int:
+        self._incoming.put_nowait({"type": "http.request", "body": b"", "more_body": False})
+        self._task = asyncio.get_running_loop().create_task(self.app(self.scope, self._receive, self._send))
+        message = await asyncio.wait_for(self._outgoing.get(), 5)
+        self.status = message["status"]
+        return self.status
+
+    async def read(self, timeout: float = 2) -> Optional[str]:
+        """
+        Next body chunk, or None once the response has ended
+        """
+        message = await asyncio.wait_for(self._outgoing.get(), timeout)
+        if not message.get("body") and not message.get("more_body", False):
+            return None
+        return message["body"].decode()
+
+    async def close(self):
+        self._incoming.put_nowait({"type": "http.disconnect"})
+        try:
+            await asyncio.wait_for(self._task, 5)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+
+
+@pytest.fixture
+async def open_stream(app):
+    """
+    Open streaming GET requests against the app; they are closed after the test
+    """
+    streams = []
+
+    async def open_stream(path: str, headers: Optional[dict] = None) -> ASGIStream:
+        stream = ASGIStream(app, path, headers)
+        streams.append(stream)
+        await stream.open()
+        return stream
+
+    yield open_stream
+    for stream in streams:
+        if not stream._task.done():
+            await stream.close()
+
+
+class RoundTripRecorder:
+    """
+    Sends requests to the app one at a time and keeps the Mongo commands of
+    the last one, along with the budget its route declares
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=self), base_url="http://test")
+        self.commands: List[str] = []
+        self.budget: Optional[int] = None
+        self.route: Optional[str] = None
+
+    async def __call__(self, scope, receive, send):
+        global _command_log
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.commands = _command_log = []
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _command_log = None
+            # Routing records the matched route in the scope
+            self.budget = route_budget(scope)
+            self.route = f"{scope['method']} {route_template(scope)}"
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        return await self.client.request(method, path, **kwargs)
+
+    def check_budget(self):
+        """
+        Fail unless the last request's route declares a budget and kept to it
+        """
+        assert self.budget is not None, f"{self.route} declares no round-trip budget"
+        assert len(self.commands) <= self.budget, (
+            f"{self.route} issued {len(self.commands)} Mongo commands, budget is {self.budget}: "
+            f"{', '.join(self.commands)}"
+        )
+
+
+@pytest.fixture
+async def roundtrips(app):
+    """
+    Send requests whose Mongo commands are recorded; see RoundTripRecorder
+    """
+    recorder = RoundTripRecorder(app)
+    yield recorder
+    await recorder.client.aclose()
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.principal_cache import principal_cache
+from app.services.revocation import revocations
+from app.utils.tokens import token_digest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_warm_hit_issues_no_mongo_commands(client, login, mongo_commands):
+    headers = await login()
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+
+    before = mongo_commands()
+    response = await client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == "admin@example.com"
+    assert mongo_commands() == before
+
+
+async def test_cold_miss_verifies_against_mongo(client, login, mongo_commands):
+    headers = await login()
+    principal_cache.clear()
+
+    before = mongo_commands()
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+    assert mongo_commands() > before
+    assert len(principal_cache) == 1
+
+
+async def test_logout_evicts_cached_principal(client, login):
+    headers = await login()
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+
+    assert (await client.post("/api/v1/auth/logout", headers=headers)).status_code == 204
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 401
+
+
+async def test_revocation_from_another_worker_rejects_warm_token(client, login):
+    headers = await login()
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+    assert len(principal_cache) == 1
+
+    # What the revocation poll adds when another worker handles the logout
+    token = headers["Authorization"].split(" ", 1)[1]
+    revocations.add(token_digest(token), datetime.utcnow() + timedelta(minutes=30))
+
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 401
+    assert len(principal_cache) == 0
+
+
+async def test_user_update_invalidates_cached_principal(client, login, user_id):
+    headers = await login()
+    me = await user_id("admin@example.com")
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+
+    response = await client.put(f"/api/v1/users/{me}", json={"first_name": "Renamed"}, headers=headers)
+    assert response.status_code == 200
+
+    assert (await client.get("/api/v1/auth/me", headers=headers)).json()["first_name"] == "Renamed"
+
+
+async def test_deactivation_rejects_cached_principal(client, login, user_id):
+    admin = await login()
+    employee = await login("employee@example.com", role="employee")
+    assert (await client.get("/api/v1/auth/me", headers=employee)).status_code == 200
+
+    employee_id = await user_id("employee@example.com")
+    assert (await client.delete(f"/api/v1/users/{employee_id}", headers=admin)).status_code == 200
+
+    assert (await client.get("/api/v1/auth/me", headers=employee)).status_code == 403
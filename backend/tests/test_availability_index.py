@@ -0,0 +1,113 @@
+from datetime import datetime
+
+import pytest
+
+from app.repositories import availability as availability_repo
+from app.services import versions
+from app.services.availability_index import AvailabilityIndex
+from app.services.migrations import migrate_availability_slot_masks
+from app.utils.slots import (
+    SLOTS_PER_DAY, availability_mask, mask_from_bytes, mask_to_bytes, range_mask, window_mask
+)
+
+pytestmark = pytest.mark.anyio
+
+TUESDAY = 2
+
+
+def _slots(mask: int) -> list:
+    return [i for i in range(7 * SLOTS_PER_DAY) if mask >> i & 1]
+
+
+def test_query_windows_round_outward_and_availability_inward():
+    day = TUESDAY * SLOTS_PER_DAY
+    # 09:10-16:50 touches 09:00..16:45 but fully covers only 09:15..16:30
+    assert _slots(window_mask(TUESDAY, "09:10", "16:50")) == list(range(day + 36, day + 68))
+    assert _slots(availability_mask(TUESDAY, "09:10", "16:50")) == list(range(day + 37, day + 67))
+    # Slot-aligned windows are the same either way
+    assert availability_mask(TUESDAY, "09:00", "17:00") == window_mask(TUESDAY, "09:00", "17:00")
+
+
+def test_availability_inside_one_slot_covers_nothing():
+    assert availability_mask(TUESDAY, "09:05", "09:10") == 0
+    assert _slots(window_mask(TUESDAY, "09:05", "09:10")) == [TUESDAY * SLOTS_PER_DAY + 36]
+
+
+def test_overnight_windows_run_into_the_next_day():
+    saturday_night = availability_mask(6, "22:10", "02:50")
+    assert saturday_night == range_mask(6 * SLOTS_PER_DAY + 89, 7 * SLOTS_PER_DAY + 11)
+    assert _slots(saturday_night)[:2] == [0, 1]
+
+
+async def _set_availability(client, headers, start: str, end: str, day: int = TUESDAY):
+    response = await client.put(f"/api/v1/schedules/availability/{day}", headers=headers,
+                                json={"day_of_week": day, "start_time": start, "end_time": end,
+                                      "is_available": True})
+    assert response.status_code == 200, response.text
+
+
+async def _search(client, headers, start: str, end: str, **params) -> int:
+    response = await client.get("/api/v1/schedules/availability/search", headers=headers,
+                                params={"day_of_week": TUESDAY, "start_time": start, "end_time": end, **params})
+    assert response.status_code == 200, response.text
+    return response.json()["count"]
+
+
+async def test_partial_slots_do_not_count_as_available(client, login):
+    manager = await login("manager@example.com", role="manager")
+    employee = await login("employee@example.com", role="employee")
+    await _set_availability(client, employee, "09:10", "16:50")
+
+    assert await _search(client, manager, "09:00", "17:00") == 0
+    assert await _search(client, manager, "09:15", "16:45") == 1
+    assert await _search(client, manager, "09:15", "16:30") == 1
+    # Searches round outward, so a ragged edge asks for the whole slot
+    assert await _search(client, manager, "09:15", "16:50") == 0
+    assert await _search(client, manager, "09:00", "12:00") == 0
+
+
+async def test_index_follows_updates(client, login):
+    manager = await login("manager@example.com", role="manager")
+    employee = await login("employee@example.com", role="employee")
+    await _set_availability(client, employee, "09:00", "17:00")
+    assert await _search(client, manager, "14:00", "18:00") == 0
+    await _set_availability(client, employee, "12:00", "20:00")
+    assert await _search(client, manager, "14:00", "18:00") == 1
+    assert await _search(client, manager, "09:00", "12:00") == 0
+
+
+async def test_location_search_only_returns_users_at_the_location(client, login):
+    manager = await login("manager@example.com", role="manager")
+    for email, locations in (("a@example.com", ["A"]), ("ab@example.com", ["A", "B"]),
+                             ("b@example.com", ["B"]), ("new@example.com", [])):
+        employee = await login(email, role="employee", locations=locations)
+        await _set_availability(client, employee, "09:00", "17:00")
+
+    assert await _search(client, manager, "09:00", "17:00") == 4
+    assert await _search(client, manager, "09:00", "17:00", location="A") == 2
+    assert await _search(client, manager, "09:00", "17:00", location="C") == 0
+
+
+async def test_migration_recomputes_outward_masks(db):
+    await db.availability.insert_one({
+        "employee_id": "e1", "day_of_week": TUESDAY, "start_time": "09:10", "end_time": "16:50",
+        "is_available": True, "slot_mask": mask_to_bytes(window_mask(TUESDAY, "09:10", "16:50")),
+        "updated_at": datetime(2024, 1, 1),
+    })
+    await db.availability.insert_one({
+        "employee_id": "e2", "day_of_week": TUESDAY, "start_time": "09:00", "end_time": "17:00",
+        "is_available": True, "slot_mask": availability_repo.slot_mask(TUESDAY, {"start_time": "09:00",
+                                                                                 "end_time": "17:00"}),
+    })
+
+    summary = await migrate_availability_slot_masks()
+    assert summary == {"scanned": 2, "migrated": 1}
+    doc = await db.availability.find_one({"employee_id": "e1"})
+    assert mask_from_bytes(bytes(doc["slot_mask"])) == availability_mask(TUESDAY, "09:10", "16:50")
+    assert doc["updated_at"] > datetime(2024, 1, 1)
+    assert await versions.current(versions.AVAILABILITY, "e1") > 0
+    assert await versions.current(versions.AVAILABILITY, "e2") == 0
+
+    index = AvailabilityIndex()
+    await index.load()
+    assert index.available(window_mask(TUESDAY, "09:00", "17:00")) == ["e2"]
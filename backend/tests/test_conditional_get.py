@@ -0,0 +1,82 @@
+import pytest
+
+from app.services import versions
+
+pytestmark = pytest.mark.anyio
+
+DASHBOARD = ["/api/v1/schedules", "/api/v1/schedules/time-off", "/api/v1/profile/availability",
+             "/api/v1/notifications", "/api/v1/profile"]
+
+
+@pytest.mark.parametrize("path", DASHBOARD)
+async def test_unchanged_lists_answer_304_without_their_query(client, login, mongo_commands, path):
+    headers = await login("employee@example.com", role="employee")
+    first = await client.get(path, headers=headers)
+    assert first.status_code == 200, first.text
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    before = mongo_commands()
+    again = await client.get(path, headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+    # The principal is cached, so the version stamp is the only read
+    assert mongo_commands() - before == 1
+
+
+async def test_writes_and_query_parameters_change_the_etag(client, login):
+    headers = await login("employee@example.com", role="employee")
+    etag = (await client.get("/api/v1/profile/availability", headers=headers)).headers["etag"]
+    limited = await client.get("/api/v1/notifications?limit=5", headers=headers)
+    assert limited.headers["etag"] != (await client.get("/api/v1/notifications", headers=headers)).headers["etag"]
+
+    response = await client.put("/api/v1/profile/availability", headers=headers, json=[
+        {"day_of_week": 1, "start_time": "09:00", "end_time": "17:00", "is_available": True}
+    ])
+    assert response.status_code == 200, response.text
+    response = await client.get("/api/v1/profile/availability", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert [day["day_of_week"] for day in response.json()] == [1]
+
+
+async def test_profile_body_matches_its_etag_when_the_principal_is_cached(client, login, user_id, db):
+    headers = await login("employee@example.com", role="employee")
+    me = await user_id("employee@example.com")
+    old = await client.get("/api/v1/profile", headers=headers)
+    assert old.json()["first_name"] == "Test"
+
+    # Another worker renames the user; this worker's principal cache still holds the old document
+    await db.users.update_one({"_id": (await db.users.find_one({"email": "employee@example.com"}))["_id"]},
+                              {"$set": {"first_name": "Renamed"}})
+    await versions.bump(versions.PROFILE, [me])
+
+    response = await client.get("/api/v1/profile", headers={**headers, "If-None-Match": old.headers["etag"]})
+    assert response.status_code == 200
+    assert response.headers["etag"] != old.headers["etag"]
+    assert response.json()["first_name"] == "Renamed"
+
+
+async def test_a_write_outdates_earlier_etags_even_if_the_last_bump_fails(db, monkeypatch):
+    bump = versions.bump
+    calls = []
+
+    async def failing_second_bump(resource, user_ids):
+        calls.append(resource)
+        if len(calls) == 2:
+            raise ConnectionError("primary stepped down")
+        await bump(resource, user_ids)
+
+    monkeypatch.setattr(versions, "bump", failing_second_bump)
+    before = await versions.current(versions.TIME_OFF, "e1")
+    with pytest.raises(ConnectionError):
+        async with versions.changes(versions.TIME_OFF, ["e1"]):
+            # Bumped before the write, so an ETag taken earlier no longer matches
+            during = await versions.current(versions.TIME_OFF, "e1")
+            assert during > before
+    assert calls == [versions.TIME_OFF, versions.TIME_OFF]
+
+
+async def test_the_version_is_bumped_again_after_the_write(db):
+    async with versions.changes(versions.PROFILE, ["e1"]):
+        during = await versions.current(versions.PROFILE, "e1")
+    assert await versions.current(versions.PROFILE, "e1") > during > 0
@@ -0,0 +1,80 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from app.services import coverage
+
+pytestmark = pytest.mark.anyio
+
+WEEK = "2026-01-05T00:00:00"
+
+
+def _at(hour: int, minute: int = 0) -> datetime:
+    return datetime(2026, 1, 5, hour, minute)
+
+
+def _shift(start: datetime, end: datetime, status: str = "pending", role: str = "cashier") -> dict:
+    return {"location": "A", "role": role, "start_time": start, "end_time": end, "status": status}
+
+
+def test_hour_buckets_cover_partial_hours():
+    assert coverage.hour_buckets(_at(9, 30), _at(11)) == [_at(9), _at(10)]
+    assert coverage.hour_buckets(_at(9, 30), _at(11, 1)) == [_at(9), _at(10), _at(11)]
+
+
+def test_deltas_of_moves_and_status_changes():
+    shift = _shift(_at(9), _at(11))
+    assert coverage.shift_deltas(None, shift) == {("A", "cashier", _at(9)): (1, 0), ("A", "cashier", _at(10)): (1, 0)}
+    # Moving by an hour only touches the buckets that differ
+    moved = {**shift, "start_time": _at(10), "end_time": _at(12)}
+    assert coverage.shift_deltas(shift, moved) == {("A", "cashier", _at(9)): (-1, 0), ("A", "cashier", _at(11)): (1, 0)}
+    approved = {**shift, "status": "approved"}
+    assert coverage.shift_deltas(shift, approved) == {("A", "cashier", _at(9)): (0, 1), ("A", "cashier", _at(10)): (0, 1)}
+    cancelled = {**approved, "status": "cancelled"}
+    assert coverage.shift_deltas(approved, cancelled) == {("A", "cashier", _at(9)): (-1, -1),
+                                                          ("A", "cashier", _at(10)): (-1, -1)}
+    assert coverage.shift_deltas(cancelled, {**cancelled, "start_time": _at(8)}) == {}
+
+
+async def _heatmap(client, headers) -> dict:
+    response = await client.get("/api/v1/schedules/coverage", headers=headers,
+                                params={"location": "A", "week_start": WEEK})
+    assert response.status_code == 200, response.text
+    return {cell["hour"][11:16]: (cell["headcount"], cell["published"]) for cell in response.json()["cells"]}
+
+
+async def test_heatmap_follows_shift_writes(client, login, user_id):
+    headers = await login()
+    me = await user_id("admin@example.com")
+    response = await client.post("/api/v1/schedules/bulk", headers=headers, json={"shifts": [
+        {"employee_id": me, "location": "A", "role": "cashier",
+         "start_time": "2026-01-05T09:30:00", "end_time": "2026-01-05T11:00:00"},
+    ]})
+    assert response.json()["created"] == 1
+    assert await _heatmap(client, headers) == {"09:00": (1, 0), "10:00": (1, 0)}
+
+    shift_id = (await client.get("/api/v1/schedules", headers=headers)).json()[0]["id"]
+    response = await client.put(f"/api/v1/schedules/{shift_id}", headers=headers,
+                                json={"start_time": "2026-01-05T10:00:00", "end_time": "2026-01-05T12:00:00",
+                                      "status": "approved"})
+    assert response.status_code == 200, response.text
+    assert await _heatmap(client, headers) == {"10:00": (1, 1), "11:00": (1, 1)}
+
+    response = await client.put(f"/api/v1/schedules/{shift_id}", headers=headers, json={"status": "cancelled"})
+    assert response.status_code == 200, response.text
+    assert await _heatmap(client, headers) == {}
+
+
+@pytest.mark.skipif(not os.getenv("TEST_MONGODB_URL"),
+                    reason="the rebuild pipeline uses $dateTrunc and $dateAdd, which the stand-in lacks")
+async def test_rebuild_matches_incremental_rollups(db):
+    shifts = [_shift(_at(9, 30), _at(11)), _shift(_at(10), _at(12), "approved"),
+              _shift(_at(10), _at(11), "cancelled"), _shift(_at(9), _at(10), role="stock")]
+    await db.schedules.insert_many([dict(shift) for shift in shifts])
+    await coverage.record_created(shifts)
+    incremental = await coverage.heatmap(_at(0), "A")
+
+    await db.coverage_rollups.delete_many({})
+    await coverage.rebuild()
+    assert await coverage.heatmap(_at(0), "A") == incremental
@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.routers.schedules import SCHEDULE_EXPORT_FIELDS
+from app.utils import export
+
+pytestmark = pytest.mark.anyio
+
+
+async def _shifts(db, employee_id: str, count: int, **fields):
+    start = datetime(2026, 1, 5, 9)
+    await db.schedules.insert_many([
+        {"employee_id": employee_id, "start_time": start + timedelta(days=i), "end_time": start + timedelta(days=i, hours=8),
+         "location": "A", "role": "cashier", "status": "approved", **fields}
+        for i in range(count)
+    ])
+
+
+async def test_ndjson_export_applies_filters(client, login, user_id, db):
+    headers = await login()
+    me = await user_id("admin@example.com")
+    await _shifts(db, me, 10)
+    await _shifts(db, me, 3, location="B")
+
+    response = await client.get("/api/v1/schedules/export", headers=headers, params={
+        "location": "A", "start_date": "2026-01-07T00:00:00", "end_date": "2026-01-10T23:59:59"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 4
+    assert {row["location"] for row in rows} == {"A"}
+    assert [row["start_time"] for row in rows] == sorted(row["start_time"] for row in rows)
+
+
+async def test_csv_export_has_header_row(client, login, user_id, db):
+    headers = await login()
+    await _shifts(db, await user_id("admin@example.com"), 3)
+
+    response = await client.get("/api/v1/schedules/export", params={"format": "csv"}, headers=headers)
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == SCHEDULE_EXPORT_FIELDS
+    assert len(rows) == 4
+    assert 'filename="schedules.csv"' in response.headers["content-disposition"]
+
+
+async def test_team_scope_needs_manage_schedules(client, login, user_id, db):
+    admin = await login()
+    employee = await login("employee@example.com", role="employee")
+    await _shifts(db, await user_id("admin@example.com"), 2)
+    await _shifts(db, await user_id("employee@example.com"), 3)
+
+    assert (await client.get("/api/v1/schedules/export", params={"scope": "team"}, headers=employee)).status_code == 403
+    own = await client.get("/api/v1/schedules/export", headers=employee)
+    assert len(own.text.splitlines()) == 3
+    team = await client.get("/api/v1/schedules/export", params={"scope": "team"}, headers=admin)
+    assert len(team.text.splitlines()) == 5
+
+
+@pytest.mark.parametrize("params", [
+    {"start_date": "last monday"},
+    {"end_date": "2026-13-01"},
+    {"start_date": "2026-01-10T00:00:00", "end_date": "2026-01-07T00:00:00"},
+])
+async def test_invalid_date_ranges_are_rejected_before_streaming(client, login, params):
+    headers = await login()
+    response = await client.get("/api/v1/schedules/export", params=params, headers=headers)
+    assert response.status_code == 400
+    assert "attachment" not in response.headers.get("content-disposition", "")
+    assert (await client.get("/api/v1/schedules", params=params, headers=headers)).status_code == 400
+
+
+async def test_export_accepts_utc_offsets(client, login, user_id, db):
+    headers = await login()
+    await _shifts(db, await user_id("admin@example.com"), 3)
+    response = await client.get("/api/v1/schedules/export", headers=headers,
+                                params={"start_date": "2026-01-06T00:00:00Z"})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 2
+
+
+async def test_rows_are_streamed_in_bounded_chunks(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 4)
+
+    async def documents():
+        for i in range(10):
+            yield {"_id": i, "name": f"row {i}"}
+
+    ndjson = [chunk async for chunk in export._ndjson_rows(documents(), ["id", "name"])]
+    assert [chunk.count(b"\n") for chunk in ndjson] == [4, 4, 2]
+    csv_chunks = [chunk async for chunk in export._csv_rows(documents(), ["id", "name"])]
+    assert [chunk.count(b"\n") for chunk in csv_chunks] == [5, 4, 2]
@@ -0,0 +1,121 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.repositories.schedules import overlap_filter
+from app.services.migrations import migrate_unique_duplicates
+from app.utils import indexes
+from app.utils.indexes import ensure_indexes, ensure_indexes_on_startup, verify_query_plans
+
+pytestmark = pytest.mark.anyio
+
+TEST_MONGODB_URL = os.getenv("TEST_MONGODB_URL")
+
+
+def _keys(info: dict) -> list:
+    return [(k, d) for k, d in info["key"]]
+
+
+async def test_ensure_indexes_is_idempotent(app, db):
+    first = await ensure_indexes(db)
+    assert "users.email_1" in first["created"]
+    assert not first["failed"]
+
+    second = await ensure_indexes(db)
+    assert second == {"created": [], "rebuilt": [], "failed": [], "missing_unique": []}
+
+
+async def test_missing_unique_index_fails_startup(app, db):
+    await db.users.insert_many([{"email": "same@example.com"}, {"email": "same@example.com"}])
+
+    summary = await ensure_indexes(db)
+    assert summary["missing_unique"] == ["users.email_1"]
+    with pytest.raises(RuntimeError, match="users.email_1"):
+        await ensure_indexes_on_startup()
+
+
+async def test_failed_rebuild_keeps_an_index_on_the_keys(app, db):
+    # A non-unique email index from before the registry, over duplicate emails
+    await db.users.create_index("email")
+    await db.users.insert_many([{"email": "same@example.com"}, {"email": "same@example.com"}])
+
+    summary = await ensure_indexes(db)
+    assert summary["missing_unique"] == ["users.email_1"]
+    info = await db.users.index_information()
+    assert "email_1" not in info
+    assert _keys(info[f"email_1{indexes.BRIDGE_SUFFIX}"]) == [("email", 1), ("_id", 1)]
+
+    # Once the duplicates are resolved the unique index replaces the bridge
+    await db.users.delete_one({"email": "same@example.com"})
+    summary = await ensure_indexes(db)
+    assert summary["created"] == ["users.email_1"]
+    info = await db.users.index_information()
+    assert info["email_1"].get("unique")
+    assert f"email_1{indexes.BRIDGE_SUFFIX}" not in info
+
+
+async def test_drifted_index_is_rebuilt(app, db):
+    await db.users.create_index("team")
+
+    summary = await ensure_indexes(db)
+    assert summary["rebuilt"] == ["users.team_1"]
+    info = await db.users.index_information()
+    assert info["team_1"].get("sparse")
+    assert f"team_1{indexes.BRIDGE_SUFFIX}" not in info
+
+
+@pytest.mark.skipif(not TEST_MONGODB_URL, reason="explain() needs a real mongod")
+async def test_registered_query_shapes_use_an_index(app, db):
+    await ensure_indexes(db)
+    assert await verify_query_plans(db) == []
+
+
+@pytest.mark.skipif(not TEST_MONGODB_URL, reason="collMod needs a real mongod")
+async def test_ttl_drift_is_changed_in_place(app, db):
+    await db.token_blacklist.create_index("expires_at", expireAfterSeconds=60)
+
+    summary = await ensure_indexes(db)
+    assert "token_blacklist.expires_at_1" in summary["rebuilt"]
+    info = await db.token_blacklist.index_information()
+    assert info["expires_at_1"]["expireAfterSeconds"] == 0
+
+
+async def test_duplicates_migration_lets_startup_build_unique_indexes(app, db):
+    old = datetime(2026, 1, 1)
+    await db.users.insert_many([
+        {"email": "same@example.com", "first_name": "First", "is_active": True},
+        {"email": "same@example.com", "first_name": "Second", "is_active": True},
+    ])
+    await db.availability.insert_many([
+        {"employee_id": "e1", "day_of_week": 1, "start_time": "09:00", "end_time": "17:00", "updated_at": old},
+        {"employee_id": "e1", "day_of_week": 1, "start_time": "10:00", "end_time": "18:00",
+         "updated_at": old + timedelta(hours=1)},
+        {"employee_id": "e1", "day_of_week": 2, "start_time": "09:00", "end_time": "17:00", "updated_at": old},
+    ])
+    with pytest.raises(RuntimeError, match="migrations unique_duplicates"):
+        await ensure_indexes_on_startup()
+
+    assert await migrate_unique_duplicates() == {"availability_removed": 1, "users_renamed": 1}
+    assert [doc["start_time"] async for doc in db.availability.find({"day_of_week": 1})] == ["10:00"]
+    first, second = await db.users.find().sort("_id", 1).to_list(None)
+    assert (first["email"], first["is_active"]) == ("same@example.com", True)
+    assert second["email"] == f"same+duplicate-{second['_id']}@example.com"
+    assert (second["is_active"], second["duplicate_of"]) == (False, str(first["_id"]))
+
+    await ensure_indexes_on_startup()
+    assert await migrate_unique_duplicates() == {"availability_removed": 0, "users_renamed": 0}
+
+
+@pytest.mark.skipif(not TEST_MONGODB_URL, reason="explain() needs a real mongod")
+async def test_overlap_queries_scan_a_bounded_range_of_start_times(app, db):
+    await ensure_indexes(db)
+    start = datetime(2026, 1, 5)
+    await db.schedules.insert_many([
+        {"employee_id": "e1", "start_time": start - timedelta(days=i), "end_time": start - timedelta(days=i, hours=-8),
+         "status": "approved"} for i in range(1, 200)
+    ])
+    query = overlap_filter(start, start + timedelta(days=1))
+    plan = await db.command("explain", {"find": "schedules", "filter": query}, verbosity="executionStats")
+    # Only the shift that started within one maximum shift length of the window is examined
+    assert plan["executionStats"]["totalKeysExamined"] <= 2
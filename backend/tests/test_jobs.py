@@ -0,0 +1,228 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.repositories import notification_fanouts as fanouts_repo
+from app.schemas.schedule import ScheduleGenerationRequest
+from app.services import coverage, jobs, notification_fanout
+from app.services.jobs import JobWorker, enqueue, retry_delay
+from app.services.notification_fanout import create_fanout, run_fanout
+from app.services.scheduling_engine import generate_schedules
+
+pytestmark = pytest.mark.anyio
+
+
+async def _due(db, job_id):
+    await db.jobs.update_one({"_id": job_id}, {"$set": {"run_at": datetime.utcnow()}})
+
+
+def test_backoff_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETRY_BASE_SECONDS", 5)
+    monkeypatch.setattr(jobs, "JOB_RETRY_MAX_SECONDS", 30)
+    assert [retry_delay(n) for n in range(1, 6)] == [5, 10, 20, 30, 30]
+
+
+async def test_failed_attempts_are_retried_then_failed(db):
+    job = await enqueue("migration", {"name": "no_such_migration"}, max_attempts=2)
+    worker = JobWorker(kinds=["migration"])
+
+    await worker.run_job(await worker.claim())
+    stored = await db.jobs.find_one({"_id": job["_id"]})
+    assert (stored["status"], stored["attempts"]) == ("queued", 1)
+    assert stored["run_at"] > datetime.utcnow() and "no_such_migration" in stored["error"]
+    assert await worker.claim() is None
+
+    await _due(db, job["_id"])
+    await worker.run_job(await worker.claim())
+    stored = await db.jobs.find_one({"_id": job["_id"]})
+    assert (stored["status"], stored["attempts"], worker.failed) == ("failed", 2, 1)
+
+
+async def test_expired_leases_are_reclaimed_and_only_the_holder_settles(db):
+    job = await enqueue("reconcile_unread_counters")
+    first, second = JobWorker(), JobWorker()
+    claimed = await first.claim()
+    assert await second.claim() is None
+
+    await db.jobs.update_one({"_id": job["_id"]}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}})
+    reclaimed = await second.claim()
+    assert (reclaimed["worker_id"], reclaimed["attempts"]) == (second.worker_id, 2)
+
+    await first.run_job(claimed)
+    assert (await db.jobs.find_one({"_id": job["_id"]}))["status"] == "running"
+    await second.run_job(reclaimed)
+    stored = await db.jobs.find_one({"_id": job["_id"]})
+    assert (stored["status"], stored["result"]) == ("succeeded", {"checked": 0, "repaired": 0})
+
+
+async def _recipients(db, count: int) -> list:
+    result = await db.users.insert_many([
+        {"email": f"e{i}@example.com", "role": "employee", "is_active": True} for i in range(count)
+    ])
+    return [str(employee_id) for employee_id in result.inserted_ids]
+
+
+async def test_interrupted_fanout_job_resumes_from_its_checkpoint(db, monkeypatch):
+    monkeypatch.setattr(notification_fanout, "FANOUT_CHUNK_SIZE", 3)
+    recipients = await _recipients(db, 8)
+    record_chunk = fanouts_repo.record_chunk
+    calls = []
+
+    async def crash_on_second_chunk(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 2:
+            # The chunk's notifications are stored, its progress is not
+            raise ConnectionError("primary stepped down")
+        await record_chunk(*args, **kwargs)
+
+    monkeypatch.setattr(fanouts_repo, "record_chunk", crash_on_second_chunk)
+    fanout = await create_fanout("Policy update", {"roles": ["employee"]}, "admin")
+    job = await enqueue("notification_fanout", {"fanout_id": str(fanout["_id"])})
+    worker = JobWorker(kinds=["notification_fanout"])
+
+    await worker.run_job(await worker.claim())
+    stored_job = await db.jobs.find_one({"_id": job["_id"]})
+    progress = await db.notification_fanouts.find_one({"_id": fanout["_id"]})
+    assert (stored_job["status"], stored_job["error"]) == ("queued", "primary stepped down")
+    assert (progress["status"], progress["delivered"], progress["last_recipient_id"]) == \
+        ("interrupted", 3, recipients[2])
+    assert await db.notifications.count_documents({}) == 6
+
+    await _due(db, job["_id"])
+    await worker.run_job(await worker.claim())
+    progress = await db.notification_fanouts.find_one({"_id": fanout["_id"]})
+    assert (progress["status"], progress["delivered"], progress["chunks_done"]) == ("completed", 8, 3)
+    assert sorted(await db.notifications.distinct("employee_id")) == sorted(recipients)
+    assert await db.notifications.count_documents({}) == 8
+    assert await db.notification_counters.count_documents({"unread": 1}) == 8
+
+
+async def test_fanout_left_running_by_a_dead_worker_is_resumed(db, monkeypatch):
+    monkeypatch.setattr(notification_fanout, "FANOUT_CHUNK_SIZE", 2)
+    recipients = await _recipients(db, 4)
+    fanout = await create_fanout("Policy update", {"roles": ["employee"]}, "admin")
+    await db.notification_fanouts.update_one({"_id": fanout["_id"]}, {"$set": {
+        "status": "running", "last_recipient_id": recipients[1], "delivered": 2, "chunks_done": 1,
+    }})
+
+    await run_fanout(fanout["_id"])
+    progress = await db.notification_fanouts.find_one({"_id": fanout["_id"]})
+    assert (progress["status"], progress["delivered"]) == ("completed", 4)
+    assert sorted(await db.notifications.distinct("employee_id")) == recipients[2:]
+
+    # Finished fan-outs are left alone
+    await run_fanout(fanout["_id"])
+    assert await db.notifications.count_documents({}) == 2
+
+
+async def _staff(db, count: int):
+    result = await db.users.insert_many([
+        {"email": f"e{i}@example.com", "role": "employee", "is_active": True, "locations": ["A"],
+         "job_roles": ["cashier", "stock"]} for i in range(count)
+    ])
+    await db.availability.insert_many([
+        {"employee_id": str(employee_id), "day_of_week": day, "start_time": "00:00", "end_time": "23:45",
+         "is_available": True} for employee_id in result.inserted_ids for day in range(7)
+    ])
+
+
+def _generation_request() -> dict:
+    return {
+        "horizon_start": "2026-01-05T00:00:00", "horizon_end": "2026-01-06T00:00:00",
+        "demands": [{"location": "A", "role": "cashier", "start_time": "2026-01-05T09:00:00",
+                     "end_time": "2026-01-05T13:00:00", "headcount": 3},
+                    {"location": "A", "role": "stock", "start_time": "2026-01-05T14:00:00",
+                     "end_time": "2026-01-05T18:00:00", "headcount": 2}],
+    }
+
+
+async def test_retried_generation_does_not_duplicate_shifts(db, monkeypatch):
+    await _staff(db, 6)
+    request = ScheduleGenerationRequest(**_generation_request())
+    record_created = coverage.record_created
+
+    async def crash_after_insert(shifts):
+        monkeypatch.setattr(coverage, "record_created", record_created)
+        raise ConnectionError("primary stepped down")
+
+    monkeypatch.setattr(coverage, "record_created", crash_after_insert)
+    with pytest.raises(ConnectionError):
+        await generate_schedules(request, generation_id="g1")
+    assert await db.schedules.count_documents({"generation_id": "g1"}) == 5
+
+    # A lost shift is made up for, the stored ones are kept
+    await db.schedules.delete_one({"role": "stock"})
+    result = await generate_schedules(request, generation_id="g1")
+    assert (result["shifts_created"], result["unfilled"]) == (5, [])
+    assert await db.schedules.count_documents({}) == 5
+    assert await db.schedules.count_documents({"role": "stock"}) == 2
+
+    result = await generate_schedules(request, generation_id="g1")
+    assert result["shifts_created"] == 5
+    assert await db.schedules.count_documents({}) == 5
+
+
+async def test_background_generation_jobs_carry_a_generation_key(client, login, db):
+    headers = await login()
+    await _staff(db, 5)
+    response = await client.post("/api/v1/schedules/generate?background=true", headers=headers,
+                                 json=_generation_request())
+    assert response.status_code == 202, response.text
+    job = await db.jobs.find_one()
+    generation_id = job["payload"]["generation_id"]
+
+    worker = JobWorker(kinds=["schedule_generation"])
+    await worker.run_job(await worker.claim())
+    # The queue redelivers the job, e.g. after the worker's lease lapsed
+    await worker.run_job({**job, "attempts": 2, "worker_id": worker.worker_id})
+    assert await db.schedules.count_documents({"generation_id": generation_id}) == 5
+    response = await client.get(f"/api/v1/jobs/{job['_id']}", headers=headers)
+    assert response.json()["status"] == "succeeded"
+
+
+@pytest.fixture
+def slow_job(monkeypatch):
+    """
+    A job kind whose handler runs until cancelled, extending its lease every 10ms
+    """
+    cancelled = []
+
+    async def handler(payload):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(payload["n"])
+            raise
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "slow", handler)
+    monkeypatch.setattr(jobs, "JOB_VISIBILITY_TIMEOUT_SECONDS", 0.03)
+    return cancelled
+
+
+async def test_a_job_taken_over_by_another_worker_is_cancelled(db, slow_job, capsys):
+    job = await enqueue("slow", {"n": 1})
+    worker = JobWorker(kinds=["slow"])
+    claimed = await worker.claim()
+    await db.jobs.update_one({"_id": job["_id"]}, {"$set": {"worker_id": "other"}})
+
+    await asyncio.wait_for(worker.run_job(claimed), 1)
+    assert (slow_job, worker.lost, worker.completed) == ([1], 1, 0)
+    assert (await db.jobs.find_one({"_id": job["_id"]}))["worker_id"] == "other"
+    assert "lease was taken over" in capsys.readouterr().out
+
+
+async def test_failed_heartbeats_are_logged_and_cancel_the_job_before_the_lease_ends(db, slow_job, monkeypatch,
+                                                                                    capsys):
+    await enqueue("slow", {"n": 2})
+    worker = JobWorker(kinds=["slow"])
+    claimed = await worker.claim()
+
+    async def unreachable(*args, **kwargs):
+        raise ConnectionError("no primary")
+
+    monkeypatch.setattr(type(db.jobs), "update_one", unreachable)
+    await asyncio.wait_for(worker.run_job(claimed), 1)
+    assert (slow_job, worker.lost) == ([2], 1)
+    out = capsys.readouterr().out
+    assert "lease extension failed: no primary" in out and "lease is expiring" in out
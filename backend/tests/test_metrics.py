@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.metrics import (
+    UNMATCHED_ROUTE, CommandMetricsListener, Histogram, MetricsRegistry, RequestStats, _labels,
+    metrics, request_stats
+)
+
+pytestmark = pytest.mark.anyio
+
+USER_ROUTE = "/api/v1/users/{user_id}"
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    prefix = f"{name}{_labels(**labels)} " if labels else f"{name} "
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    raise AssertionError(f"no sample {prefix.strip()}")
+
+
+def test_histogram_counts_each_value_in_its_bucket():
+    histogram = Histogram((0.1, 0.5, 1.0))
+    for value in (0.05, 0.1, 0.3, 2.0, 3.0):
+        histogram.observe(value)
+    # A value equal to a bound belongs to that bucket (le means "less than or equal")
+    assert histogram.counts == [2, 1, 0, 2]
+    assert histogram.sum == pytest.approx(5.45)
+
+
+def test_rendered_buckets_are_cumulative():
+    registry = MetricsRegistry((0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        registry.request_started()
+        registry.request_finished("GET", "/a", 200, seconds, RequestStats())
+    text = registry.render()
+    bucket = "http_request_duration_seconds_bucket"
+    assert _sample(text, bucket, method="GET", route="/a", le=0.1) == 1
+    assert _sample(text, bucket, method="GET", route="/a", le=1.0) == 2
+    assert _sample(text, bucket, method="GET", route="/a", le="+Inf") == 3
+    assert _sample(text, "http_request_duration_seconds_count", method="GET", route="/a") == 3
+    assert _sample(text, "http_requests_in_flight") == 0
+
+
+def test_label_values_are_escaped():
+    assert _labels(route='a"b\\c\nd') == '{route="a\\"b\\\\c\\nd"}'
+
+
+def test_listener_charges_commands_to_the_current_request():
+    listener = CommandMetricsListener()
+    before = list(metrics.commands.get("find", [0, 0.0, 0]))
+    stats = RequestStats()
+    stats.trace = []
+    token = request_stats.set(stats)
+    try:
+        listener.started(SimpleNamespace(command_name="find", command={"find": "users"}))
+        listener.succeeded(SimpleNamespace(command_name="find", duration_micros=1500))
+        listener.failed(SimpleNamespace(command_name="find", duration_micros=500))
+    finally:
+        request_stats.reset(token)
+    # Commands outside a request still count towards the process totals
+    listener.succeeded(SimpleNamespace(command_name="find", duration_micros=1000))
+
+    assert stats.trace == ["find users"]
+    assert stats.commands == 2
+    assert stats.seconds == pytest.approx(0.002)
+    count, seconds, failures = metrics.commands["find"]
+    assert (count - before[0], failures - before[2]) == (3, 1)
+    assert seconds - before[1] == pytest.approx(0.003)
+
+
+async def test_requests_are_labelled_by_route_template(client, login, user_id):
+    headers = await login()
+    me = await user_id("admin@example.com")
+    for _ in range(2):
+        response = await client.get(f"/api/v1/users/{me}", headers=headers)
+        assert response.status_code == 200
+    response = await client.get("/api/v1/users/000000000000000000000000", headers=headers)
+    assert response.status_code == 404
+    response = await client.get("/no/such/path")
+    assert response.status_code == 404
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    # The user id never becomes a label value, so the series count stays bounded
+    assert me not in text
+    assert _sample(text, "http_responses_total", method="GET", route=USER_ROUTE, status=200) == 2
+    assert _sample(text, "http_responses_total", method="GET", route=USER_ROUTE, status=404) == 1
+    assert _sample(text, "http_responses_total", method="GET", route=UNMATCHED_ROUTE, status=404) == 1
+    assert _sample(text, "http_request_duration_seconds_count", method="GET", route=USER_ROUTE) == 3
+    # The scrape itself is only counted once it has been rendered
+    assert _sample(text, "http_requests_in_flight") == 1
+
+
+async def test_mongo_commands_are_attributed_to_the_route(client, login, user_id, mongo_commands):
+    headers = await login()
+    me = await user_id("admin@example.com")
+    before = mongo_commands()
+    response = await client.get(f"/api/v1/users/{me}", headers=headers)
+    assert response.status_code == 200
+    issued = mongo_commands() - before
+    assert issued > 0
+
+    text = (await client.get("/metrics")).text
+    assert _sample(text, "http_request_mongo_commands_total", method="GET", route=USER_ROUTE) == issued
+    assert _sample(text, "mongo_commands_total", command="find") >= issued
+
+    # The scrape is served from memory
+    text = (await client.get("/metrics")).text
+    assert _sample(text, "http_request_mongo_commands_total", method="GET", route="/metrics") == 0
+
+
+async def test_streaming_responses_pass_through(login, open_stream):
+    headers = await login("employee@example.com", role="employee")
+    stream = await open_stream("/api/v1/notifications/stream", headers)
+    assert stream.status == 200
+    assert metrics.in_flight == 1
+    await stream.close()
+
+    assert metrics.in_flight == 0
+    assert metrics.responses[("GET", "/api/v1/notifications/stream", 200)] == 1
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+from app.services.notifications import deliver, reconcile_unread_counters
+from app.utils.indexes import ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+async def _notify(*employee_ids: str) -> list:
+    inserted, failed = await deliver([{"employee_id": employee_id, "message": "hello",
+                                       "created_at": datetime.utcnow()} for employee_id in employee_ids])
+    assert failed == []
+    return inserted
+
+
+async def _unread(client, headers) -> int:
+    response = await client.get("/api/v1/notifications/unread-count", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["unread"]
+
+
+async def test_counter_follows_read_state(client, login, user_id):
+    headers = await login("employee@example.com", role="employee")
+    me = await user_id("employee@example.com")
+    assert await _unread(client, headers) == 0
+
+    first, *_ = await _notify(me, me, me, "someone-else")
+    assert await _unread(client, headers) == 3
+
+    for _ in range(2):
+        response = await client.post(f"/api/v1/notifications/{first['_id']}/read", headers=headers)
+        assert response.status_code == 200 and response.json()["is_read"] is True
+    assert await _unread(client, headers) == 2
+
+    response = await client.put(f"/api/v1/notifications/{first['_id']}", headers=headers, json={"is_read": False})
+    assert response.status_code == 200
+    assert await _unread(client, headers) == 3
+
+    response = await client.post("/api/v1/notifications/read-all", headers=headers)
+    assert response.json() == {"updated": 3}
+    assert await _unread(client, headers) == 0
+    response = await client.post("/api/v1/notifications/read-all", headers=headers)
+    assert response.json() == {"updated": 0}
+
+
+async def test_other_users_notifications_are_not_found(client, login):
+    headers = await login("employee@example.com", role="employee")
+    theirs, = await _notify("someone-else")
+    response = await client.post(f"/api/v1/notifications/{theirs['_id']}/read", headers=headers)
+    assert response.status_code == 404
+    response = await client.post("/api/v1/notifications/not-an-id/read", headers=headers)
+    assert response.status_code == 400
+
+
+async def test_reconciliation_repairs_drifted_counters(db, login, user_id):
+    await login("a@example.com", role="employee")
+    await login("b@example.com", role="employee")
+    await login("c@example.com", role="employee")
+    a, b, c = [await user_id(f"{name}@example.com") for name in "abc"]
+    await _notify(a, a, b)
+    await db.notification_counters.update_one({"_id": a}, {"$set": {"unread": 7}})
+    await db.notification_counters.delete_one({"_id": b})
+
+    assert await reconcile_unread_counters(batch_size=2) == {"checked": 3, "repaired": 2}
+    counters = {doc["_id"]: doc["unread"] async for doc in db.notification_counters.find()}
+    assert counters == {a: 2, b: 1}
+    assert await reconcile_unread_counters() == {"checked": 3, "repaired": 0}
+
+
+@pytest.mark.parametrize("fresh_ids", [False, True])
+async def test_retried_fanout_batches_are_counted_once(db, app, fresh_ids):
+    await ensure_indexes(db)
+    docs = [{"employee_id": employee_id, "message": "hello", "created_at": datetime.utcnow(), "fanout_id": "f1"}
+            for employee_id in ("e1", "e2")]
+    inserted, failed = await deliver(docs)
+    assert (len(inserted), failed) == (2, [])
+
+    # A retry sends the same documents; a resumed job builds them again with new _ids
+    retry = [{k: v for k, v in doc.items() if k != "_id"} if fresh_ids else doc for doc in docs]
+    stored, failed = await deliver(retry)
+    assert (len(stored), failed) == (2, [])
+    assert await db.notifications.count_documents({"fanout_id": "f1"}) == 2
+    assert {doc["_id"]: doc["unread"] async for doc in db.notification_counters.find()} == {"e1": 1, "e2": 1}
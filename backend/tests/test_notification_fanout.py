@@ -0,0 +1,127 @@
+import pytest
+
+from app.services import notification_fanout
+from app.services.jobs import JobWorker
+from app.services.notification_fanout import create_fanout, run_fanout
+
+pytestmark = pytest.mark.anyio
+
+
+async def _employees(db, count: int, **fields) -> list:
+    result = await db.users.insert_many([
+        {"email": f"{fields.get('role', 'employee')}{i}@example.com", "role": "employee", "is_active": True,
+         **fields} for i in range(count)
+    ])
+    return [str(employee_id) for employee_id in result.inserted_ids]
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(notification_fanout, "FANOUT_CHUNK_SIZE", 4)
+    monkeypatch.setattr(notification_fanout, "FANOUT_RETRY_BACKOFF_SECONDS", 0)
+
+
+async def _create_users(client, headers, prefix: str, count: int, password: str, **fields) -> list:
+    ids = []
+    for i in range(count):
+        response = await client.post("/api/v1/users/", headers=headers, json={
+            "email": f"{prefix}{i}@example.com", "password": password, "first_name": "Fan",
+            "last_name": "Out", "role": "employee", **fields
+        })
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def _run_fanout_job():
+    worker = JobWorker(kinds=["notification_fanout"])
+    await worker.run_job(await worker.claim())
+    assert worker.completed == 1
+
+
+async def test_fanout_returns_at_once_and_a_job_delivers_it(client, login, db, password, fast_retries):
+    headers = await login()
+    in_a = await _create_users(client, headers, "a", 5, password, locations=["A"])
+    await _create_users(client, headers, "b", 3, password, locations=["B"])
+    response = await client.post("/api/v1/notifications/fanout", headers=headers,
+                                 json={"message": "Week 2 is published", "locations": ["A"]})
+    assert response.status_code == 202, response.text
+    fanout = response.json()
+    # The admin has no locations, so it is not in location A
+    assert (fanout["status"], fanout["total"], fanout["delivered"]) == ("queued", 5, 0)
+    assert await db.notifications.count_documents({}) == 0
+
+    await _run_fanout_job()
+
+    response = await client.get(f"/api/v1/notifications/fanout/{fanout['id']}", headers=headers)
+    progress = response.json()
+    assert (progress["status"], progress["delivered"], progress["failed"]) == ("completed", 5, 0)
+    recipients = await db.notifications.distinct("employee_id", {"fanout_id": fanout["id"]})
+    assert sorted(recipients) == sorted(in_a)
+    assert await db.notification_counters.count_documents({"unread": 1}) == 5
+
+
+async def test_fanout_to_a_team_set_through_the_api(client, login, db, password, fast_retries):
+    headers = await login()
+    [moved, *others] = await _create_users(client, headers, "t", 3, password)
+    response = await client.put(f"/api/v1/users/{moved}", headers=headers, json={"team": "night"})
+    assert response.status_code == 200, response.text
+    assert response.json()["team"] == "night"
+
+    response = await client.post("/api/v1/notifications/fanout", headers=headers,
+                                 json={"message": "Night shift briefing", "teams": ["night"]})
+    assert response.json()["total"] == 1
+    await _run_fanout_job()
+    assert await db.notifications.distinct("employee_id", {"fanout_id": response.json()["id"]}) == [moved]
+
+
+async def test_employees_cannot_change_their_own_assignments(client, login, user_id):
+    headers = await login("employee@example.com", role="employee")
+    me = await user_id("employee@example.com")
+    for body in ({"locations": ["A"]}, {"team": "night"}, {"job_roles": ["cashier"]}):
+        assert (await client.put("/api/v1/profile", headers=headers, json=body)).status_code == 403
+        assert (await client.put(f"/api/v1/users/{me}", headers=headers, json=body)).status_code == 403
+    response = await client.put("/api/v1/profile", headers=headers, json={"first_name": "Still"})
+    assert response.status_code == 200
+    assert (response.json()["locations"], response.json()["team"]) == ([], None)
+
+
+async def test_failed_chunks_are_retried(db, fast_retries, monkeypatch):
+    await _employees(db, 10)
+    calls = []
+    deliver = notification_fanout.deliver
+
+    async def flaky_deliver(docs):
+        calls.append(len(docs))
+        if len(calls) == 2:
+            raise ConnectionError("connection reset")
+        return await deliver(docs)
+
+    monkeypatch.setattr(notification_fanout, "deliver", flaky_deliver)
+    fanout = await create_fanout("Policy update", {"roles": ["employee"]}, "admin")
+    await run_fanout(fanout["_id"])
+
+    progress = await db.notification_fanouts.find_one({"_id": fanout["_id"]})
+    assert calls == [4, 4, 4, 2]
+    assert (progress["status"], progress["delivered"], progress["retries"], progress["chunks_done"]) == \
+        ("completed", 10, 1, 3)
+    assert await db.notifications.count_documents({}) == 10
+
+
+async def test_chunks_failing_every_attempt_are_reported(db, fast_retries, monkeypatch):
+    last = (await _employees(db, 6))[-1]
+    deliver = notification_fanout.deliver
+
+    async def broken_deliver(docs):
+        if any(doc["employee_id"] == last for doc in docs):
+            raise ConnectionError("connection reset")
+        return await deliver(docs)
+
+    monkeypatch.setattr(notification_fanout, "deliver", broken_deliver)
+    fanout = await create_fanout("Policy update", {"roles": ["employee"]}, "admin")
+    await run_fanout(fanout["_id"])
+
+    progress = await db.notification_fanouts.find_one({"_id": fanout["_id"]})
+    assert (progress["status"], progress["delivered"], progress["failed"]) == ("completed_with_errors", 4, 2)
+    assert progress["retries"] == notification_fanout.FANOUT_MAX_ATTEMPTS - 1
+    assert progress["errors"] == ["connection reset"]
@@ -0,0 +1,137 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.routers import notifications as notifications_router
+from app.services import notification_hub as hub_module
+from app.services.auth import blacklist_token
+from app.services.notification_hub import OVERFLOW, NotificationHub, notification_hub
+from app.services.notifications import deliver
+
+pytestmark = pytest.mark.anyio
+
+STREAM = "/api/v1/notifications/stream"
+
+
+async def _notify(employee_id: str, message: str) -> dict:
+    inserted, _ = await deliver([{"employee_id": employee_id, "message": message,
+                                  "created_at": datetime.utcnow()}])
+    return inserted[0]
+
+
+async def _next_event(stream) -> dict:
+    while True:
+        chunk = await stream.read()
+        assert chunk is not None, "stream ended"
+        if chunk.startswith("id: "):
+            lines = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+            return {"id": lines["id"], **json.loads(lines["data"])}
+
+
+async def test_stream_requires_a_token(client):
+    response = await client.get(STREAM)
+    assert response.status_code == 401
+
+
+async def test_stream_pushes_new_notifications(login, user_id, open_stream, mongo_commands):
+    headers = await login("employee@example.com", role="employee")
+    me = await user_id("employee@example.com")
+    stream = await open_stream(STREAM, headers)
+    assert stream.status == 200
+    assert (await stream.read()).startswith("retry: ")
+    assert notification_hub.connections() == 1
+
+    # An idle connection costs no Mongo commands
+    before = mongo_commands()
+    await asyncio.sleep(0.05)
+    assert mongo_commands() == before
+
+    await _notify("someone-else", "not for me")
+    sent = await _notify(me, "Shift published")
+    event = await _next_event(stream)
+    assert (event["id"], event["message"]) == (str(sent["_id"]), "Shift published")
+
+    await stream.close()
+    assert notification_hub.connections() == 0
+
+
+async def test_query_token_and_last_event_id_replay(login, user_id, open_stream):
+    headers = await login("employee@example.com", role="employee")
+    me = await user_id("employee@example.com")
+    token = headers["Authorization"].split()[1]
+    seen = await _notify(me, "first")
+    missed = [await _notify(me, "second"), await _notify(me, "third")]
+
+    stream = await open_stream(f"{STREAM}?access_token={token}", {"Last-Event-ID": str(seen["_id"])})
+    assert stream.status == 200
+    replayed = [await _next_event(stream), await _next_event(stream)]
+    assert [e["id"] for e in replayed] == [str(doc["_id"]) for doc in missed]
+
+
+async def test_heartbeat_closes_revoked_streams(login, open_stream, monkeypatch):
+    monkeypatch.setattr(notifications_router, "NOTIFICATION_STREAM_HEARTBEAT_SECONDS", 0.05)
+    headers = await login("employee@example.com", role="employee")
+    stream = await open_stream(STREAM, headers)
+    await stream.read()
+    assert await stream.read() == ": keep-alive\n\n"
+
+    await blacklist_token(headers["Authorization"].split()[1], datetime.utcnow() + timedelta(minutes=5))
+    chunks = []
+    while (chunk := await stream.read()) is not None:
+        chunks.append(chunk)
+    assert all(chunk == ": keep-alive\n\n" for chunk in chunks)
+
+
+def test_slow_subscribers_are_dropped(monkeypatch):
+    monkeypatch.setattr(hub_module, "NOTIFICATION_STREAM_QUEUE_SIZE", 2)
+    hub = NotificationHub()
+    queue = hub.subscribe("e1")
+    for i in range(3):
+        hub.dispatch({"_id": i, "employee_id": "e1"})
+    assert hub.connections() == 0 and hub.dropped == 1
+    assert [queue.get_nowait()["_id"], queue.get_nowait()] == [1, OVERFLOW]
+
+
+async def test_poll_backend_delivers_each_notification_once(db):
+    hub = NotificationHub("poll")
+    hub._last_seen = datetime.utcnow() - timedelta(seconds=1)
+    queue = hub.subscribe("e1")
+    # Another worker's insert, seen only through the collection
+    await db.notifications.insert_one({"employee_id": "e1", "message": "hi", "created_at": datetime.utcnow()})
+    hub.publish([{"_id": "ignored", "employee_id": "e1"}])
+
+    await hub.poll()
+    await hub.poll()
+    assert queue.qsize() == 1
+    assert queue.get_nowait()["message"] == "hi"
+
+
+async def test_poll_reads_only_new_notifications_of_connected_users(db, monkeypatch):
+    hub = NotificationHub("poll")
+    hub._last_seen = datetime.utcnow() - timedelta(seconds=1)
+    read = []
+    ingest = hub._ingest
+    monkeypatch.setattr(hub, "_ingest", lambda doc: (read.append(doc["message"]), ingest(doc)))
+
+    # Nobody is connected, so there is nothing to read
+    await db.notifications.insert_one({"employee_id": "e1", "message": "early", "created_at": datetime.utcnow()})
+    await hub.poll()
+    assert read == []
+
+    hub.subscribe("e1")
+    await db.notifications.insert_many([
+        {"employee_id": "e1", "message": "mine", "created_at": datetime.utcnow()},
+        {"employee_id": "e2", "message": "theirs", "created_at": datetime.utcnow()},
+    ])
+    await hub.poll()
+    # Within the overlap window, so the earlier one is picked up as well
+    assert sorted(read) == ["early", "mine"]
+    await hub.poll()
+    assert sorted(read) == ["early", "mine"]
+
+
+def test_unknown_fanout_backend_is_rejected():
+    with pytest.raises(ValueError):
+        NotificationHub("redis")
@@ -0,0 +1,92 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.utils.pagination import encode_cursor, fetch_page, keyset_filter, sort_spec
+
+pytestmark = pytest.mark.anyio
+
+
+def _cursor(value) -> str:
+    raw = json.dumps([{"v": value}, str(ObjectId())]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+async def _shifts(db, employee_id: str, count: int):
+    start = datetime(2026, 1, 5, 9)
+    # Pairs share a start time so the _id tiebreak is exercised
+    await db.schedules.insert_many([
+        {"employee_id": employee_id, "start_time": start + timedelta(hours=i // 2),
+         "end_time": start + timedelta(hours=i // 2 + 1), "location": "A", "role": "cashier",
+         "status": "approved", "created_at": datetime.utcnow()}
+        for i in range(count)
+    ])
+
+
+async def test_cursor_pages_cover_every_schedule_once(client, login, user_id, db):
+    headers = await login()
+    await _shifts(db, await user_id("admin@example.com"), 25)
+
+    seen, cursor = [], ""
+    while cursor is not None:
+        response = await client.get("/api/v1/schedules", params={"cursor": cursor, "limit": 10}, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+    assert len(seen) == len(set(seen)) == 25
+
+    starts = [doc["start_time"] for doc in await db.schedules.find().sort([("start_time", 1), ("_id", 1)]).to_list(None)]
+    assert starts == sorted(starts)
+
+
+async def test_callers_without_cursor_keep_a_bare_list(client, login, user_id, db):
+    headers = await login()
+    await _shifts(db, await user_id("admin@example.com"), 5)
+
+    response = await client.get("/api/v1/schedules", params={"limit": 2}, headers=headers)
+    assert isinstance(response.json(), list) and len(response.json()) == 2
+    assert response.headers["X-Next-Cursor"]
+
+
+@pytest.mark.parametrize("value", [{"$ne": None}, {"$gt": ""}, ["a"], True, "2026-01-05T09:00:00"])
+async def test_crafted_cursor_is_rejected(client, login, value):
+    headers = await login()
+    response = await client.get("/api/v1/schedules", params={"cursor": _cursor(value)}, headers=headers)
+    assert response.status_code == 400
+
+
+async def test_malformed_cursor_is_rejected(client, login):
+    headers = await login()
+    response = await client.get("/api/v1/notifications", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_keyset_filter_accepts_values_of_the_sort_type():
+    doc = {"_id": ObjectId(), "start_time": datetime(2026, 1, 5, 9), "sort_name": "doe jane"}
+    assert keyset_filter("start_time", 1, encode_cursor(doc, "start_time"), datetime)["$or"][0] == \
+        {"start_time": {"$gt": datetime(2026, 1, 5, 9)}}
+    assert keyset_filter("sort_name", 1, encode_cursor(doc, "sort_name"), str)["$or"][1]["sort_name"] == "doe jane"
+    with pytest.raises(HTTPException):
+        keyset_filter("sort_name", 1, encode_cursor(doc, "start_time"), str)
+
+
+@pytest.mark.parametrize("direction", [1, -1])
+async def test_pages_cross_the_null_boundary(db, direction):
+    # Missing and null sort values page together, before (ascending) or after (descending) the rest
+    await db.users.insert_many([{"i": i} for i in range(3)] + [{"i": i, "sort_name": None} for i in range(3, 5)]
+                               + [{"i": i, "sort_name": name} for i, name in enumerate("bca", 5)])
+    expected = [doc["i"] for doc in await db.users.find().sort(sort_spec("sort_name", direction)).to_list(None)]
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = await fetch_page(db.users, {}, "sort_name", direction, 2, cursor, value_type=str)
+        seen += [doc["i"] for doc in page]
+        if cursor is None:
+            break
+    assert seen == expected
+    assert sorted(seen) == list(range(8))
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.auth import password_pool, verify_password_async, get_password_hash_async
+from app.utils.worker_pool import BoundedWorkerPool, PoolSaturated
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_hash_and_verify_run_in_pool():
+    hashed = await get_password_hash_async("s3cret")
+    assert await verify_password_async("s3cret", hashed)
+    assert not await verify_password_async("wrong", hashed)
+
+
+async def test_pool_rejects_work_beyond_capacity():
+    pool = BoundedWorkerPool("thread", workers=1, queue_size=1)
+    release = threading.Event()
+    try:
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PoolSaturated):
+            await pool.run(release.wait)
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        assert pool.inflight == 0
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+async def test_saturated_pool_answers_503_with_retry_after(client, login, monkeypatch):
+    await login()
+    monkeypatch.setattr(password_pool, "workers", 1)
+    monkeypatch.setattr(password_pool, "queue_size", 0)
+    release = threading.Event()
+    blocker = asyncio.ensure_future(password_pool.run(release.wait))
+    await asyncio.sleep(0)
+    try:
+        response = await client.post("/api/v1/auth/login",
+                                     data={"username": "admin@example.com", "password": "x"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+    finally:
+        release.set()
+        await blocker
@@ -0,0 +1,58 @@
+import pytest
+
+from app.repositories import roles as roles_repo
+from app.services.permissions import (
+    MANAGE_ROLES, MANAGE_SCHEDULES, MANAGE_USERS, VIEW_SCHEDULE, PermissionResolver, permission_resolver
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def test_defaults_and_admin_wildcard():
+    resolver = PermissionResolver()
+    assert resolver.allows("manager", MANAGE_SCHEDULES) and not resolver.allows("employee", MANAGE_SCHEDULES)
+    assert resolver.allows("admin", "anything") and not resolver.allows(None, VIEW_SCHEDULE)
+
+    # Stored roles override defaults, but admins cannot be locked out
+    resolver.set_roles([{"name": "manager", "permissions": [VIEW_SCHEDULE]},
+                        {"name": "admin", "permissions": []}])
+    assert not resolver.allows("manager", MANAGE_SCHEDULES)
+    assert resolver.allows("admin", MANAGE_ROLES)
+
+
+async def test_permission_checks_issue_no_mongo_commands(client, login, mongo_commands):
+    headers = await login("manager@example.com", role="manager")
+    await client.get("/api/v1/schedules/coverage?location=A&week_start=2026-01-05T00:00:00", headers=headers)
+
+    before = mongo_commands()
+    response = await client.get("/api/v1/users/", headers=headers)
+    assert response.status_code == 403
+    assert mongo_commands() == before
+
+
+async def test_role_writes_take_effect_without_a_restart(client, login):
+    admin = await login()
+    employee = await login("employee@example.com", role="employee")
+    assert (await client.get("/api/v1/users/", headers=employee)).status_code == 403
+
+    # A stored role document overrides the built-in defaults
+    response = await client.post("/api/v1/roles/", headers=admin,
+                                 json={"name": "employee", "permissions": [VIEW_SCHEDULE, MANAGE_USERS]})
+    assert response.status_code == 200, response.text
+    role_id = response.json()["id"]
+    assert (await client.get("/api/v1/users/", headers=employee)).status_code == 200
+
+    response = await client.put(f"/api/v1/roles/{role_id}", headers=admin, json={"permissions": [VIEW_SCHEDULE]})
+    assert response.status_code == 200
+    assert (await client.get("/api/v1/users/", headers=employee)).status_code == 403
+
+
+async def test_other_workers_pick_up_role_changes_on_refresh(db):
+    other_worker = PermissionResolver()
+    await other_worker.load()
+    assert not other_worker.allows("scheduler", MANAGE_USERS)
+
+    await permission_resolver.load()
+    await roles_repo.insert({"name": "scheduler", "permissions": [MANAGE_USERS]})
+    await other_worker.refresh()
+    assert other_worker.allows("scheduler", MANAGE_USERS)
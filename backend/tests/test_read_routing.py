@@ -0,0 +1,135 @@
+import pytest
+
+from app.utils import database
+from app.utils import read_routing
+from app.utils.read_routing import READ_PRIMARY_COOKIE, RecentWriters, recent_writers
+
+pytestmark = pytest.mark.anyio
+
+NOTIFICATIONS = "/api/v1/notifications"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeSession:
+    def __init__(self, sessions: dict):
+        self.sessions = sessions
+
+    async def __aenter__(self):
+        self.sessions["open"] += 1
+        self.sessions["started"] += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.sessions["open"] -= 1
+
+
+class FakeClient:
+    def __init__(self):
+        self.sessions = {"started": 0, "open": 0}
+
+    async def start_session(self, causal_consistency: bool):
+        assert causal_consistency
+        return FakeSession(self.sessions)
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    """
+    Route notification reads to the secondary handle and record each routing
+    decision. The stand-in has no sessions, so the routed session is dropped.
+    """
+    routes = []
+    client = FakeClient()
+
+    def route_reads(db, session=None):
+        routes.append(session)
+        return database.route_reads(db)
+
+    monkeypatch.setattr(read_routing, "SECONDARY_READ_ROUTERS", {"notifications"})
+    monkeypatch.setattr(read_routing, "route_reads", route_reads)
+    monkeypatch.setattr(read_routing, "get_client", lambda: client)
+    return routes, client.sessions
+
+
+def test_recent_writers_expire(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(read_routing.time, "monotonic", clock)
+    writers = RecentWriters(max_entries=10, ttl_seconds=5)
+    writers.pin("a")
+    assert writers.pinned("a") and not writers.pinned("b")
+
+    clock.now += 3
+    writers.pin("b")
+    clock.now += 3
+    assert not writers.pinned("a") and writers.pinned("b")
+    # Expired pins are dropped as new ones come in
+    writers.pin("c")
+    assert len(writers) == 2
+
+
+def test_recent_writers_are_bounded(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(read_routing.time, "monotonic", clock)
+    writers = RecentWriters(max_entries=3, ttl_seconds=60)
+    for token in ("a", "b", "c"):
+        writers.pin(token)
+        clock.now += 1
+    # Pinning again refreshes a token, so the oldest pin is now b
+    writers.pin("a")
+    writers.pin("d")
+    assert len(writers) == 3
+    assert not writers.pinned("b")
+    assert all(writers.pinned(token) for token in ("a", "c", "d"))
+
+
+async def test_reads_go_to_the_secondary_in_one_session(client, login, routed):
+    routes, sessions = routed
+    headers = await login("employee@example.com", role="employee")
+    response = await client.get(NOTIFICATIONS, headers=headers)
+    assert response.status_code == 200
+    assert len(routes) == 1 and isinstance(routes[0], FakeSession)
+    assert sessions == {"started": 1, "open": 0}
+
+
+async def test_writers_read_from_the_primary(client, login, routed):
+    routes, _ = routed
+    headers = await login("employee@example.com", role="employee")
+    response = await client.post(f"{NOTIFICATIONS}/read-all", headers=headers)
+    assert response.status_code == 200
+    assert READ_PRIMARY_COOKIE in response.cookies
+    assert len(recent_writers) == 1
+
+    # Pinned by this worker's memory even without the cookie
+    client.cookies.clear()
+    response = await client.get(NOTIFICATIONS, headers=headers)
+    assert response.status_code == 200
+    assert routes == []
+
+
+async def test_the_cookie_pins_reads_on_other_workers(client, login, routed):
+    routes, _ = routed
+    headers = await login("employee@example.com", role="employee")
+    response = await client.post(f"{NOTIFICATIONS}/read-all", headers=headers)
+    assert response.status_code == 200
+    # Another worker never saw the write, only the cookie
+    recent_writers.__init__(recent_writers.max_entries, recent_writers.ttl_seconds)
+    response = await client.get(NOTIFICATIONS, headers=headers)
+    assert response.status_code == 200
+    assert routes == []
+
+
+async def test_streams_hold_no_session(login, open_stream, routed):
+    routes, sessions = routed
+    headers = await login("employee@example.com", role="employee")
+    stream = await open_stream(f"{NOTIFICATIONS}/stream", headers)
+    assert stream.status == 200
+    assert await stream.read() is not None
+    assert routes == []
+    assert sessions == {"started": 0, "open": 0}
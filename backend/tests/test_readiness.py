@@ -0,0 +1,127 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+import uvicorn
+
+from app.services import readiness
+import serve
+from serve import DrainingServer, DrainingSupervisor
+
+pytestmark = pytest.mark.anyio
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def test_ready_only_after_startup(client, monkeypatch):
+    monkeypatch.setattr(readiness, "ready", False)
+    response = await client.get("/ready")
+    assert response.status_code == 503
+
+    await readiness.mark_ready()
+    response = await client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+
+async def test_sigterm_flips_readiness_before_the_drain(app, client, monkeypatch):
+    monkeypatch.setattr(readiness, "ready", True)
+    server = DrainingServer(uvicorn.Config(app), shutdown_delay=0.3)
+
+    server.handle_exit(signal.SIGTERM, None)
+    # Not ready straight away, but still serving until the delay has passed
+    assert not server.should_exit
+    assert (await client.get("/ready")).status_code == 503
+    assert (await client.get("/health")).status_code == 200
+    # A SIGTERM forwarded by the supervisor does not cut the delay short
+    server.handle_exit(signal.SIGTERM, None)
+    assert not server.should_exit
+
+    await asyncio.sleep(0.4)
+    assert server.should_exit
+    assert not server.force_exit
+
+
+async def test_second_ctrl_c_skips_the_delay(app, monkeypatch):
+    monkeypatch.setattr(readiness, "ready", True)
+    server = DrainingServer(uvicorn.Config(app), shutdown_delay=60)
+
+    server.handle_exit(signal.SIGINT, None)
+    assert not readiness.is_ready()
+    assert not server.should_exit
+    server.handle_exit(signal.SIGINT, None)
+    assert server.should_exit and not server.force_exit
+    server.handle_exit(signal.SIGINT, None)
+    assert server.force_exit
+
+
+def test_supervisor_signals_every_worker_before_waiting():
+    events = []
+
+    class Worker:
+        def __init__(self, name):
+            self.name = name
+
+        def terminate(self):
+            events.append(("terminate", self.name))
+
+        def join(self):
+            events.append(("join", self.name))
+
+    supervisor = DrainingSupervisor(uvicorn.Config("main:app", workers=2), target=None, sockets=[])
+    supervisor.processes = [Worker("a"), Worker("b")]
+    supervisor.shutdown()
+    # All workers drain together instead of one after another
+    assert events[:2] == [("terminate", "a"), ("terminate", "b")]
+    assert ("join", "a") in events and ("join", "b") in events
+
+
+def test_several_workers_refuse_local_fanout(monkeypatch):
+    monkeypatch.setattr(serve, "SERVER_WORKERS", 4)
+    monkeypatch.setattr(serve, "NOTIFICATION_FANOUT", "local")
+    monkeypatch.setattr(serve, "DrainingServer", None)
+    with pytest.raises(SystemExit, match="NOTIFICATION_FANOUT=local needs SERVER_WORKERS=1"):
+        serve.main()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _status(url: str) -> int:
+    try:
+        return httpx.get(url, timeout=1).status_code
+    except httpx.TransportError:
+        return 0
+
+
+@pytest.mark.skipif(not os.getenv("TEST_MONGODB_URL"), reason="starts serve.py against a real server")
+def test_serve_reports_not_ready_while_still_serving():
+    port = _free_port()
+    env = dict(os.environ, MONGODB_URL=os.environ["TEST_MONGODB_URL"], DB_NAME="test_readiness",
+               SERVER_HOST="127.0.0.1", SERVER_PORT=str(port), SERVER_WORKERS="1",
+               SERVER_SHUTDOWN_DELAY_SECONDS="2", SERVER_GRACEFUL_SHUTDOWN_SECONDS="5")
+    process = subprocess.Popen([sys.executable, "serve.py"], cwd=BACKEND, env=env)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while _status(f"{base}/ready") != 200:
+            assert time.monotonic() < deadline, "worker never became ready"
+            time.sleep(0.2)
+
+        process.send_signal(signal.SIGTERM)
+        time.sleep(0.5)
+        assert _status(f"{base}/ready") == 503
+        assert _status(f"{base}/health") == 200
+        assert process.wait(timeout=15) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.repositories import notifications as notifications_repo
+from app.repositories import roles as roles_repo
+from app.repositories import time_off as time_off_repo
+from app.repositories import users as users_repo
+from app.repositories.base import object_id, to_response
+from app.utils.indexes import ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+async def _time_off(db, employee_id: str, status: str = "pending") -> str:
+    result = await db.time_off_requests.insert_one({
+        "employee_id": employee_id, "status": status, "reason": "trip",
+        "start_date": datetime(2026, 3, 2), "end_date": datetime(2026, 3, 4),
+        "created_at": datetime.utcnow(),
+    })
+    return str(result.inserted_id)
+
+
+async def test_update_pending_is_one_round_trip(db, mongo_commands):
+    request_id = await _time_off(db, "e1")
+    before = mongo_commands()
+    updated = await time_off_repo.update_pending(request_id, "e1", {"reason": "moved"})
+    assert mongo_commands() - before == 1
+    assert updated["reason"] == "moved"
+
+
+async def test_preconditions_live_in_the_filter(db):
+    pending = await _time_off(db, "e1")
+    approved = await _time_off(db, "e1", status="approved")
+
+    assert await time_off_repo.update_pending(pending, "someone-else", {"reason": "x"}) is None
+    assert await time_off_repo.cancel_pending(approved, "e1") is None
+    assert (await time_off_repo.cancel_pending(pending, "e1"))["status"] == "cancelled"
+    assert await time_off_repo.cancel_pending(pending, "e1") is None
+
+
+async def test_set_read_reports_whether_state_changed(db, mongo_commands):
+    result = await db.notifications.insert_one({"employee_id": "e1", "is_read": False,
+                                                "created_at": datetime.utcnow()})
+    before = mongo_commands()
+    doc, changed = await notifications_repo.set_read(result.inserted_id, "e1", True)
+    assert mongo_commands() - before == 1
+    assert changed and doc["is_read"]
+
+    doc, changed = await notifications_repo.set_read(result.inserted_id, "e1", True)
+    assert not changed and doc["is_read"]
+    doc, changed = await notifications_repo.set_read(result.inserted_id, "e2", False)
+    assert doc is None and not changed
+
+
+async def test_user_update_surfaces_duplicate_email(app, db):
+    await ensure_indexes(db)
+    await users_repo.insert({"email": "a@example.com", "first_name": "A", "last_name": "One"})
+    other = await users_repo.insert({"email": "b@example.com", "first_name": "B", "last_name": "Two"})
+
+    with pytest.raises(DuplicateKeyError):
+        await users_repo.update(other["_id"], {"email": "a@example.com"})
+    assert await users_repo.update(ObjectId(), {"first_name": "Nobody"}) is None
+
+
+async def test_built_in_roles_cannot_be_deleted(db):
+    admin = await db.roles.insert_one({"name": "admin", "permissions": ["*"]})
+    custom = await roles_repo.insert({"name": "auditor", "permissions": []})
+
+    assert await roles_repo.delete_custom(admin.inserted_id) is None
+    assert (await roles_repo.delete_custom(custom["_id"]))["name"] == "auditor"
+
+
+async def test_mapping_helpers():
+    doc_id = ObjectId()
+    assert to_response({"_id": doc_id})["id"] == str(doc_id)
+    assert to_response(None) is None
+    assert object_id(str(doc_id)) == doc_id
+    assert object_id("not-an-id") is None
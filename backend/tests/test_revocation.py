@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.revocation import RevocationSet, revocations
+from app.utils.indexes import ensure_indexes
+from app.utils.tokens import token_digest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_logout_stores_digest_not_token(client, login, db):
+    headers = await login()
+    token = headers["Authorization"].split(" ", 1)[1]
+    assert (await client.post("/api/v1/auth/logout", headers=headers)).status_code == 204
+
+    stored = await db.token_blacklist.find_one({})
+    assert stored["token_digest"] == token_digest(token)
+    assert "token" not in stored
+    assert revocations.contains(token_digest(token))
+
+
+async def test_expired_revocations_are_ignored_and_purged():
+    revoked = RevocationSet()
+    revoked.add("live", datetime.utcnow() + timedelta(minutes=5))
+    revoked.add("gone", datetime.utcnow() - timedelta(seconds=1))
+    assert revoked.contains("live")
+    assert not revoked.contains("gone")
+
+    revoked.add("stale", datetime.utcnow() + timedelta(seconds=1))
+    revoked._expires["stale"] = datetime.utcnow() - timedelta(minutes=5)
+    revoked._buckets = {RevocationSet._bucket(datetime.utcnow() - timedelta(minutes=5)): {"stale"},
+                        RevocationSet._bucket(datetime.utcnow() + timedelta(minutes=5)): {"live"}}
+    revoked.purge_expired()
+    assert len(revoked) == 1
+
+
+async def test_load_includes_legacy_raw_tokens(db):
+    expires_at = datetime.utcnow() + timedelta(minutes=5)
+    await db.token_blacklist.insert_many([
+        {"token_digest": "abc", "expires_at": expires_at, "created_at": datetime.utcnow()},
+        {"token": "raw.jwt.value", "expires_at": expires_at, "created_at": datetime.utcnow()},
+        {"token_digest": "old", "expires_at": datetime.utcnow() - timedelta(minutes=1),
+         "created_at": datetime.utcnow()},
+    ])
+    revoked = RevocationSet()
+    await revoked.load()
+    assert revoked.contains("abc")
+    assert revoked.contains(token_digest("raw.jwt.value"))
+    assert not revoked.contains("old")
+
+
+async def test_poll_picks_up_other_workers_revocations(db):
+    revoked = RevocationSet()
+    await revoked.load()
+    await db.token_blacklist.insert_one({
+        "token_digest": "elsewhere",
+        "expires_at": datetime.utcnow() + timedelta(minutes=5),
+        "created_at": datetime.utcnow(),
+    })
+    assert not revoked.contains("elsewhere")
+    await revoked.poll()
+    assert revoked.contains("elsewhere")
+
+
+async def test_blacklist_has_ttl_index(db):
+    await ensure_indexes(db)
+    info = await db.token_blacklist.index_information()
+    assert any(list(index["key"]) == [("expires_at", 1)] and index.get("expireAfterSeconds") == 0
+               for index in info.values())
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app import app as app_module
+from app.app import create_app
+from app.routers import profile as profile_router
+from app.services.principal_cache import principal_cache
+from app.services.session_activity import session_activity
+from app.utils.roundtrips import RoundTripBudgetMiddleware
+
+pytestmark = pytest.mark.anyio
+
+ADMIN_ROUTES = ["/api/v1/users/", "/api/v1/users/?q=user&limit=2", "/api/v1/roles/"]
+EMPLOYEE_ROUTES = ["/api/v1/schedules", "/api/v1/schedules/time-off", "/api/v1/schedules/availability",
+                   "/api/v1/notifications", "/api/v1/profile", "/api/v1/profile/availability"]
+WEEK = [{"day_of_week": day, "start_time": "09:00", "end_time": "17:00", "is_available": True}
+        for day in range(7)]
+
+
+async def _seed(db, employee_id: str):
+    start = datetime(2026, 1, 5, 9)
+    await db.schedules.insert_many([
+        {"employee_id": employee_id, "start_time": start + timedelta(days=i), "location": "Store 1",
+         "end_time": start + timedelta(days=i, hours=8), "role": "cashier", "status": "approved",
+         "created_at": start, "updated_at": start} for i in range(5)
+    ])
+    await db.time_off_requests.insert_many([
+        {"employee_id": employee_id, "start_date": start + timedelta(days=i), "reason": "Holiday",
+         "end_date": start + timedelta(days=i + 1), "status": "pending", "created_at": start,
+         "updated_at": start} for i in range(5)
+    ])
+    await db.availability.insert_many([dict(day, employee_id=employee_id) for day in WEEK])
+    await db.notifications.insert_many([
+        {"employee_id": employee_id, "message": f"Shift {i} was published", "is_read": False,
+         "created_at": start + timedelta(minutes=i)} for i in range(5)
+    ])
+
+
+def _cold(headers: dict):
+    # Budgets include the uncached authentication path
+    token = headers["Authorization"].split(" ", 1)[1]
+    principal_cache.clear()
+    session_activity.discard(token)
+
+
+@pytest.fixture
+async def employee_headers(db, login, user_id):
+    headers = await login("employee@example.com", role="employee")
+    await _seed(db, await user_id("employee@example.com"))
+    return headers
+
+
+@pytest.mark.parametrize("path", ADMIN_ROUTES)
+async def test_admin_routes_stay_within_budget(path, login, roundtrips):
+    headers = await login()
+    for email in ("a@example.com", "b@example.com", "c@example.com"):
+        await login(email, role="employee")
+    _cold(headers)
+    response = await roundtrips.request("GET", path, headers=headers)
+    assert response.status_code == 200, response.text
+    roundtrips.check_budget()
+
+    # Later pages cost the same
+    if "X-Next-Cursor" in response.headers:
+        _cold(headers)
+        separator = "&" if "?" in path else "?"
+        response = await roundtrips.request(
+            "GET", f"{path}{separator}cursor={response.headers['X-Next-Cursor']}", headers=headers
+        )
+        assert response.status_code == 200, response.text
+        roundtrips.check_budget()
+
+
+@pytest.mark.parametrize("path", EMPLOYEE_ROUTES)
+async def test_employee_routes_stay_within_budget(path, employee_headers, roundtrips):
+    _cold(employee_headers)
+    response = await roundtrips.request("GET", path, headers=employee_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()
+    roundtrips.check_budget()
+
+
+async def test_availability_update_stays_within_budget(employee_headers, roundtrips):
+    _cold(employee_headers)
+    response = await roundtrips.request("PUT", "/api/v1/profile/availability", headers=employee_headers,
+                                        json=WEEK)
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 7
+    roundtrips.check_budget()
+
+
+async def test_recorder_reports_an_overrun(employee_headers, roundtrips, monkeypatch):
+    monkeypatch.setattr(profile_router.get_profile, "roundtrip_budget", 1)
+    _cold(employee_headers)
+    await roundtrips.request("GET", "/api/v1/profile", headers=employee_headers)
+    with pytest.raises(AssertionError, match=r"GET /api/v1/profile issued \d+ Mongo commands, budget is 1: find"):
+        roundtrips.check_budget()
+
+
+async def test_warn_mode_logs_and_keeps_the_response(employee_headers, monkeypatch, capsys):
+    monkeypatch.setattr(profile_router.get_profile, "roundtrip_budget", 0)
+    monkeypatch.setattr(app_module, "ROUNDTRIP_BUDGETS", "warn")
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/v1/profile", headers=employee_headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == "employee@example.com"
+    assert "Round-trip budget exceeded: GET /api/v1/profile issued" in capsys.readouterr().out
+
+
+def test_only_off_and_warn_modes_exist():
+    with pytest.raises(ValueError):
+        RoundTripBudgetMiddleware(None, "enforce")
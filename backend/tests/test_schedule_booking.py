@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pytest
+
+from app.services.schedule_booking import sweep_overlaps
+
+pytestmark = pytest.mark.anyio
+
+
+def _shift(employee_id: str, start: str, end: str) -> dict:
+    return {"employee_id": employee_id, "start_time": start, "end_time": end, "location": "A", "role": "cashier"}
+
+
+async def _book(client, headers, *shifts, publish=False):
+    response = await client.post("/api/v1/schedules/bulk", json={"shifts": list(shifts), "publish": publish},
+                                 headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_sweep_finds_batch_and_existing_conflicts():
+    at = lambda h: datetime(2026, 1, 5, h)
+    conflicts = sweep_overlaps(
+        [(0, at(11), at(13)), (1, at(12), at(14)), (2, at(13), at(15)), (3, at(15), at(17))],
+        [("existing", at(9), at(12))],
+    )
+    # A rejected row does not block the rows after it
+    assert conflicts == {0: "existing", 2: 1}
+
+
+async def test_batch_and_existing_overlaps_are_reported_per_row(client, login, user_id):
+    headers = await login()
+    me = await user_id("admin@example.com")
+    await _book(client, headers, _shift(me, "2026-01-05T09:00:00", "2026-01-05T12:00:00"))
+
+    result = await _book(client, headers,
+                         _shift(me, "2026-01-05T11:00:00", "2026-01-05T13:00:00"),
+                         _shift(me, "2026-01-05T13:00:00", "2026-01-05T15:00:00"),
+                         _shift(me, "2026-01-05T14:00:00", "2026-01-05T16:00:00"),
+                         _shift("0" * 24, "2026-01-05T12:00:00", "2026-01-05T14:00:00"))
+    assert result["created"] == 1 and result["failed"] == 3
+    errors = {e["index"]: e["error"] for e in result["errors"]}
+    assert errors == {0: "Overlaps an existing shift", 2: "Overlaps another shift in this batch",
+                      3: "Unknown or inactive employee"}
+
+
+@pytest.mark.parametrize("start,end", [
+    ("2026-01-05T09:00:00Z", "2026-01-05T12:00:00Z"),
+    ("2026-01-05T11:00:00+02:00", "2026-01-05T14:00:00+02:00"),
+    ("2026-01-05T04:00:00-05:00", "2026-01-05T07:00:00-05:00"),
+])
+async def test_offset_times_are_compared_as_utc(client, login, user_id, db, start, end):
+    headers = await login()
+    me = await user_id("admin@example.com")
+    await _book(client, headers, _shift(me, "2026-01-05T09:00:00", "2026-01-05T12:00:00"))
+
+    result = await _book(client, headers, _shift(me, start, end))
+    assert result["errors"] == [{"index": 0, "error": "Overlaps an existing shift",
+                                 "conflicts_with": result["errors"][0]["conflicts_with"]}]
+
+
+async def test_offset_times_are_stored_and_rolled_up_in_utc(client, login, user_id, db):
+    headers = await login()
+    me = await user_id("admin@example.com")
+    result = await _book(client, headers, _shift(me, "2026-01-05T11:30:00+02:00", "2026-01-05T13:00:00+02:00"),
+                         publish=True)
+    assert result["created"] == 1
+
+    stored = await db.schedules.find_one({})
+    assert stored["start_time"] == datetime(2026, 1, 5, 9, 30)
+    assert stored["end_time"] == datetime(2026, 1, 5, 11)
+    hours = sorted(doc["hour"] for doc in await db.coverage_rollups.find({}).to_list(None))
+    assert hours == [datetime(2026, 1, 5, 9), datetime(2026, 1, 5, 10)]
+
+
+async def test_overnight_shifts_conflict_and_overlong_shifts_are_rejected(client, login, user_id):
+    headers = await login()
+    me = await user_id("admin@example.com")
+    await _book(client, headers, _shift(me, "2026-01-04T22:00:00", "2026-01-05T10:00:00"))
+
+    # Overlap queries look back one maximum shift length from the window start
+    result = await _book(client, headers, _shift(me, "2026-01-05T09:00:00", "2026-01-05T11:00:00"))
+    assert [error["error"] for error in result["errors"]] == ["Overlaps an existing shift"]
+
+    response = await client.post("/api/v1/schedules/bulk", headers=headers, json={
+        "shifts": [_shift(me, "2026-01-06T09:00:00", "2026-01-07T10:00:00")]
+    })
+    assert response.status_code == 422
+    assert "Shifts cannot be longer than 24 hours" in response.text
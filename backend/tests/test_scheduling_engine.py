@@ -0,0 +1,112 @@
+from datetime import datetime
+
+import pytest
+
+from app.repositories import availability as availability_repo
+from app.schemas.schedule import ScheduleGenerationRequest
+from app.services.scheduling_engine import generate_schedules
+
+pytestmark = pytest.mark.anyio
+
+TUESDAY = 2  # 2026-01-06
+
+
+async def _employee(db, email: str, *windows, **fields) -> str:
+    result = await db.users.insert_one({"email": email, "role": "employee", "is_active": True,
+                                        "locations": ["A"], "job_roles": ["cashier"], **fields})
+    employee_id = str(result.inserted_id)
+    for start, end, stored in windows:
+        doc = {"employee_id": employee_id, "day_of_week": TUESDAY, "start_time": start, "end_time": end,
+               "is_available": True}
+        if stored:
+            doc["slot_mask"] = availability_repo.slot_mask(TUESDAY, doc)
+        await db.availability.insert_one(doc)
+    return employee_id
+
+
+def _request(start: str, end: str, headcount: int = 1, **fields) -> ScheduleGenerationRequest:
+    return ScheduleGenerationRequest(
+        horizon_start="2026-01-06T00:00:00", horizon_end="2026-01-07T00:00:00",
+        demands=[{"location": "A", "role": "cashier", "start_time": start, "end_time": end,
+                  "headcount": headcount}],
+        **fields,
+    )
+
+
+@pytest.mark.parametrize("stored", [True, False])
+async def test_partial_slot_availability_is_not_assigned(db, stored):
+    await _employee(db, "ragged@example.com", ("09:10", "16:50", stored))
+    full = await _employee(db, "full@example.com", ("09:00", "17:00", stored))
+
+    result = await generate_schedules(_request("2026-01-06T09:00:00", "2026-01-06T17:00:00", headcount=2))
+    assert result["shifts_created"] == 1
+    assert result["unfilled"][0]["assigned"] == 1
+    assert [doc["employee_id"] async for doc in db.schedules.find()] == [full]
+
+
+async def test_time_off_existing_shifts_and_eligibility_are_respected(db):
+    on_leave = await _employee(db, "leave@example.com", ("09:00", "17:00", True))
+    busy = await _employee(db, "busy@example.com", ("09:00", "17:00", True))
+    await _employee(db, "elsewhere@example.com", ("09:00", "17:00", True), locations=["B"])
+    await _employee(db, "driver@example.com", ("09:00", "17:00", True), job_roles=["driver"])
+    free = await _employee(db, "free@example.com", ("09:00", "17:00", True))
+    await db.time_off_requests.insert_one({"employee_id": on_leave, "status": "approved",
+                                           "start_date": datetime(2026, 1, 6), "end_date": datetime(2026, 1, 7)})
+    await db.schedules.insert_one({"employee_id": busy, "start_time": datetime(2026, 1, 6, 12),
+                                   "end_time": datetime(2026, 1, 6, 14), "location": "A", "role": "cashier",
+                                   "status": "approved"})
+
+    result = await generate_schedules(_request("2026-01-06T09:00:00", "2026-01-06T13:00:00", headcount=5,
+                                               dry_run=True))
+    assert result["shifts_assigned"] == 1 and result["shifts_created"] == 0
+    assert result["unfilled"][0]["assigned"] == 1
+    assert await db.schedules.count_documents({"employee_id": free}) == 0
+
+
+@pytest.mark.parametrize("horizon_start,start,end", [
+    ("2026-01-06T00:00:00Z", "2026-01-06T09:00:00Z", "2026-01-06T13:00:00Z"),
+    ("2026-01-06T02:00:00+02:00", "2026-01-06T11:00:00+02:00", "2026-01-06T15:00:00+02:00"),
+    ("2026-01-05T19:00:00-05:00", "2026-01-06T04:00:00-05:00", "2026-01-06T08:00:00-05:00"),
+])
+async def test_offset_times_are_generated_as_utc(client, login, db, horizon_start, start, end):
+    headers = await login()
+    employee = await _employee(db, "full@example.com", ("09:00", "17:00", True))
+    # A naive stored shift next to the demand must compare with offset-aware input
+    await db.schedules.insert_one({"employee_id": employee, "start_time": datetime(2026, 1, 6, 14),
+                                   "end_time": datetime(2026, 1, 6, 16), "location": "A", "role": "cashier",
+                                   "status": "approved"})
+
+    response = await client.post("/api/v1/schedules/generate", headers=headers, json={
+        "horizon_start": horizon_start, "horizon_end": "2026-01-07T00:00:00Z",
+        "demands": [{"location": "A", "role": "cashier", "start_time": start, "end_time": end}],
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["shifts_created"] == 1
+    shift = await db.schedules.find_one({"start_time": {"$ne": datetime(2026, 1, 6, 14)}})
+    assert (shift["start_time"], shift["end_time"]) == (datetime(2026, 1, 6, 9), datetime(2026, 1, 6, 13))
+
+
+@pytest.mark.parametrize("include_unassigned,assigned", [(False, 0), (True, 1)])
+async def test_unassigned_employees_are_opt_in(db, include_unassigned, assigned):
+    await _employee(db, "new@example.com", ("09:00", "17:00", True), locations=[], job_roles=[])
+
+    result = await generate_schedules(_request("2026-01-06T09:00:00", "2026-01-06T13:00:00", dry_run=True,
+                                               include_unassigned=include_unassigned))
+    assert result["shifts_assigned"] == assigned
+
+
+@pytest.mark.parametrize("start,end", [
+    ("2026-01-06T20:00:00", "2026-01-07T04:00:00"),
+    ("2026-01-05T22:00:00", "2026-01-06T02:00:00"),
+])
+async def test_demands_must_lie_within_the_horizon(client, login, db, start, end):
+    headers = await login()
+    await _employee(db, "full@example.com", ("00:00", "23:59", True))
+
+    response = await client.post("/api/v1/schedules/generate", headers=headers, json={
+        "horizon_start": "2026-01-06T00:00:00", "horizon_end": "2026-01-07T00:00:00",
+        "demands": [{"location": "A", "role": "cashier", "start_time": start, "end_time": end}],
+    })
+    assert response.status_code == 422
+    assert "Demand 0 is not within the horizon" in response.text
+    assert await db.schedules.count_documents({}) == 0
@@ -0,0 +1,70 @@
+import json
+from datetime import datetime
+from typing import List, Optional
+
+import pytest
+from bson import ObjectId
+from fastapi import Response
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.repositories.base import to_response
+from app.schemas.notification import NotificationResponse
+from app.schemas.schedule import AvailabilityResponse, ScheduleResponse, TimeOffRequestResponse
+from app.utils.serialization import documents_response, dump, project, projection
+
+NOW = datetime(2026, 1, 5, 9, 30, 15, 123000)
+
+DOCUMENTS = {
+    NotificationResponse: {"_id": ObjectId(), "employee_id": "e1", "message": "hi", "is_read": False,
+                           "created_at": NOW, "fanout_id": "internal"},
+    AvailabilityResponse: {"_id": ObjectId(), "employee_id": "e1", "day_of_week": 2, "start_time": "09:00",
+                           "end_time": "17:00", "is_available": True, "created_at": NOW, "updated_at": NOW,
+                           "slot_mask": b"\x00\x01"},
+    TimeOffRequestResponse: {"_id": ObjectId(), "employee_id": "e1", "start_date": NOW, "end_date": NOW,
+                             "reason": "Holiday", "status": "approved", "created_at": NOW, "updated_at": NOW},
+    ScheduleResponse: {"_id": ObjectId(), "employee_id": "e1", "start_time": NOW, "end_time": NOW,
+                       "location": "A", "role": "cashier", "status": "pending", "created_at": NOW,
+                       "updated_at": NOW, "generation_id": "g1"},
+}
+
+
+class Example(BaseModel):
+    id: str
+    name: str = Field(alias="full_name")
+    tags: List[str] = Field(default_factory=list)
+    note: Optional[str] = None
+
+
+def test_projection_maps_id_aliases_and_defaults():
+    assert projection(Example) == (("id", "_id", None), ("name", "full_name", None), ("tags", "tags", []),
+                                   ("note", "note", None))
+    assert projection(Example) is projection(Example)
+    assert project({"_id": 1, "full_name": "Ann", "secret": "x"}, projection(Example)) == \
+        {"id": 1, "name": "Ann", "tags": [], "note": None}
+
+
+@pytest.mark.parametrize("schema", list(DOCUMENTS), ids=lambda schema: schema.__name__)
+def test_one_pass_output_matches_pydantic(schema):
+    doc = DOCUMENTS[schema]
+    fast = json.loads(documents_response([dict(doc)], schema).body)
+    model = schema.model_validate(to_response(dict(doc)))
+    slow = json.loads(TypeAdapter(List[schema]).dump_json([model]))
+    assert fast == slow
+    # Internal fields never leak
+    assert set(fast[0]) == set(schema.model_fields)
+
+
+def test_object_ids_are_encoded_and_unknown_types_rejected():
+    oid = ObjectId()
+    assert json.loads(dump({"id": oid, "at": NOW})) == {"id": str(oid), "at": "2026-01-05T09:30:15.123000"}
+    with pytest.raises(TypeError):
+        dump({"value": object()})
+
+
+def test_headers_set_on_the_injected_response_are_kept():
+    injected = Response()
+    injected.headers["ETag"] = 'W/"x"'
+    injected.headers["X-Next-Cursor"] = "abc"
+    response = documents_response([], AvailabilityResponse, injected)
+    assert (response.headers["etag"], response.headers["x-next-cursor"]) == ('W/"x"', "abc")
+    assert response.headers["content-length"] == "2" and response.body == b"[]"
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.auth import is_session_expired
+from app.services.principal_cache import principal_cache
+from app.services.session_activity import session_activity
+from app.utils.database import close_mongo_connection
+
+pytestmark = pytest.mark.anyio
+
+
+def _token(headers: dict) -> str:
+    return headers["Authorization"].split(" ", 1)[1]
+
+
+async def test_touches_are_buffered_until_flush(client, login, db):
+    headers = await login()
+    token = _token(headers)
+    stored = (await db.sessions.find_one({"access_token": token}))["last_activity"]
+
+    for _ in range(20):
+        assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+    assert session_activity.writes == 0
+    assert (await db.sessions.find_one({"access_token": token}))["last_activity"] == stored
+
+    await session_activity.flush()
+    assert session_activity.writes == 1
+    assert (await db.sessions.find_one({"access_token": token}))["last_activity"] > stored
+
+
+async def test_flush_never_moves_last_activity_backwards(login, db):
+    headers = await login()
+    token = _token(headers)
+    later = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=5)
+    await db.sessions.update_one({"access_token": token}, {"$set": {"last_activity": later}})
+
+    session_activity.touch(token, datetime.utcnow())
+    await session_activity.flush()
+    assert (await db.sessions.find_one({"access_token": token}))["last_activity"] == later
+
+
+async def test_flush_batches_by_batch_size(db):
+    session_activity.batch_size = 3
+    for i in range(7):
+        await db.sessions.insert_one({"access_token": f"t{i}", "last_activity": datetime(2024, 1, 1)})
+        session_activity.touch(f"t{i}")
+    await session_activity.flush()
+    assert session_activity.flushes == 3
+    assert session_activity.writes == 7
+    assert await db.sessions.count_documents({"last_activity": datetime(2024, 1, 1)}) == 0
+
+
+async def test_expiry_uses_pending_timestamp(login, db):
+    headers = await login()
+    token = _token(headers)
+    stale = datetime.utcnow() - timedelta(hours=2)
+    await db.sessions.update_one({"access_token": token}, {"$set": {"last_activity": stale}})
+
+    session_activity.touch(token)
+    assert not await is_session_expired(token)
+    session_activity.discard(token)
+    assert await is_session_expired(token)
+
+
+async def test_idle_session_is_expired(client, login, db):
+    headers = await login()
+    token = _token(headers)
+    session_activity.discard(token)
+    principal_cache.clear()
+    stale = datetime.utcnow() - timedelta(hours=2)
+    await db.sessions.update_one({"access_token": token}, {"$set": {"last_activity": stale}})
+
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 401
+    assert await db.sessions.find_one({"access_token": token}) is None
+
+
+async def test_shutdown_flushes_pending_touches(login, db):
+    headers = await login()
+    token = _token(headers)
+    await db.sessions.update_one({"access_token": token}, {"$set": {"last_activity": datetime(2024, 1, 1)}})
+    session_activity.touch(token)
+
+    await close_mongo_connection()
+    assert (await db.sessions.find_one({"access_token": token}))["last_activity"] > datetime(2024, 1, 1)
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+from app.services import versions
+from app.services.migrations import migrate_time_off_dates
+
+pytestmark = pytest.mark.anyio
+
+NEXT_YEAR = datetime.utcnow().year + 1
+
+
+def _at(month: int, day: int, hour: int = 0) -> datetime:
+    return datetime(NEXT_YEAR, month, day, hour)
+
+
+async def _request_off(client, headers, start: str, end: str) -> dict:
+    response = await client.post("/api/v1/schedules/time-off", headers=headers,
+                                 json={"start_date": start, "end_date": end, "reason": "Holiday"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_dates_are_stored_as_utc_datetimes(client, login, db):
+    headers = await login("employee@example.com", role="employee")
+    created = await _request_off(client, headers, f"{NEXT_YEAR}-03-02T10:00:00+02:00", f"{NEXT_YEAR}-03-04T00:00:00Z")
+
+    doc = await db.time_off_requests.find_one()
+    assert (doc["start_date"], doc["end_date"]) == (_at(3, 2, 8), _at(3, 4))
+    assert created["start_date"].startswith(f"{NEXT_YEAR}-03-02T08:00:00")
+
+
+async def test_overlap_query_finds_intersecting_requests(client, login, db, user_id):
+    manager = await login("manager@example.com", role="manager")
+    employee_id = await user_id("manager@example.com")
+    windows = {"before": (_at(3, 1), _at(3, 2)), "touching": (_at(3, 2), _at(3, 3)),
+               "inside": (_at(3, 3, 9), _at(3, 3, 17)), "spanning": (_at(2, 1), _at(4, 1))}
+    await db.time_off_requests.insert_many([
+        {"employee_id": employee_id, "status": "approved", "reason": name, "start_date": start,
+         "end_date": end, "created_at": _at(1, 1), "updated_at": _at(1, 1)}
+        for name, (start, end) in windows.items()
+    ] + [{"employee_id": employee_id, "status": "pending", "reason": "pending", "start_date": _at(3, 3),
+          "end_date": _at(3, 4), "created_at": _at(1, 1), "updated_at": _at(1, 1)}])
+
+    response = await client.get("/api/v1/schedules/time-off/overlapping", headers=manager,
+                                params={"start": _at(3, 2).isoformat(), "end": _at(3, 4).isoformat()})
+    assert response.status_code == 200, response.text
+    assert sorted(r["reason"] for r in response.json()) == ["inside", "spanning", "touching"]
+
+    response = await client.get("/api/v1/schedules/time-off/overlapping", headers=manager,
+                                params={"start": _at(3, 4).isoformat(), "end": _at(3, 2).isoformat()})
+    assert response.status_code == 400
+
+
+async def test_overlap_query_requires_manage_schedules(client, login):
+    employee = await login("employee@example.com", role="employee")
+    response = await client.get("/api/v1/schedules/time-off/overlapping", headers=employee,
+                                params={"start": _at(3, 2).isoformat(), "end": _at(3, 4).isoformat()})
+    assert response.status_code == 403
+
+
+async def test_migration_converts_string_dates(db):
+    await db.time_off_requests.insert_many([
+        {"employee_id": "e1", "status": "approved", "start_date": "2024-03-02T10:00:00+02:00",
+         "end_date": "2024-03-04T00:00:00Z"},
+        {"employee_id": "e2", "status": "approved", "start_date": "not a date", "end_date": "2024-03-04"},
+        {"employee_id": "e3", "status": "approved", "start_date": datetime(2024, 3, 1),
+         "end_date": datetime(2024, 3, 2)},
+    ])
+
+    assert await migrate_time_off_dates(batch_size=1) == {"scanned": 2, "migrated": 1, "invalid": 1}
+    doc = await db.time_off_requests.find_one({"employee_id": "e1"})
+    assert (doc["start_date"], doc["end_date"]) == (datetime(2024, 3, 2, 8), datetime(2024, 3, 4))
+    # Cached lists of the migrated employee are outdated, the others are not
+    assert await versions.current(versions.TIME_OFF, "e1") > 0
+    assert await versions.current(versions.TIME_OFF, "e2") == 0
+    # Already converted documents are not scanned again
+    assert await migrate_time_off_dates() == {"scanned": 1, "migrated": 0, "invalid": 1}
@@ -0,0 +1,101 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from app.repositories import users as users_repo
+from app.services.user_directory import user_directory
+from app.utils.indexes import _plan_stages, ensure_indexes
+from app.utils.pagination import sort_spec
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime(2026, 1, 5)
+NAMES = [("Jane", "Doe"), ("John", "Doe"), ("Ann", "Dorsey"), ("Dora", "Smith"), ("Mark", "Doherty"),
+         ("Amy", "Dodd")]
+
+
+async def _seed(db):
+    await db.users.insert_many([
+        users_repo.search_fields({"first_name": first, "last_name": last, "email": f"{first.lower()}@example.com"})
+        | {"first_name": first, "last_name": last, "email": f"{first.lower()}@example.com",
+           "role": "manager" if first == "John" else "employee", "is_active": first != "Amy",
+           "created_at": NOW, "updated_at": NOW}
+        for first, last in NAMES
+    ])
+
+
+async def _search(client, headers, **params) -> list:
+    names, cursor = [], None
+    while True:
+        response = await client.get("/api/v1/users/", headers=headers,
+                                    params={**params, "limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        names += [f"{user['first_name']} {user['last_name']}" for user in
+                  (response.json() if cursor is None else response.json()["items"])]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return names
+
+
+async def test_prefix_search_pages_in_last_name_order(client, login, db):
+    headers = await login()
+    await _seed(db)
+    assert await _search(client, headers, q="DO") == ["Amy Dodd", "Jane Doe", "John Doe", "Mark Doherty",
+                                                      "Ann Dorsey", "Dora Smith"]
+    assert await _search(client, headers, q="  JANE   d") == ["Jane Doe"]
+    assert await _search(client, headers, q="do", role="employee", is_active=True) == \
+        ["Jane Doe", "Mark Doherty", "Ann Dorsey", "Dora Smith"]
+
+
+async def test_search_matches_first_names_and_emails(client, login, db):
+    headers = await login()
+    await _seed(db)
+    assert await _search(client, headers, q="dora") == ["Dora Smith"]
+    assert await _search(client, headers, q="mark@") == ["Mark Doherty"]
+    # A user matching several terms is returned once
+    assert await _search(client, headers, q="j") == ["Jane Doe", "John Doe"]
+
+
+async def test_autocomplete_matches_first_names_and_emails(client, login, db):
+    headers = await login()
+    await _seed(db)
+    await user_directory.load()
+    response = await client.get("/api/v1/users/autocomplete", headers=headers, params={"q": "dor"})
+    assert response.status_code == 200, response.text
+    assert sorted(user["last_name"] for user in response.json()) == ["Dorsey", "Smith"]
+
+
+def test_search_filter_is_an_anchored_regex():
+    assert users_repo.directory_filter(" Jane  D", "employee", True) == {
+        "search_terms": {"$regex": "^jane\\ d"}, "role": "employee", "is_active": True,
+    }
+    assert users_repo.directory_filter(None) == {}
+
+
+async def _plan(db, query: dict) -> set:
+    plan = await db.command("explain", {"find": "users", "filter": query, "sort": dict(sort_spec("sort_name", 1)),
+                                        "limit": 2}, verbosity="queryPlanner")
+    return set(_plan_stages(plan["queryPlanner"]["winningPlan"]))
+
+
+@pytest.mark.skipif(not os.getenv("TEST_MONGODB_URL"), reason="explain() needs a real mongod")
+@pytest.mark.parametrize("role", [None, "employee"])
+async def test_listing_pages_walk_the_index_without_sorting(db, role):
+    await ensure_indexes(db)
+    await _seed(db)
+    stages = await _plan(db, users_repo.directory_filter(None, role, True if role else None))
+    assert "IXSCAN" in stages and not stages & {"SORT", "COLLSCAN"}
+
+
+@pytest.mark.skipif(not os.getenv("TEST_MONGODB_URL"), reason="explain() needs a real mongod")
+@pytest.mark.parametrize("role", [None, "employee"])
+async def test_search_scans_only_the_prefix_range(db, role):
+    await ensure_indexes(db)
+    await _seed(db)
+    plan = await db.command("explain", {"find": "users", "filter": users_repo.directory_filter("do", role, None),
+                                        "sort": dict(sort_spec("sort_name", 1)), "limit": 2},
+                            verbosity="queryPlanner")
+    winning = plan["queryPlanner"]["winningPlan"]
+    assert "COLLSCAN" not in set(_plan_stages(winning))
+    assert '"search_terms"' in str(winning).replace("'", '"')
@@ -0,0 +1,32 @@
+import asyncio
+import signal
+from dotenv import load_dotenv
+
+from app.app import create_app
+from app.services.jobs import JobWorker
+from app.utils.database import connect_to_mongo, close_mongo_connection
+
+# Load environment variables
+load_dotenv()
+
+async def main():
+    """
+    Run background jobs outside the API process. Building the app imports
+    every router, which registers the job handlers and indexes they use.
+    """
+    create_app()
+    await connect_to_mongo()
+    worker = JobWorker()
+    worker.start()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+    await stopping.wait()
+
+    await worker.stop()
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())